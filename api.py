@@ -0,0 +1,353 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import math
+import os
+import secrets
+import threading
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+import pandas as pd
+
+from ledger_store import LedgerJournal
+from member_store import ConflictError, MemberStore
+from metrics import METRICS
+from payout import load_rates
+from persistence import WriteBehind
+from security import HashBusyError, hash_password, verify_password
+from settlement import PROFIT_TYPES, SETTLE_TYPES
+from storage import LEDGER_COLS, WriteConflict, open_storage
+
+# =========================================================
+# 모바일용 JSON API (ASGI, 프레임워크 없음)
+# - Streamlit 앱 옆에서 도는 별도 프로세스, 같은 저장소(storage.py)와 같은 메모리 구조(MemberStore/LedgerJournal) 사용
+#   실행: `python api.py --port 8000` (uvicorn) 또는 `uvicorn api:app`
+# - 화면 재실행 없이 요청마다 필요한 것만: 조회는 ID 인덱스(dict) 1회 + 추천 트리 통계 1회
+# - 로그인 → 서명 토큰(HMAC-SHA256, 만료 포함, 비밀번호가 바뀌면 무효), 요청 헤더 `Authorization: Bearer <token>`
+# - 해시 계산/동기 저장은 스레드에서 실행 (이벤트 루프를 막지 않음), 일반 변경은 백그라운드 writer 가 모아서 저장
+# - 다른 프로세스(Streamlit 앱)가 저장소를 바꾸면 다음 요청 때 다시 로드 (앱과 같은 방식)
+# - 오류도 항상 JSON {"error"}: 요청 오류 4xx / 다른 관리자·프로세스가 먼저 변경 409 / 해시 대기열 초과 503
+#   그 밖의 예외는 로그(tradingx.api) + 구간 오류 건수(metrics) 기록 후 500
+#
+#   POST /api/login          {"id", "password"}                      → {"token", "expires_at", "user"}
+#   GET  /api/me             잔액/추천 요약 (유저 대시보드와 같은 항목)
+#   GET  /api/me/profit      ?days=30 → 일별 수익 증감/마감 잔액 (회원별 일별 집계에서 그 회원 구간만 읽음)
+#   POST /api/password       {"old_password", "new_password"}        → {"token"} (기존 토큰은 무효)
+#   POST /api/admin/settle   {"target_id", "type", "amount", "note"} (관리자)
+#   GET  /api/health
+#   GET  /metrics            Prometheus 텍스트 (관리자 토큰, 스크레이퍼는 Authorization 헤더로)
+# =========================================================
+
+API_SECRET = os.environ.get("TRADINGX_API_SECRET") or secrets.token_hex(32)  # 미설정 시 재시작하면 기존 토큰 무효
+TOKEN_TTL = int(os.environ.get("TRADINGX_API_TOKEN_TTL", str(12 * 3600)))  # 초
+MAX_BODY = 64 * 1024
+MAX_SERIES_DAYS = 366
+BUSY_MSG = "요청이 많아 처리가 지연되고 있습니다. 잠시 후 다시 시도하세요."
+ERROR_MSG = "서버 오류가 발생했습니다. 잠시 후 다시 시도하세요."
+
+log = logging.getLogger("tradingx.api")
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class TradingApi:
+    def __init__(self, storage=None):
+        self._storage = storage
+        self._reload_lock = threading.Lock()
+        self.store = None
+        self.journal = None
+        self.writer = None
+        self.rates = None
+        self._routes = {
+            ("POST", "/api/login"): self.login,
+            ("GET", "/api/me"): self.me,
+            ("GET", "/api/me/profit"): self.profit_series,
+            ("POST", "/api/password"): self.change_password,
+            ("POST", "/api/admin/settle"): self.settle,
+            ("GET", "/api/health"): self.health,
+        }
+        self._paths = {path for _method, path in self._routes}
+
+    # ---------- ASGI ----------
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        method, path = scope["method"], scope["path"]
+        if method == "GET" and path == "/metrics":
+            await self._metrics(scope, send)
+            return
+        handler = self._routes.get((method, path))
+        if handler is None:
+            status = 405 if path in self._paths else 404
+            await _send_json(send, status, {"error": "method not allowed" if status == 405 else "not found"})
+            return
+
+        span = f"api.{handler.__name__}"
+        with METRICS.span(span):
+            try:
+                await self._sync()
+                body = await _read_json(receive) if method == "POST" else dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+                status, payload = 200, await handler(_headers(scope), body)
+            except ApiError as e:
+                status, payload = e.status, {"error": str(e)}
+            except HashBusyError:
+                status, payload = 503, {"error": BUSY_MSG}
+            except (ConflictError, WriteConflict) as e:
+                status, payload = 409, {"error": str(e)}
+            except Exception:
+                status, payload = _failed(span, method, path)
+            await _send_json(send, status, payload)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await asyncio.to_thread(self.reload)
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": f"{type(e).__name__}: {e}"})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.writer is not None:
+                    await asyncio.to_thread(self.writer.flush)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _metrics(self, scope, send) -> None:
+        # 운영 지표(회원 수, 구간별 지연 등)는 외부에 열지 않음 → 관리자 토큰 필요
+        try:
+            await self._sync()
+            self.authenticate_admin(_headers(scope))
+        except ApiError as e:
+            await _send_json(send, e.status, {"error": str(e)})
+            return
+        except Exception:
+            await _send_json(send, *_failed("api.metrics", "GET", "/metrics"))
+            return
+        await _send(send, 200, METRICS.prometheus().encode("utf-8"), b"text/plain; version=0.0.4; charset=utf-8")
+
+    # ---------- 데이터 ----------
+    def reload(self) -> None:
+        # 시작 시 / 외부 변경 감지 시: 밀린 변경을 먼저 기록하고 새로 로드 (로드 중 다른 요청은 이전 데이터로 응답)
+        # 밀린 변경은 바뀐 컬럼만 compare-and-set / 수익은 증감으로 기록 → 다른 프로세스가 먼저 커밋한 값을 덮어쓰지 않음
+        with self._reload_lock:
+            if self._storage is None:
+                self._storage = open_storage()
+            if self.writer is None:
+                self.writer = WriteBehind(self._storage)
+            else:
+                self.writer.flush()
+            df = self._storage.load_members()
+            if df is None:
+                raise RuntimeError("회원 데이터가 없습니다. Streamlit 앱을 먼저 실행해 저장소를 초기화하세요.")
+            store = MemberStore(df)
+            store.verify_direct_referrals(repair=True)
+            lg = self._storage.load_ledger()
+            journal = LedgerJournal(self._storage, lg if lg is not None else pd.DataFrame(columns=LEDGER_COLS))
+            self.writer.attach(store, journal)
+            self.store, self.journal, self.rates = store, journal, load_rates()
+
+    async def _sync(self) -> None:
+        # 요청마다 저장소 버전만 확인 (SQLite: PRAGMA data_version / CSV: 파일 크기·수정 시각)
+        if self.store is None or self._storage.changed_externally():
+            await asyncio.to_thread(self.reload)
+
+    # ---------- 토큰 ----------
+    def issue_token(self, user_id: str) -> tuple:
+        expires = int(time.time()) + TOKEN_TTL
+        uid = base64.urlsafe_b64encode(user_id.encode("utf-8")).decode("ascii").rstrip("=")
+        return f"{uid}.{expires}.{self._sign(user_id, expires)}", expires
+
+    def _sign(self, user_id: str, expires: int) -> str:
+        # 저장된 비밀번호 해시를 서명에 섞음 → 비밀번호가 바뀌면 이전 토큰은 검증 실패
+        pw = self.store.get(user_id, "PW", "")
+        msg = f"{user_id}\n{expires}\n{pw}".encode("utf-8")
+        return hmac.new(API_SECRET.encode("utf-8"), msg, hashlib.sha256).hexdigest()
+
+    def authenticate(self, headers: dict) -> str:
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        try:
+            uid, expires, sig = token.split(".")
+            user_id = base64.urlsafe_b64decode(uid + "=" * (-len(uid) % 4)).decode("utf-8")
+            expires = int(expires)
+        except ValueError:
+            raise ApiError(401, "로그인이 필요합니다.") from None
+        if scheme.lower() != "bearer" or expires < time.time() or user_id not in self.store:
+            raise ApiError(401, "로그인이 필요합니다.")
+        if not hmac.compare_digest(sig.encode("utf-8"), self._sign(user_id, expires).encode("ascii")):
+            raise ApiError(401, "로그인이 필요합니다.")
+        return user_id
+
+    def authenticate_admin(self, headers: dict) -> str:
+        admin_id = self.authenticate(headers)
+        if not self.store.is_admin(admin_id):
+            raise ApiError(403, "관리자만 사용할 수 있습니다.")
+        return admin_id
+
+    # ---------- 엔드포인트 ----------
+    async def login(self, headers: dict, body: dict) -> dict:
+        user_id, password = str(body.get("id", "")), str(body.get("password", ""))
+        user = self.store.get_row(user_id)
+        if user is None:
+            raise ApiError(401, "정보가 일치하지 않습니다.")
+        stored = user["PW"]
+        if not await asyncio.to_thread(verify_password, password, stored):
+            raise ApiError(401, "정보가 일치하지 않습니다.")
+        # legacy plain-text → 자동 해시 마이그레이션 (로그인 화면과 동일)
+        if not str(stored).startswith("pbkdf2$"):
+            self.store.update(user_id, {"PW": await asyncio.to_thread(hash_password, password)})
+            self.writer.notify()
+        token, expires = self.issue_token(user_id)
+        return {"token": token, "expires_at": expires, "user": self.summary(user_id)}
+
+    async def me(self, headers: dict, body: dict) -> dict:
+        return self.summary(self.authenticate(headers))
+
+    async def profit_series(self, headers: dict, body: dict) -> dict:
+        user_id = self.authenticate(headers)
+        try:
+            days = min(max(int(body.get("days", 30)), 1), MAX_SERIES_DAYS)
+        except ValueError:
+            raise ApiError(400, "days 는 정수여야 합니다.") from None
+        balance = float(self.store.get(user_id, "수익($)", 0.0))
+        daily = self.journal.member_daily(user_id, days, until=datetime.now().strftime("%Y-%m-%d %H:%M:%S"), balance=balance)
+        return {"id": user_id, "profit": balance, "days": daily.to_dict("records")}
+
+    async def change_password(self, headers: dict, body: dict) -> dict:
+        user_id = self.authenticate(headers)
+        old_pw, new_pw = str(body.get("old_password", "")), str(body.get("new_password", ""))
+        if len(new_pw) < 4:
+            raise ApiError(400, "새 비밀번호는 4자 이상 입력하세요.")
+        if not await asyncio.to_thread(verify_password, old_pw, self.store.get(user_id, "PW")):
+            raise ApiError(403, "현재 비밀번호가 틀립니다.")
+        self.store.update(user_id, {"PW": await asyncio.to_thread(hash_password, new_pw)})
+        self.writer.notify()
+        token, expires = self.issue_token(user_id)
+        return {"token": token, "expires_at": expires}
+
+    async def settle(self, headers: dict, body: dict) -> dict:
+        admin_id = self.authenticate_admin(headers)
+        target_id, typ, note = str(body.get("target_id", "")), str(body.get("type", "")), str(body.get("note", ""))
+        if target_id not in self.store:
+            raise ApiError(404, "대상 회원이 존재하지 않습니다.")
+        if typ not in SETTLE_TYPES:
+            raise ApiError(400, f"정산 타입은 {', '.join(SETTLE_TYPES)} 중 하나입니다.")
+        try:
+            amount = float(body.get("amount", 0.0))
+        except (TypeError, ValueError):
+            amount = math.nan
+        if not math.isfinite(amount):
+            raise ApiError(400, "금액 오류")
+
+        store, journal, writer = self.store, self.journal, self.writer
+        apply_to_profit = typ in PROFIT_TYPES
+        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        record = {"ts": ts, "admin_id": admin_id, "target_id": target_id, "type": typ, "amount": amount, "note": note}
+
+        def commit():
+            # 관리자 화면의 정산 반영과 같은 순서: 증감 반영 → 동기 저장 → 기록 (금액 변경은 fsync)
+            if apply_to_profit:
+                store.add_profits(pd.Series({target_id: amount}))
+                writer.flush(durable=True)
+            journal.append(record, durable=apply_to_profit)
+
+        await asyncio.to_thread(commit)
+        return {"ok": True, "target_id": target_id, "profit": float(store.get(target_id, "수익($)", 0.0))}
+
+    async def health(self, headers: dict, body: dict) -> dict:
+        return {"ok": True, "members": len(self.store), "ledger": len(self.journal), "version": self.store.version}
+
+    def summary(self, user_id: str) -> dict:
+        user = self.store.get_row(user_id)
+        if user is None:
+            raise ApiError(404, "사용자 정보를 찾을 수 없습니다.")
+        legs = self.store.tree.stats(user_id)
+        return {
+            "id": user_id,
+            "name": str(user["이름"]),
+            "role": str(user["Role"]),
+            "profit": float(user["수익($)"]),
+            "direct_referrals": int(user["직추천"]),
+            "weak_leg": int(user["소실적"]),
+            "left": None if legs is None else int(legs["좌측인원"]),
+            "right": None if legs is None else int(legs["우측인원"]),
+            "downline": None if legs is None else int(legs["하위인원"]),
+            "commission_rate": round(self.rates["direct"] * 100, 4),
+        }
+
+
+def _headers(scope) -> dict:
+    return {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+
+
+async def _read_json(receive) -> dict:
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ApiError(400, "요청이 중단되었습니다.")
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > MAX_BODY:
+            raise ApiError(413, "요청 본문이 너무 큽니다.")
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            break
+    try:
+        body = json.loads(b"".join(chunks) or b"{}")
+    except ValueError:
+        raise ApiError(400, "JSON 형식이 아닙니다.") from None
+    if not isinstance(body, dict):
+        raise ApiError(400, "JSON 객체를 보내야 합니다.")
+    return body
+
+
+def _failed(span: str, method: str, path: str) -> tuple:
+    # 처리하지 못한 예외 (저장소 다시 로드 실패, DB 잠김 등) → 로그 + 오류 건수, 내부 내용은 응답에 싣지 않음
+    log.exception("%s %s failed", method, path)
+    METRICS.error(span)
+    return 500, {"error": ERROR_MSG}
+
+
+async def _send_json(send, status: int, payload: dict) -> None:
+    await _send(send, status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), b"application/json; charset=utf-8")
+
+
+async def _send(send, status: int, body: bytes, content_type: bytes) -> None:
+    headers = [(b"content-type", content_type), (b"content-length", str(len(body)).encode()), (b"cache-control", b"no-store")]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+app = TradingApi()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TRADING X mobile JSON API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("uvicorn 이 필요합니다: pip install uvicorn") from None
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,33 @@
 import streamlit as st
 import pandas as pd
-import os
 import re
-import hashlib
-import secrets
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from exports import EXPORT_MIME, ExportCache, export_formats, frame_chunks
+from ledger_store import LedgerJournal
+from metrics import METRICS, METRICS_FILE
+from member_store import ConflictError, MemberStore, count_direct_referrals
+from payout import PAYOUT_RATES_FILE, load_rates, plan_payout, read_volumes
+from persistence import WriteBehind
+from settlement import PROFIT_TYPES, SETTLE_TYPES, apply_batch, plan_batch, read_batch
+from security import HASH_POOL, HashBusyError, hash_password, verify_password
+from storage import COLUMNS, LEDGER_COLS, WriteConflict, open_storage
 
 # =========================================================
-# TRADING X  (Single-file Streamlit App)
-# - CSV 영구저장
+# TRADING X  (Streamlit 관리자/회원 화면 — 저장소·트리·정산·API 는 같은 폴더의 모듈, 의존 패키지는 requirements.txt)
+# - SQLite(WAL) 영구저장 (CSV 백엔드 선택 가능, storage.py)
 # - 비밀번호 해시(PBKDF2)
 # - 회원가입 실시간 ID 중복 체크 + 버튼 비활성화
 # - 추천인 유효성 체크
 # - 직추천 자동 집계
+# - 추천/바이너리 트리(추천인+위치) 기반 소실적 자동 계산
 # - 관리자 운영 기능(대시보드/회원 추가/인라인 편집/삭제/정산기록/리포트/조직 점검)
+# - 회원 목록: 검색 인덱스 + 서버측 필터/정렬/페이지 (현재 페이지만 전송, 편집은 ID 기준 보관)
+# - 저장: 백그라운드 writer 가 짧은 간격의 변경을 모아서 기록 (금액 변경은 즉시 동기 저장, persistence.py)
+# - 수수료 지급: 기간 거래량 + 비율표(직추천/단계/바이너리) → 전체 회원 수당을 한 번에 계산해 대량 정산으로 반영 (payout.py)
+# - 성능 계측: 페이지/탭/저장소/해시/기록 쓰기 구간 시간 → 관리자 Ops 탭 + Prometheus 텍스트 파일 (metrics.py)
 # =========================================================
 
-DB_FILE = "tradingx_db.csv"
-LEDGER_FILE = "tradingx_ledger.csv"
-
-COLUMNS = ["ID", "PW", "이름", "이메일", "연락처", "추천인", "위치", "직추천", "소실적", "수익($)", "Role"]
-LEDGER_COLS = ["ts", "admin_id", "target_id", "type", "amount", "note"]
-
 DEFAULT_ROWS = [
     {
         "ID": "admin",
@@ -51,43 +57,36 @@ DEFAULT_ROWS = [
     },
 ]
 
-# =========================
-# 0) 보안 유틸: 비밀번호 해시(PBKDF2)
-# =========================
-def hash_password(password: str, salt_hex: str | None = None) -> str:
-    if salt_hex is None:
-        salt_hex = secrets.token_hex(16)
-    salt = bytes.fromhex(salt_hex)
-    dk = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 200_000)
-    return f"pbkdf2${salt_hex}${dk.hex()}"
-
-def verify_password(password: str, stored: str) -> bool:
-    if isinstance(stored, str) and stored.startswith("pbkdf2$"):
-        try:
-            _, salt_hex, _hash_hex = stored.split("$", 2)
-            return hash_password(password, salt_hex) == stored
-        except Exception:
-            return False
-    return password == stored  # legacy plain-text fallback
+# 비밀번호 해시(PBKDF2)는 security.py 의 공용 워커 풀에서 처리
+BUSY_MSG = "요청이 많아 처리가 지연되고 있습니다. 잠시 후 다시 시도하세요."
+SEARCH_LIMIT = 1000  # 회원 검색 결과 최대 표시 건수
+GRID_PAGE_SIZES = [25, 50, 100, 200]  # 회원 목록 페이지 크기
+GRID_SORT_COLS = ["ID", "이름", "수익($)", "직추천", "소실적", "Role"]
+LEDGER_PERIODS = {"전체": None, "오늘": 0, "최근 7일": 7, "최근 30일": 30}  # 기록 필터 기간 (일)
+STORAGE_SPANS = ["load_members", "load_ledger", "save_members", "save_ledger", "append_ledger", "save_batch", "load_rollup", "save_rollup"]
+JOURNAL_SPANS = ["append_many", "append_with_members", "flush"]
+PROFIT_CHART_DAYS = 30  # 유저 대시보드 수익 차트 기간 (일)
+REPORT_TOP_N = 20  # 리포트 상위 목록 크기
+PROFIT_BINS = [-1, 0, 100, 500, 1000, 3000, 10000, 10**18]  # 수익 분포 구간
+PROFIT_BUCKETS = ["0", "0~100", "100~500", "500~1K", "1K~3K", "3K~10K", "10K+"]
+REPORT_PERIODS = {"일": ("day", 14), "주": ("week", 12), "월": ("month", 12)}  # 기간별 지급 리포트 (단위, 표시 기간 수)
+GRID_EDIT_COLS = ["이름", "이메일", "연락처", "추천인", "위치", "수익($)", "Role"]
 
 
 # =========================
 # 1) DB / Ledger 로드/세이브
 # =========================
+@st.cache_resource
+def get_storage():
+    # 저장소 읽기/쓰기는 메서드별 계측 구간(storage.*)으로 감쌈
+    return METRICS.instrument(open_storage(), "storage", STORAGE_SPANS)
+
+STORAGE = get_storage()
+METRICS.start_exporter()  # TRADINGX_METRICS_FILE 이 있을 때만, 프로세스당 1회
+
 def load_db() -> pd.DataFrame:
-    if os.path.exists(DB_FILE):
-        df = pd.read_csv(DB_FILE, dtype=str)
-        for c in COLUMNS:
-            if c not in df.columns:
-                df[c] = ""
-        df = df[COLUMNS].copy()
-
-        df["직추천"] = pd.to_numeric(df["직추천"], errors="coerce").fillna(0).astype(int)
-        df["소실적"] = pd.to_numeric(df["소실적"], errors="coerce").fillna(0).astype(int)
-        df["수익($)"] = pd.to_numeric(df["수익($)"], errors="coerce").fillna(0.0).astype(float)
-        df["Role"] = df["Role"].fillna("user")
-        df["추천인"] = df["추천인"].fillna("-")
-        df["위치"] = df["위치"].fillna("-")
+    df = STORAGE.load_members()
+    if df is not None:
         return df
 
     df = pd.DataFrame(DEFAULT_ROWS)
@@ -97,54 +96,88 @@ def load_db() -> pd.DataFrame:
     save_db(df)
     return df
 
-def save_db(df: pd.DataFrame) -> None:
-    df = df.copy()
-    for c in COLUMNS:
-        if c not in df.columns:
-            df[c] = ""
-    df = df[COLUMNS]
-    df.to_csv(DB_FILE, index=False)
+def save_db(df: pd.DataFrame, changed: pd.DataFrame | None = None, deleted: list | None = None) -> None:
+    # changed/deleted 를 주면 SQLite 는 해당 행만 트랜잭션으로 반영 (CSV 는 전체 재작성)
+    STORAGE.save_members(df, changed=changed, deleted=deleted)
+
+def persist_members(store: MemberStore, durable: bool = False) -> None:
+    # store 가 기록한 변경분(직추천/소실적 파생 갱신 포함)은 백그라운드 writer 가 모아서 저장 (UI 는 디스크를 기다리지 않음)
+    # durable=True (금액 변경): 밀린 회원/기록 변경까지 지금 동기 저장
+    if durable:
+        WRITER.flush(durable=True)
+    else:
+        WRITER.notify()
 
 def load_ledger() -> pd.DataFrame:
-    if os.path.exists(LEDGER_FILE):
-        lg = pd.read_csv(LEDGER_FILE, dtype=str)
-        for c in LEDGER_COLS:
-            if c not in lg.columns:
-                lg[c] = ""
-        lg = lg[LEDGER_COLS].copy()
-        lg["amount"] = pd.to_numeric(lg["amount"], errors="coerce").fillna(0.0).astype(float)
+    lg = STORAGE.load_ledger()
+    if lg is not None:
         return lg
     lg = pd.DataFrame(columns=LEDGER_COLS)
     save_ledger(lg)
     return lg
 
 def save_ledger(lg: pd.DataFrame) -> None:
-    lg = lg.copy()
-    for c in LEDGER_COLS:
-        if c not in lg.columns:
-            lg[c] = ""
-    lg = lg[LEDGER_COLS]
-    lg.to_csv(LEDGER_FILE, index=False)
+    STORAGE.save_ledger(lg)
 
 def recalc_direct_referrals(df: pd.DataFrame) -> pd.DataFrame:
-    counts = df["추천인"].value_counts().to_dict()
+    # 전체 재계산(벡터화). 평상시 직추천은 MemberStore 가 증감으로 유지
     df = df.copy()
-    df["직추천"] = df["ID"].map(lambda x: int(counts.get(x, 0)))
+    df["직추천"] = count_direct_referrals(df)
     return df
 
+def repair_direct_referrals(store: MemberStore) -> pd.DataFrame:
+    # 점검/복구: 어긋난 행만 고쳐서 저장하고 어긋난 목록을 돌려준다
+    drift = store.verify_direct_referrals(repair=True)
+    persist_members(store)
+    return drift
+
 
 # =========================
-# 2) 세션 초기화
+# 2) 공용 데이터 / 세션 초기화
+# - 회원/기록은 프로세스당 1벌만 로드해서 모든 세션이 복사 없이 공유
+# - 변경은 MemberStore 의 copy-on-write + version 으로 다른 세션의 다음 rerun 에 반영
+# - 세션 시작/재실행은 읽기 전용: 저장소 쓰기 없음, 다른 프로세스가 저장소를 바꾼 경우에만 다시 로드
 # =========================
-def init_state():
-    if "db" not in st.session_state:
-        st.session_state.db = load_db()
-        st.session_state.db = recalc_direct_referrals(st.session_state.db)
-        save_db(st.session_state.db)
-
-    if "ledger" not in st.session_state:
-        st.session_state.ledger = load_ledger()
+@st.cache_resource
+def get_store() -> MemberStore:
+    # 파생 필드(직추천/소실적) 점검은 로드 시 1회 — 어긋난 행은 메모리에서만 고치고 다음 저장 때 함께 기록
+    with METRICS.span("startup.members"):
+        store = MemberStore(load_db())
+        store.verify_direct_referrals(repair=True)
+    return store
+
+@st.cache_resource
+def get_journal() -> LedgerJournal:
+    with METRICS.span("startup.ledger"):
+        journal = LedgerJournal(STORAGE, load_ledger())
+    return METRICS.instrument(journal, "ledger", JOURNAL_SPANS)
+
+@st.cache_resource
+def get_exports() -> ExportCache:
+    return ExportCache()
+
+@st.cache_resource
+def get_writer() -> WriteBehind:
+    return METRICS.instrument(WriteBehind(STORAGE), "writer", ["flush"])
+
+WRITER = get_writer()
+
+def sync_external_changes() -> None:
+    # 재실행마다 저장소 버전만 확인 (SQLite: PRAGMA data_version / CSV: 파일 크기·수정 시각)
+    # 다시 로드하기 전에 아직 저장하지 않은 변경을 먼저 기록 (바뀐 컬럼만 compare-and-set, 수익은 증감 → 외부 변경을 덮어쓰지 않음)
+    if STORAGE.changed_externally():
+        WRITER.flush()
+        get_store.clear()
+        get_journal.clear()
+        get_exports().clear()
+
+sync_external_changes()
+STORE = get_store()
+JOURNAL = get_journal()
+EXPORTS = get_exports()
+WRITER.attach(STORE, JOURNAL)
 
+def init_state():
     if "page" not in st.session_state:
         st.session_state.page = "login"
 
@@ -221,41 +254,143 @@ def goto(page: str):
     st.rerun()
 
 def get_user_row(user_id: str):
-    df = st.session_state.db
-    u = df[df["ID"] == user_id]
-    return None if u.empty else u.iloc[0]
+    return STORE.get_row(user_id)
 
 def is_admin(user_id: str) -> bool:
-    u = get_user_row(user_id)
-    return (u is not None) and (str(u.get("Role", "user")).lower() == "admin")
+    return STORE.is_admin(user_id)
 
 def now_ts():
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-def log_ledger(admin_id: str, target_id: str, typ: str, amount: float = 0.0, note: str = ""):
-    lg = st.session_state.ledger.copy()
+def log_ledger(admin_id: str, target_id: str, typ: str, amount: float = 0.0, note: str = "", durable: bool = False):
+    # append-only: 기록 1건 추가 (전체 재작성 없음). 금액 반영 기록은 durable=True 로 fsync
     row = {"ts": now_ts(), "admin_id": admin_id, "target_id": target_id, "type": typ, "amount": float(amount), "note": note}
-    lg = pd.concat([lg, pd.DataFrame([row])], ignore_index=True)
-    st.session_state.ledger = lg
-    save_ledger(lg)
+    JOURNAL.append(row, durable=durable)
+
+def export_members(fmt: str) -> bytes:
+    # 다운로드 클릭 시에만 호출 → 같은 version 이면 만들어 둔 파일 재사용
+    version, df = STORE.snapshot()
+    return EXPORTS.read("members", fmt, version, lambda: frame_chunks(df))
+
+def export_ledger(fmt: str) -> bytes:
+    # 기록은 append-only → 행 수가 곧 version
+    n = len(JOURNAL)
+    return EXPORTS.read("ledger", fmt, n, lambda: JOURNAL.chunks(n=n))
+
+def export_popover(label: str, key: str, file_stem: str, export) -> None:
+    with st.popover(label, use_container_width=True):
+        fmt = st.radio("형식", export_formats(), horizontal=True, key=key)
+        st.download_button(
+            "다운로드",
+            data=lambda: export(fmt),
+            file_name=f"{file_stem}.{fmt}",
+            mime=EXPORT_MIME[fmt],
+            on_click="ignore",
+            use_container_width=True,
+        )
+
+def member_changes(store: MemberStore, pending: dict) -> pd.DataFrame:
+    # 저장 대기 편집(ID → {컬럼: 값})을 현재 값과 ID 기준으로 한 번에 비교
+    # → 실제로 바뀐 셀만 [ID, 컬럼, 이전, 이후] (편집 건수에 비례, 전체 테이블 비교 없음)
+    cols = ["ID", "컬럼", "이전", "이후"]
+    ids = [uid for uid in pending if uid in store]
+    if not ids:
+        return pd.DataFrame(columns=cols)
+    after = pd.DataFrame.from_dict({uid: pending[uid] for uid in ids}, orient="index")
+    touched = pd.DataFrame.from_dict({uid: dict.fromkeys(pending[uid], True) for uid in ids}, orient="index")
+    touched = touched.reindex(index=after.index, columns=after.columns).fillna(False).astype(bool)
+    for c in ("추천인", "위치"):
+        if c in after.columns:
+            after[c] = after[c].fillna("-").astype(str)
+    if "Role" in after.columns:
+        after["Role"] = after["Role"].fillna("user").astype(str)
+    if "수익($)" in after.columns:
+        after["수익($)"] = pd.to_numeric(after["수익($)"], errors="coerce")  # 숫자가 아니면 NaN → 검증에서 거부
+    before = store.rows(ids).set_index("ID")[after.columns]
+
+    a, b = after.astype(object), before.astype(object)
+    changed = touched & (a != b) & ~(a.isna() & b.isna())
+    changed = changed.stack()
+    changed = changed[changed].index
+    return pd.DataFrame(
+        {
+            "ID": changed.get_level_values(0),
+            "컬럼": changed.get_level_values(1),
+            "이전": [b.at[u, c] for u, c in changed],
+            "이후": [a.at[u, c] for u, c in changed],
+        },
+        columns=cols,
+    )
 
-def sanitize_user_df(df: pd.DataFrame) -> pd.DataFrame:
-    # 타입 안정화 + 컬럼 유지
-    df = df.copy()
-    for c in COLUMNS:
-        if c not in df.columns:
-            df[c] = ""
-    df = df[COLUMNS]
-
-    df["ID"] = df["ID"].astype(str)
-    df["Role"] = df["Role"].fillna("user").astype(str)
-    df["추천인"] = df["추천인"].fillna("-").astype(str)
-    df["위치"] = df["위치"].fillna("-").astype(str)
-
-    df["직추천"] = pd.to_numeric(df["직추천"], errors="coerce").fillna(0).astype(int)
-    df["소실적"] = pd.to_numeric(df["소실적"], errors="coerce").fillna(0).astype(int)
-    df["수익($)"] = pd.to_numeric(df["수익($)"], errors="coerce").fillna(0.0).astype(float)
-    return df
+
+def validate_member_changes(store: MemberStore, changes: pd.DataFrame) -> list:
+    # 바뀐 셀만 점검 → 오류 메시지 목록
+    errors = []
+    col, val = changes["컬럼"], changes["이후"]
+    rec = changes[(col == "추천인") & (val != "-")]
+    bad = rec[[v not in store for v in rec["이후"]]]
+    if len(bad):
+        errors.append(f"존재하지 않는 추천인: {', '.join(f'{u}→{v}' for u, v in zip(bad['ID'], bad['이후']))}")
+    bad = changes[(col == "수익($)") & val.isna()]
+    if len(bad):
+        errors.append(f"수익($) 값이 숫자가 아님: {', '.join(bad['ID'])}")
+    bad = changes[(col == "위치") & ~val.isin(["-", "Left", "Right"])]
+    if len(bad):
+        errors.append(f"위치 값 오류: {', '.join(bad['ID'])}")
+    bad = changes[(col == "Role") & ~val.isin(["user", "admin"])]
+    if len(bad):
+        errors.append(f"Role 값 오류: {', '.join(bad['ID'])}")
+    return errors
+
+
+def member_report(store: MemberStore) -> dict:
+    # 리포트 탭 계산 (store version 별 캐시 → 변경이 없는 재실행에서는 재계산 없음)
+    # 상위 목록은 전체 정렬 대신 부분 선택 (수익: store 가 유지하는 상위 힙 / 직추천·소실적: nlargest)
+    def compute(df: pd.DataFrame) -> dict:
+        users = df[df["Role"].str.lower() != "admin"]
+        dist = None
+        if not users.empty:
+            buckets = pd.cut(users["수익($)"], bins=PROFIT_BINS, labels=PROFIT_BUCKETS)
+            dist = buckets.value_counts().reindex(PROFIT_BUCKETS).fillna(0).astype(int)
+        top_ids = [uid for uid, _ in store.top_profit(REPORT_TOP_N)]
+        return {
+            "dist": dist,
+            "top_profit": store.rows(top_ids)[["ID", "이름", "수익($)", "직추천", "소실적", "추천인", "위치", "Role"]],
+            "top_direct": df.nlargest(REPORT_TOP_N, "직추천")[["ID", "이름", "직추천", "수익($)", "소실적", "추천인", "위치", "Role"]],
+            "top_weak": store.tree_stats().nlargest(REPORT_TOP_N, ["소실적", "소실적($)"])[
+                ["ID", "소실적", "소실적($)", "좌측인원", "우측인원", "좌측실적", "우측실적", "하위인원", "깊이"]
+            ],
+        }
+
+    return store.cached("member_report", compute)
+
+
+def seen_row(key: str, store: MemberStore, uid) -> tuple:
+    # 낙관적 동시성: 이 화면에서 대상을 처음 보여준 시점의 (행 버전, 행 값) — 같은 대상이 선택돼 있는 동안 유지
+    seen = st.session_state.setdefault("seen_rows", {})
+    uid = str(uid)
+    if key not in seen or seen[key][0] != uid:
+        row = store.get_row(uid)
+        seen[key] = (uid, store.row_version(uid), None if row is None else row.to_dict())
+    return seen[key][1], seen[key][2]
+
+
+def forget_row(key: str) -> None:
+    st.session_state.get("seen_rows", {}).pop(key, None)
+
+
+def page_edits(before: pd.DataFrame, after: pd.DataFrame) -> dict:
+    # 편집기에 보낸 페이지와 돌려받은 결과를 비교 → {ID: {컬럼: 새 값}} (바뀐 셀만)
+    if before.empty:
+        return {}
+    a = after.reindex(index=before.index)[GRID_EDIT_COLS]
+    b = before[GRID_EDIT_COLS]
+    changed = (a != b) & ~(a.isna() & b.isna())
+    out = {}
+    for label in changed.index[changed.any(axis=1)]:
+        cols = changed.columns[changed.loc[label]]
+        out[str(before.at[label, "ID"])] = {c: a.at[label, c] for c in cols}
+    return out
 
 
 # =========================
@@ -272,23 +407,26 @@ def login_page():
     col1, col2 = st.columns(2)
     with col1:
         if st.button("로그인", use_container_width=True, type="primary"):
-            df = st.session_state.db
-            user = df[df["ID"] == l_id]
-            if user.empty:
+            store = STORE
+            user = store.get_row(l_id)
+            if user is None:
                 st.error("정보가 일치하지 않습니다.")
             else:
-                stored = user.iloc[0]["PW"]
-                if verify_password(l_pw, stored):
+                stored = user["PW"]
+                try:
+                    ok = verify_password(l_pw, stored)
                     # legacy plain-text → 자동 해시 마이그레이션
-                    if not str(stored).startswith("pbkdf2$"):
-                        idx = df.index[df["ID"] == l_id][0]
-                        st.session_state.db.at[idx, "PW"] = hash_password(l_pw)
-                        save_db(st.session_state.db)
-
-                    st.session_state.current_user = l_id
-                    goto("user")
+                    if ok and not str(stored).startswith("pbkdf2$"):
+                        store.update(l_id, {"PW": hash_password(l_pw)})
+                        persist_members(store)
+                except HashBusyError:
+                    st.error(BUSY_MSG)
                 else:
-                    st.error("정보가 일치하지 않습니다.")
+                    if ok:
+                        st.session_state.current_user = l_id
+                        goto("user")
+                    else:
+                        st.error("정보가 일치하지 않습니다.")
     with col2:
         if st.button("회원가입", use_container_width=True):
             goto("signup")
@@ -310,13 +448,13 @@ def signup_page():
     phone = st.text_input("연락처")
     recommender = st.text_input("추천인(ID) (없으면 -)")
 
-    df = st.session_state.db
+    store = STORE
 
     id_format_ok = bool(re.fullmatch(r"[A-Za-z0-9_]{4,20}", new_id or ""))
     if new_id and not id_format_ok:
         st.warning("아이디는 영문/숫자/언더바만, 4~20자만 가능합니다.")
 
-    id_exists = bool(new_id) and (df["ID"] == new_id).any()
+    id_exists = bool(new_id) and (new_id in store)
     if id_exists:
         st.error("이미 존재하는 아이디입니다. 다른 아이디를 입력하세요.")
 
@@ -324,7 +462,7 @@ def signup_page():
     if new_pw and not pw_ok:
         st.warning("비밀번호는 4자 이상 입력하세요.")
 
-    recommender_invalid = bool(recommender) and recommender != "-" and not (df["ID"] == recommender).any()
+    recommender_invalid = bool(recommender) and recommender != "-" and (recommender not in store)
     if recommender_invalid:
         st.warning("추천인 ID가 존재하지 않습니다. '-' 로 입력하거나 정확히 입력하세요.")
 
@@ -333,28 +471,33 @@ def signup_page():
     col1, col2 = st.columns(2)
     with col1:
         if st.button("가입하기", type="primary", use_container_width=True, disabled=not can_submit):
-            new_row = {
-                "ID": new_id,
-                "PW": hash_password(new_pw),
-                "이름": name if name else new_id,
-                "이메일": email,
-                "연락처": phone,
-                "추천인": recommender if recommender else "-",
-                "위치": "-",
-                "직추천": 0,
-                "소실적": 0,
-                "수익($)": 0.0,
-                "Role": "user",
-            }
-            df2 = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-            df2 = sanitize_user_df(df2)
-            df2 = recalc_direct_referrals(df2)
-
-            st.session_state.db = df2
-            save_db(df2)
-
-            st.success("회원가입 완료! 로그인 해주세요.")
-            goto("login")
+            try:
+                pw_hash = hash_password(new_pw)
+            except HashBusyError:
+                st.error(BUSY_MSG)
+            else:
+                new_row = {
+                    "ID": new_id,
+                    "PW": pw_hash,
+                    "이름": name if name else new_id,
+                    "이메일": email,
+                    "연락처": phone,
+                    "추천인": recommender if recommender else "-",
+                    "위치": "-",
+                    "직추천": 0,
+                    "소실적": 0,
+                    "수익($)": 0.0,
+                    "Role": "user",
+                }
+                try:
+                    store.add(new_row)
+                except KeyError:
+                    # 중복 확인과 생성 사이에 다른 세션이 같은 ID 로 먼저 가입한 경우
+                    st.error("이미 존재하는 아이디입니다. 다른 아이디를 입력하세요.")
+                else:
+                    persist_members(store)
+                    st.success("회원가입 완료! 로그인 해주세요.")
+                    goto("login")
 
     with col2:
         if st.button("취소", use_container_width=True):
@@ -398,16 +541,25 @@ def user_dashboard():
     with c2:
         st.success("📉 **Weak Leg Members**")
         st.subheader(f"{int(user_info['소실적'])} 명")
+        legs = STORE.tree.stats(user_info["ID"])
+        if legs is not None:
+            st.caption(f"Left {legs['좌측인원']:,}명 · Right {legs['우측인원']:,}명 · 하위 {legs['하위인원']:,}명")
     with c3:
         st.warning("💰 **Commission Rate**")
-        st.subheader("17.5 %")
+        try:
+            st.subheader(f"{load_rates()['direct'] * 100:g} %")
+        except ValueError:
+            st.subheader("- %")
 
     st.write("---")
     l_col, r_col = st.columns([2, 1])
 
     with l_col:
-        st.subheader("📊 수익 리포트(샘플)")
-        st.area_chart([200, 450, 300, 600, 800, 750, 1100])
+        # 회원별 일별 집계에서 이 회원 구간만 읽음 (전체 기록을 훑지 않음), 잔액은 현재 수익($) 기준 역산
+        st.subheader(f"📊 수익 리포트 (최근 {PROFIT_CHART_DAYS}일)")
+        daily = JOURNAL.member_daily(user_info["ID"], PROFIT_CHART_DAYS, until=now_ts(), balance=float(user_info["수익($)"]))
+        st.area_chart(daily.set_index("date")["balance"].rename("잔액($)"))
+        st.caption(f"기간 증감 ${float(daily['amount'].sum()):+,.2f} · 지급/조정 {int(daily['count'].sum()):,}건")
 
     with r_col:
         st.subheader("⚙️ Quick Menu")
@@ -444,20 +596,24 @@ def pw_manage_page():
     col1, col2 = st.columns(2)
     with col1:
         if st.button("변경하기", type="primary", use_container_width=True):
-            if not verify_password(old_pw, user_info["PW"]):
-                st.error("현재 비밀번호가 틀립니다.")
-                return
             if not new_pw or len(new_pw) < 4:
                 st.error("새 비밀번호는 4자 이상 입력하세요.")
                 return
             if new_pw != new_pw2:
                 st.error("새 비밀번호가 일치하지 않습니다.")
                 return
+            try:
+                if not verify_password(old_pw, user_info["PW"]):
+                    st.error("현재 비밀번호가 틀립니다.")
+                    return
+                pw_hash = hash_password(new_pw)
+            except HashBusyError:
+                st.error(BUSY_MSG)
+                return
 
-            df = st.session_state.db
-            idx = df.index[df["ID"] == user_id][0]
-            st.session_state.db.at[idx, "PW"] = hash_password(new_pw)
-            save_db(st.session_state.db)
+            store = STORE
+            store.update(user_id, {"PW": pw_hash})
+            persist_members(store)
 
             st.success("비밀번호가 변경되었습니다.")
             goto("user")
@@ -481,23 +637,22 @@ def admin_page():
         goto("user")
 
     admin_id = st.session_state.current_user
-    df = st.session_state.db.copy()
-    lg = st.session_state.ledger.copy()
+    store = STORE
 
     # ===== KPI =====
-    total_users = int((df["Role"].str.lower() != "admin").sum())
-    total_admin = int((df["Role"].str.lower() == "admin").sum())
-    total_profit = float(df["수익($)"].sum())
-    avg_profit = float(df[df["Role"].str.lower() != "admin"]["수익($)"].mean()) if total_users > 0 else 0.0
-    top_user = df.sort_values("수익($)", ascending=False).iloc[0]
-    orphan_cnt = int(((df["추천인"] != "-") & (~df["추천인"].isin(df["ID"]))).sum())
+    # KPI 는 store 가 변경 시마다 증감 유지 → 화면 재실행마다 전체 집계하지 않음
+    kpi = store.kpis()
+    total_admin, total_users = kpi["total_admin"], kpi["total_users"]
+    total_profit, avg_profit = kpi["total_profit"], kpi["avg_profit"]
+    top_id, top_profit = kpi["top_user"]
+    orphan_cnt = kpi["orphan_cnt"]
 
     st.markdown(
         f"""
 <div class="admin-wrap">
   <div class="admin-card"><div class="label">Total Users</div><div class="value">{total_users:,}</div><div class="sub">Admins: {total_admin}</div></div>
   <div class="admin-card"><div class="label">Total Profit (All)</div><div class="value">${total_profit:,.2f}</div><div class="sub">Avg/User: ${avg_profit:,.2f}</div></div>
-  <div class="admin-card"><div class="label">Top Performer</div><div class="value">{str(top_user["ID"])}</div><div class="sub">${float(top_user["수익($)"]):,.2f}</div></div>
+  <div class="admin-card"><div class="label">Top Performer</div><div class="value">{top_id}</div><div class="sub">${top_profit:,.2f}</div></div>
   <div class="admin-card"><div class="label">Data Alerts</div><div class="value">{orphan_cnt}</div><div class="sub">Invalid recommender</div></div>
 </div>
 """,
@@ -510,50 +665,80 @@ def admin_page():
         q = st.text_input("🔎 Search (ID/이름/이메일/추천인)", "")
     with colB:
         if st.button("🔄 직추천 재계산", use_container_width=True):
-            st.session_state.db = recalc_direct_referrals(st.session_state.db)
-            save_db(st.session_state.db)
-            log_ledger(admin_id, "-", "recalc_referrals", 0.0, "직추천 재계산")
+            st.session_state.referral_drift = repair_direct_referrals(store)
+            log_ledger(admin_id, "-", "recalc_referrals", 0.0, f"직추천 재계산 (불일치 {len(st.session_state.referral_drift)}건 복구)")
             st.success("직추천 재계산 완료")
             st.rerun()
     with colC:
-        st.download_button(
-            "⬇️ DB Export",
-            data=st.session_state.db.to_csv(index=False).encode("utf-8"),
-            file_name="tradingx_db_export.csv",
-            mime="text/csv",
-            use_container_width=True,
-        )
+        # 내보내기는 클릭 시에만 생성 (gzip CSV / Parquet, 데이터 version 별 캐시)
+        export_popover("⬇️ DB Export", "db_export_fmt", "tradingx_db_export", export_members)
     with colD:
         if st.button("⬅️ Back", use_container_width=True):
             goto("user")
 
     st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
 
-    tab1, tab2, tab3, tab4 = st.tabs(["👥 회원관리", "🧾 정산/기록", "📊 리포트", "⚠️ 데이터점검"])
+    # 선택된 탭을 추적(.open) → 리포트/데이터점검/Ops 탭은 열려 있을 때만 계산
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(
+        ["👥 회원관리", "🧾 정산/기록", "📊 리포트", "⚠️ 데이터점검", "⏱️ Ops"], key="admin_tab", on_change="rerun"
+    )
 
     # -------------------
     # TAB 1: 회원관리
     # -------------------
-    with tab1:
+    with tab1, METRICS.span("admin.tab.members"):
         left, right = st.columns([2.2, 1])
 
         # (A) 회원 테이블 + 인라인 편집
         with left:
-            df_view = df.copy()
-            if q.strip():
-                mask = (
-                    df_view["ID"].str.contains(q, case=False, na=False)
-                    | df_view["이름"].str.contains(q, case=False, na=False)
-                    | df_view["이메일"].str.contains(q, case=False, na=False)
-                    | df_view["추천인"].str.contains(q, case=False, na=False)
-                )
-                df_view = df_view[mask].copy()
-
             st.markdown("<div class='panel'>", unsafe_allow_html=True)
             st.subheader("회원 목록 (인라인 편집 가능)")
-            st.caption("PW는 보안상 편집/표시하지 않습니다. 비번 변경은 오른쪽 패널 또는 '정산/기록' 탭에서.")
+            st.caption("PW는 보안상 편집/표시하지 않습니다. 비번 변경은 오른쪽 패널 또는 '정산/기록' 탭에서. 직추천/소실적은 추천 트리에서 자동 계산됩니다.")
+
+            # 필터/정렬/페이지는 서버(store)에서 처리 → 현재 페이지 행만 브라우저로 전송
+            g1, g2, g3, g4, g5 = st.columns([1.2, 1, 1, 1, 1])
+            with g1:
+                sort_by = st.selectbox("정렬", ["등록순", *GRID_SORT_COLS], key="grid_sort")
+            with g2:
+                sort_dir = st.selectbox("방향", ["오름차순", "내림차순"], key="grid_dir")
+            with g3:
+                role_f = st.selectbox("Role", ["전체", "user", "admin"], key="grid_role")
+            with g4:
+                pos_f = st.selectbox("위치", ["전체", "-", "Left", "Right"], key="grid_pos")
+            with g5:
+                page_size = st.selectbox("페이지 크기", GRID_PAGE_SIZES, index=1, key="grid_size")
+
+            hits = None
+            if q.strip():
+                # 검색 인덱스 사용 (입력할 때마다 전체 테이블을 스캔하지 않음)
+                hits = store.search(q, limit=SEARCH_LIMIT)
+                if len(hits) >= SEARCH_LIMIT:
+                    st.caption(f"검색 결과가 많아 상위 {SEARCH_LIMIT:,}건만 표시합니다. 검색어를 더 구체적으로 입력하세요.")
+            query = dict(
+                ids=hits,
+                sort_by=None if sort_by == "등록순" else sort_by,
+                ascending=sort_dir == "오름차순",
+                role=None if role_f == "전체" else role_f,
+                position=None if pos_f == "전체" else pos_f,
+            )
+            _, total = store.page(**query, limit=0)
+            pages = max(1, -(-total // page_size))
+            st.session_state.grid_page = min(st.session_state.get("grid_page", 1), pages)  # 필터 변경으로 페이지 수가 줄어든 경우
+            page_no = st.number_input(f"페이지 (총 {pages:,} / {total:,}명)", min_value=1, max_value=pages, step=1, key="grid_page")
+            df_view, _ = store.page(**query, offset=(int(page_no) - 1) * page_size, limit=page_size)
+
+            # 저장 전 편집 내용은 ID 기준으로 보관 → 페이지/정렬을 바꿔도 유지, 어느 페이지에서든 저장
+            # 편집이 처음 들어온 회원은 직전 화면에 보낸 (행 버전, 값)을 기준으로 보관 → 저장 시 충돌 검사
+            pending = st.session_state.setdefault("member_edits", {})
+            edit_seen = st.session_state.setdefault("member_edit_seen", {})
+            shown = st.session_state.get("grid_shown", {})
             edit_cols = ["ID", "이름", "이메일", "연락처", "추천인", "위치", "소실적", "수익($)", "Role"]
             editable = df_view[edit_cols].copy()
+            for uid, fields in pending.items():
+                label = store.label(uid)
+                if label in editable.index:
+                    for col, val in fields.items():
+                        editable.at[label, col] = val
 
             edited = st.data_editor(
                 editable,
@@ -563,42 +748,82 @@ def admin_page():
                 num_rows="fixed",
                 column_config={
                     "ID": st.column_config.TextColumn("ID", disabled=True),
+                    "소실적": st.column_config.NumberColumn("소실적", disabled=True),
                     "Role": st.column_config.SelectboxColumn("Role", options=["user", "admin"]),
                     "위치": st.column_config.SelectboxColumn("위치", options=["-", "Left", "Right"]),
                 },
             )
+            for uid, fields in page_edits(editable, edited).items():
+                pending.setdefault(uid, {}).update(fields)
+                if uid not in edit_seen:
+                    edit_seen[uid] = shown.get(uid) or (store.row_version(uid), store.get_row(uid).to_dict())
+            page_ids = df_view["ID"].astype(str).tolist()
+            st.session_state.grid_shown = dict(
+                zip(page_ids, zip(store.versions(page_ids).values(), df_view[["ID", *GRID_EDIT_COLS]].to_dict("records")))
+            )
+            if pending:
+                st.caption(f"저장 대기 중인 변경: {len(pending):,}명")
 
             c1, c2 = st.columns([1, 1])
             with c1:
                 if st.button("💾 변경 저장", use_container_width=True, type="primary"):
-                    # 원본 df에 edited 반영
-                    df2 = st.session_state.db.copy()
-
-                    for _, row in edited.iterrows():
-                        uid = str(row["ID"])
-                        idxs = df2.index[df2["ID"] == uid].tolist()
-                        if not idxs:
-                            continue
-                        idx = idxs[0]
-                        for col in ["이름", "이메일", "연락처", "추천인", "위치", "소실적", "수익($)", "Role"]:
-                            df2.at[idx, col] = row[col]
-
-                    df2 = sanitize_user_df(df2)
-
-                    # 추천인 유효성 전체 점검
-                    bad = (df2["추천인"] != "-") & (~df2["추천인"].isin(df2["ID"]))
-                    if bad.any():
-                        st.error("저장 실패: 존재하지 않는 추천인이 포함되어 있습니다. (데이터점검 탭에서 확인)")
+                    # 모든 페이지에서 모은 편집 내용(ID 기준) 중 실제로 바뀐 셀만 검증/저장
+                    changes = member_changes(store, pending)
+                    errors = validate_member_changes(store, changes)
+                    if changes.empty:
+                        pending.clear()
+                        edit_seen.clear()
+                        st.info("변경된 내용이 없습니다.")
+                    elif errors:
+                        for msg in errors:
+                            st.error(f"저장 실패: {msg}")
                     else:
-                        df2 = recalc_direct_referrals(df2)
-                        st.session_state.db = df2
-                        save_db(df2)
-                        log_ledger(admin_id, "-", "bulk_update_users", 0.0, "인라인 편집 저장")
-                        st.success("저장 완료")
-                        st.rerun()
+                        fields_by_id = {}
+                        for uid, col, val in zip(changes["ID"], changes["컬럼"], changes["이후"]):
+                            fields_by_id.setdefault(uid, {})[col] = val
+                        # 회원별 필드 변경 내역 + 필드별 건수 요약 (수익 변경이 있으면 즉시 동기 저장 + fsync)
+                        money = bool((changes["컬럼"] == "수익($)").any())
+                        try:
+                            store.update_many(
+                                fields_by_id,
+                                expected={u: edit_seen[u][0] for u in fields_by_id if u in edit_seen},
+                                base={u: edit_seen[u][1] for u in fields_by_id if u in edit_seen},
+                            )
+                        except ConflictError as e:
+                            # 충돌 회원은 현재 값을 새 기준으로 → 확인 후 다시 저장하면 편집한 값으로 반영 (삭제된 회원 편집은 제외)
+                            for uid in e.ids:
+                                if uid in store:
+                                    edit_seen[uid] = (store.row_version(uid), store.get_row(uid).to_dict())
+                                else:
+                                    pending.pop(uid, None)
+                                    edit_seen.pop(uid, None)
+                            st.error(f"다른 관리자가 먼저 변경한 회원이 있어 저장하지 않았습니다 ({len(e.ids)}명). 현재 값을 확인한 뒤 다시 저장하세요.")
+                            conflict = changes[changes["ID"].isin(e.ids)].rename(columns={"이전": "현재 값", "이후": "편집한 값"})
+                            st.dataframe(conflict, use_container_width=True, hide_index=True)
+                        else:
+                            persist_members(store, durable=money)
+
+                            with JOURNAL.group(durable=money):
+                                for uid, part in changes.groupby("ID", sort=False):
+                                    # 수익 편집은 증감 금액이 있는 profit_adjust 로 (일별 수익 차트/집계가 기록만으로 잔액을 재구성)
+                                    profit = part[part["컬럼"] == "수익($)"]
+                                    for b, a in zip(profit["이전"], profit["이후"]):
+                                        log_ledger(admin_id, uid, "profit_adjust", float(a) - float(b), f"인라인 편집 수익($): {b} → {a}")
+                                    part = part[part["컬럼"] != "수익($)"]
+                                    if len(part):
+                                        note = "; ".join(f"{c}: {b} → {a}" for c, b, a in zip(part["컬럼"], part["이전"], part["이후"]))
+                                        log_ledger(admin_id, uid, "update_user", 0.0, note)
+                                summary = ", ".join(f"{c} {n}" for c, n in changes["컬럼"].value_counts().items())
+                                log_ledger(admin_id, "-", "bulk_update_users", 0.0, f"인라인 편집 저장: {len(fields_by_id)}명 ({summary})")
+                            pending.clear()
+                            edit_seen.clear()
+                            st.success(f"저장 완료 ({len(fields_by_id)}명, {len(changes)}개 항목)")
+                            st.rerun()
 
             with c2:
                 if st.button("↩️ 변경 취소(새로고침)", use_container_width=True):
+                    pending.clear()
+                    edit_seen.clear()
                     st.rerun()
 
             st.markdown("</div>", unsafe_allow_html=True)
@@ -618,11 +843,10 @@ def admin_page():
             add_pos = st.selectbox("위치", ["-", "Left", "Right"], key="add_pos")
             add_role = st.selectbox("Role", ["user", "admin"], key="add_role")
 
-            df0 = st.session_state.db
             add_id_ok = bool(re.fullmatch(r"[A-Za-z0-9_]{4,20}", add_id or ""))
-            add_id_exists = bool(add_id) and (df0["ID"] == add_id).any()
+            add_id_exists = bool(add_id) and (add_id in store)
             add_pw_ok = bool(add_pw) and len(add_pw) >= 4
-            add_rec_ok = (add_rec == "-") or ((df0["ID"] == add_rec).any())
+            add_rec_ok = (add_rec == "-") or (add_rec in store)
 
             if add_id and not add_id_ok:
                 st.warning("ID 형식 오류(영문/숫자/언더바 4~20자)")
@@ -636,132 +860,262 @@ def admin_page():
             can_add = add_id_ok and (not add_id_exists) and add_pw_ok and add_rec_ok
 
             if st.button("✅ 회원 생성", use_container_width=True, disabled=not can_add):
-                new_row = {
-                    "ID": add_id,
-                    "PW": hash_password(add_pw),
-                    "이름": add_name if add_name else add_id,
-                    "이메일": add_email,
-                    "연락처": add_phone,
-                    "추천인": add_rec if add_rec else "-",
-                    "위치": add_pos,
-                    "직추천": 0,
-                    "소실적": 0,
-                    "수익($)": 0.0,
-                    "Role": add_role,
-                }
-                df2 = pd.concat([df0, pd.DataFrame([new_row])], ignore_index=True)
-                df2 = sanitize_user_df(df2)
-                df2 = recalc_direct_referrals(df2)
-                st.session_state.db = df2
-                save_db(df2)
-                log_ledger(admin_id, add_id, "create_user", 0.0, f"role={add_role}, rec={add_rec}, pos={add_pos}")
-                st.success("회원 생성 완료")
-                st.rerun()
+                try:
+                    pw_hash = hash_password(add_pw)
+                except HashBusyError:
+                    st.error(BUSY_MSG)
+                else:
+                    new_row = {
+                        "ID": add_id,
+                        "PW": pw_hash,
+                        "이름": add_name if add_name else add_id,
+                        "이메일": add_email,
+                        "연락처": add_phone,
+                        "추천인": add_rec if add_rec else "-",
+                        "위치": add_pos,
+                        "직추천": 0,
+                        "소실적": 0,
+                        "수익($)": 0.0,
+                        "Role": add_role,
+                    }
+                    try:
+                        store.add(new_row)
+                    except KeyError:
+                        st.error("다른 관리자가 방금 같은 ID 로 회원을 만들었습니다.")
+                    else:
+                        persist_members(store)
+                        log_ledger(admin_id, add_id, "create_user", 0.0, f"role={add_role}, rec={add_rec}, pos={add_pos}")
+                        st.success("회원 생성 완료")
+                        st.rerun()
 
             st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
 
             st.markdown("**🔐 비밀번호 리셋(선택 회원)**")
-            target_id = st.selectbox("대상 선택", options=df0["ID"].tolist(), key="reset_target")
+            target_id = st.selectbox("대상 선택", options=store.ids(), key="reset_target")
+            reset_ver, reset_base = seen_row("reset", store, target_id)
             reset_pw = st.text_input("새 비밀번호", type="password", key="reset_pw")
             if st.button("비번 리셋", use_container_width=True, disabled=(not reset_pw or len(reset_pw) < 4)):
                 if target_id == "admin" and admin_id != "admin":
                     st.error("admin 비밀번호는 admin 계정만 변경 가능(안전장치)")
                 else:
-                    df2 = st.session_state.db.copy()
-                    idx = df2.index[df2["ID"] == target_id][0]
-                    df2.at[idx, "PW"] = hash_password(reset_pw)
-                    st.session_state.db = df2
-                    save_db(df2)
-                    log_ledger(admin_id, target_id, "reset_password", 0.0, "관리자 리셋")
-                    st.success("비밀번호 변경 완료")
-                    st.rerun()
+                    try:
+                        pw_hash = hash_password(reset_pw)
+                    except HashBusyError:
+                        st.error(BUSY_MSG)
+                    else:
+                        try:
+                            store.update(target_id, {"PW": pw_hash}, expected=reset_ver, base=reset_base)
+                        except ConflictError:
+                            st.error("다른 관리자가 먼저 이 회원을 변경/삭제했습니다. 확인 후 다시 시도하세요.")
+                        else:
+                            persist_members(store)
+                            log_ledger(admin_id, target_id, "reset_password", 0.0, "관리자 리셋")
+                            st.success("비밀번호 변경 완료")
+                            st.rerun()
+                        finally:
+                            forget_row("reset")
 
             st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
 
             st.markdown("**🗑️ 회원 삭제**")
-            del_id = st.selectbox("삭제 대상", options=[x for x in df0["ID"].tolist()], key="del_target")
+            del_id = st.selectbox("삭제 대상", options=store.ids(), key="del_target")
+            del_ver, _ = seen_row("delete", store, del_id)
             if del_id == "admin":
                 st.info("admin 계정은 삭제할 수 없습니다.")
             else:
                 st.warning("삭제는 되돌릴 수 없습니다.")
                 if st.button("삭제 실행", use_container_width=True):
-                    df2 = st.session_state.db.copy()
-                    df2 = df2[df2["ID"] != del_id].reset_index(drop=True)
-                    df2 = recalc_direct_referrals(df2)
-                    st.session_state.db = df2
-                    save_db(df2)
-                    log_ledger(admin_id, del_id, "delete_user", 0.0, "회원 삭제")
-                    st.success("삭제 완료")
-                    st.rerun()
+                    # 선택한 뒤 다른 관리자가 바꾼 회원은 삭제하지 않음 (변경 내용을 확인하고 다시 실행)
+                    forget_row("delete")
+                    if del_ver is None or del_id not in store:
+                        st.error("이미 삭제된 회원입니다.")
+                    else:
+                        try:
+                            store.delete(del_id, expected=del_ver)
+                        except ConflictError:
+                            st.error("선택한 뒤 다른 관리자가 이 회원을 변경했습니다. 내용을 확인한 뒤 다시 실행하세요.")
+                        else:
+                            persist_members(store)
+                            log_ledger(admin_id, del_id, "delete_user", 0.0, "회원 삭제")
+                            st.success("삭제 완료")
+                            st.rerun()
 
             st.markdown("</div>", unsafe_allow_html=True)
 
     # -------------------
     # TAB 2: 정산/기록
     # -------------------
-    with tab2:
+    with tab2, METRICS.span("admin.tab.ledger"):
         st.markdown("<div class='panel'>", unsafe_allow_html=True)
         st.subheader("🧾 정산 처리 (수익 누적 업데이트 + 기록 남김)")
 
         col1, col2 = st.columns([1.2, 1])
         with col1:
-            target_id = st.selectbox("대상 회원", options=st.session_state.db["ID"].tolist(), key="settle_target")
-            typ = st.selectbox("정산 타입", ["commission_add", "profit_adjust", "bonus_add", "manual_note"], key="settle_type")
+            target_id = st.selectbox("대상 회원", options=store.ids(), key="settle_target")
+            typ = st.selectbox("정산 타입", SETTLE_TYPES, key="settle_type")
             amount = st.number_input("금액($)", value=0.0, step=10.0, key="settle_amount")
             note = st.text_input("메모", key="settle_note")
 
-            apply_to_profit = typ in ["commission_add", "profit_adjust", "bonus_add"]
+            apply_to_profit = typ in PROFIT_TYPES
 
             if st.button("정산 반영", type="primary", use_container_width=True):
-                df2 = st.session_state.db.copy()
-                if target_id not in df2["ID"].values:
+                if target_id not in store:
                     st.error("대상 회원이 존재하지 않습니다.")
                 else:
                     if apply_to_profit:
-                        idx = df2.index[df2["ID"] == target_id][0]
-                        df2.at[idx, "수익($)"] = float(df2.at[idx, "수익($)"]) + float(amount)
-                        df2 = sanitize_user_df(df2)
-                        st.session_state.db = df2
-                        save_db(df2)
+                        # 증감으로 반영 (읽고-더하고-쓰기 아님) → 동시에 정산해도 서로의 금액을 덮어쓰지 않음
+                        store.add_profits(pd.Series({str(target_id): float(amount)}))
+                        persist_members(store, durable=True)
 
-                    log_ledger(admin_id, target_id, typ, float(amount), note)
+                    log_ledger(admin_id, target_id, typ, float(amount), note, durable=apply_to_profit)
                     st.success("정산/기록 완료")
                     st.rerun()
 
         with col2:
             st.markdown("**최근 기록(상위 20)**")
-            lg2 = st.session_state.ledger.copy()
-            if not lg2.empty:
-                view = lg2.sort_values("ts", ascending=False).head(20)
-                st.dataframe(view, use_container_width=True, height=320)
+            if len(JOURNAL):
+                st.dataframe(JOURNAL.latest(20), use_container_width=True, height=320)
             else:
                 st.info("기록이 없습니다.")
 
-            st.download_button(
-                "⬇️ Ledger Export",
-                data=st.session_state.ledger.to_csv(index=False).encode("utf-8"),
-                file_name="tradingx_ledger_export.csv",
-                mime="text/csv",
-                use_container_width=True,
+            export_popover("⬇️ Ledger Export", "ledger_export_fmt", "tradingx_ledger_export", export_ledger)
+
+        st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
+        st.subheader("📥 대량 정산 (CSV/Parquet)")
+        st.caption("컬럼: target_id, type, amount, note · 업로드하면 먼저 미리보기(검증/대상별 합계)만 계산하고, 반영 버튼을 눌러야 저장됩니다.")
+        st.download_button(
+            "⬇️ 양식 다운로드",
+            data="target_id,type,amount,note\nuser01,commission_add,10.5,예시\n".encode("utf-8"),
+            file_name="tradingx_batch_template.csv",
+            mime="text/csv",
+        )
+        up = st.file_uploader("정산 파일", type=["csv", "parquet"], key="batch_file")
+        if up is not None:
+            try:
+                # 미리보기는 같은 파일/같은 데이터 버전이면 재계산하지 않음
+                cache_key = (up.file_id, store.version)
+                if st.session_state.get("batch_plan_key") != cache_key:
+                    st.session_state.batch_plan = plan_batch(store, read_batch(up.name, up.getvalue()))
+                    st.session_state.batch_plan_key = cache_key
+                plan = st.session_state.batch_plan
+            except Exception as e:
+                st.error(f"파일을 읽을 수 없습니다: {e}")
+                plan = None
+
+            if plan is not None:
+                valid, errors, totals = plan["valid"], plan["errors"], plan["totals"]
+                b1, b2, b3, b4 = st.columns(4)
+                b1.metric("유효 행", f"{len(valid):,}")
+                b2.metric("오류 행", f"{len(errors):,}")
+                b3.metric("대상 회원", f"{len(totals):,}")
+                b4.metric("수익 반영 합계", f"${float(plan['deltas'].sum()):,.2f}")
+                if len(errors):
+                    st.markdown("**오류 행 (상위 200)**")
+                    st.dataframe(errors.head(200), use_container_width=True, height=240, hide_index=True)
+                if len(totals):
+                    st.markdown("**대상별 반영 미리보기 (증감 절댓값 상위 200)**")
+                    top = totals.reindex(totals["증감($)"].abs().sort_values(ascending=False).index[:200])
+                    st.dataframe(top, use_container_width=True, height=280, hide_index=True)
+
+                skip_errors = st.checkbox("오류 행은 제외하고 반영", value=False, key="batch_skip") if len(errors) else True
+                if st.button("대량 정산 반영", type="primary", disabled=len(valid) == 0 or not skip_errors):
+                    # 미리보기 이후 다른 세션의 변경이 있을 수 있으므로 반영 직전 최신 상태로 다시 검증
+                    plan = plan_batch(store, read_batch(up.name, up.getvalue()))
+                    try:
+                        res = apply_batch(store, JOURNAL, plan, admin_id, now_ts(), source=up.name)
+                    except WriteConflict as e:
+                        st.error(f"{e} → 반영하지 않았습니다. 새로고침 후 다시 시도하세요.")
+                        st.stop()
+                    st.session_state.pop("batch_plan_key", None)
+                    st.success(f"대량 정산 완료: {res['rows']:,}건, 대상 {res['members']:,}명, 합계 ${res['total']:,.2f}")
+                    st.rerun()
+
+        st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
+        st.subheader("💸 수수료 지급 (기간 거래량 → 직추천/단계/바이너리 수당)")
+        try:
+            rates = load_rates()
+        except ValueError as e:
+            st.error(f"{PAYOUT_RATES_FILE}: {e}")
+            rates = None
+        if rates is not None:
+            levels_txt = " / ".join(f"{r:.1%}" for r in rates["levels"]) or "-"
+            cap_txt = f" (상한 ${rates['binary_cap']:,.0f})" if rates["binary_cap"] else ""
+            st.caption(
+                f"비율표({PAYOUT_RATES_FILE}): 직추천 {rates['direct']:.1%} · 단계 {levels_txt} · 바이너리 {rates['binary']:.1%}{cap_txt}"
+                " · 파일 컬럼: ID, volume · 미리보기 후 반영 버튼을 눌러야 commission_add 로 지급됩니다."
             )
+            p1, p2 = st.columns([1, 2])
+            with p1:
+                period = st.text_input("지급 기간", value=datetime.now().strftime("%Y-%m"), key="payout_period").strip()
+            with p2:
+                vup = st.file_uploader("기간 거래량 파일", type=["csv", "parquet"], key="payout_file")
+            if vup is not None and period:
+                try:
+                    # 미리보기는 같은 파일/기간/비율표/데이터 버전이면 재계산하지 않음
+                    cache_key = (vup.file_id, period, repr(sorted(rates.items())), store.version)
+                    if st.session_state.get("payout_plan_key") != cache_key:
+                        st.session_state.payout_plan = plan_payout(store, read_volumes(vup.name, vup.getvalue()), rates, period)
+                        st.session_state.payout_plan_key = cache_key
+                    pplan = st.session_state.payout_plan
+                except Exception as e:
+                    st.error(f"파일을 읽을 수 없습니다: {e}")
+                    pplan = None
+
+                if pplan is not None:
+                    paid, perrors = pplan["paid"], pplan["errors"]
+                    q1, q2, q3, q4 = st.columns(4)
+                    q1.metric("지급 대상", f"{len(paid):,}")
+                    q2.metric("직추천 수당", f"${float(paid['직추천수당'].sum()):,.2f}")
+                    q3.metric("단계 수당", f"${float(paid['단계수당'].sum()):,.2f}")
+                    q4.metric("바이너리 수당", f"${float(paid['바이너리수당'].sum()):,.2f}")
+                    st.caption(f"run {pplan['run_id']} · 총 지급 ${float(paid['합계'].sum()):,.2f} · 같은 트리/거래량/비율표/기간이면 같은 결과")
+                    if len(perrors):
+                        st.markdown("**오류 행 (상위 200, 지급 계산에서 제외)**")
+                        st.dataframe(perrors.head(200), use_container_width=True, height=200, hide_index=True)
+                    if len(paid):
+                        st.markdown("**지급 미리보기 (합계 상위 200)**")
+                        st.dataframe(paid.nlargest(200, "합계"), use_container_width=True, height=280, hide_index=True)
+
+                    # 같은 run 이 이미 반영됐는지 (대량 정산 요약 기록의 메모에 run_id 가 남음 → 저널의 run_id 집합)
+                    done = JOURNAL.has_run(pplan["run_id"])
+                    if done:
+                        st.warning("같은 조건의 지급이 이미 반영되었습니다. 다시 반영하면 중복 지급됩니다.")
+                    need_ok = done or len(perrors) > 0
+                    payout_ok = st.checkbox("확인했습니다 (오류 행 제외 / 중복 지급)", value=False, key="payout_confirm") if need_ok else True
+                    if st.button("수당 지급 반영", type="primary", disabled=len(paid) == 0 or not payout_ok):
+                        # 미리보기 이후 트리/회원이 바뀌었을 수 있으므로 반영 직전 최신 상태로 다시 계산
+                        pplan = plan_payout(store, read_volumes(vup.name, vup.getvalue()), rates, period)
+                        source = f"수당 {period} [{pplan['run_id']}]"
+                        try:
+                            res = apply_batch(store, JOURNAL, plan_batch(store, pplan["batch"]), admin_id, now_ts(), source=source)
+                        except WriteConflict as e:
+                            st.error(f"{e} → 지급하지 않았습니다. 새로고침 후 다시 시도하세요.")
+                            st.stop()
+                        st.session_state.pop("payout_plan_key", None)
+                        st.success(f"수당 지급 완료: 대상 {res['members']:,}명, 합계 ${res['total']:,.2f}")
+                        st.rerun()
 
         st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
         st.subheader("📌 기록 필터")
-        f1, f2, f3 = st.columns([1, 1, 1])
+        f1, f2, f3, f4 = st.columns([1, 1, 1, 1])
         with f1:
             fid = st.text_input("ID 필터(대상)", "")
         with f2:
-            ftype = st.selectbox("타입", ["(전체)"] + sorted(st.session_state.ledger["type"].unique().tolist()) if not st.session_state.ledger.empty else ["(전체)"])
+            ftype = st.selectbox("타입", ["(전체)"] + JOURNAL.types())
         with f3:
+            fperiod = st.selectbox("기간", list(LEDGER_PERIODS), index=0)
+        with f4:
             limit = st.selectbox("표시 개수", [50, 100, 200, 500], index=0)
 
-        lgf = st.session_state.ledger.copy()
-        if not lgf.empty:
-            if fid.strip():
-                lgf = lgf[lgf["target_id"].str.contains(fid, case=False, na=False)]
-            if ftype != "(전체)":
-                lgf = lgf[lgf["type"] == ftype]
-            lgf = lgf.sort_values("ts", ascending=False).head(int(limit))
+        if len(JOURNAL):
+            # 인덱스(대상/타입) + 시간순 보관 → 반환할 행만 읽음
+            days = LEDGER_PERIODS[fperiod]
+            lgf = JOURNAL.latest(
+                int(limit),
+                target_contains=fid.strip() or None,
+                typ=None if ftype == "(전체)" else ftype,
+                since=None if days is None else (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d 00:00:00"),
+            )
             st.dataframe(lgf, use_container_width=True, height=420)
         else:
             st.info("기록이 없습니다.")
@@ -770,105 +1124,217 @@ def admin_page():
     # -------------------
     # TAB 3: 리포트
     # -------------------
+    # 탭을 열었을 때만 실행 (다른 탭에서 조작할 때의 재실행에서는 건너뜀), 계산은 store version 별 캐시
     with tab3:
-        st.markdown("<div class='panel'>", unsafe_allow_html=True)
-        st.subheader("📊 리포트")
-
-        # 수익 분포
-        tmp = df[df["Role"].str.lower() != "admin"].copy()
-        bins = [-1, 0, 100, 500, 1000, 3000, 10000, 10**18]
-        labels = ["0", "0~100", "100~500", "500~1K", "1K~3K", "3K~10K", "10K+"]
-        if not tmp.empty:
-            tmp["bucket"] = pd.cut(tmp["수익($)"], bins=bins, labels=labels)
-            dist = tmp["bucket"].value_counts().reindex(labels).fillna(0).astype(int)
-            st.markdown("**수익 분포(회원 수)**")
-            st.bar_chart(dist)
-
-        st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
-
-        # Top lists
-        c1, c2 = st.columns(2)
-        with c1:
-            st.markdown("**Top 20 Profit**")
-            st.dataframe(df.sort_values("수익($)", ascending=False).head(20)[["ID","이름","수익($)","직추천","소실적","추천인","위치","Role"]], use_container_width=True, height=360)
-        with c2:
-            st.markdown("**Top 20 Direct Referrals**")
-            st.dataframe(df.sort_values("직추천", ascending=False).head(20)[["ID","이름","직추천","수익($)","소실적","추천인","위치","Role"]], use_container_width=True, height=360)
+        if tab3.open:
+            with METRICS.span("admin.tab.report"):
+                st.markdown("<div class='panel'>", unsafe_allow_html=True)
+                st.subheader("📊 리포트")
+                report = member_report(store)
+
+                # 수익 분포
+                if report["dist"] is not None:
+                    st.markdown("**수익 분포(회원 수)**")
+                    st.bar_chart(report["dist"])
+
+                st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
+
+                # Top lists
+                c1, c2 = st.columns(2)
+                with c1:
+                    st.markdown(f"**Top {REPORT_TOP_N} Profit**")
+                    st.dataframe(report["top_profit"], use_container_width=True, height=360)
+                with c2:
+                    st.markdown(f"**Top {REPORT_TOP_N} Direct Referrals**")
+                    st.dataframe(report["top_direct"], use_container_width=True, height=360)
+
+                st.markdown(f"**Top {REPORT_TOP_N} Weak Leg (소실적)**")
+                st.dataframe(report["top_weak"], use_container_width=True, height=360)
+
+                st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
+
+                # Ledger 요약 — 기록 추가 시마다 증감 유지되는 집계만 읽음 (전체 기록 재집계 없음)
+                st.markdown("**정산/기록 타입별 합계(금액)**")
+                if len(JOURNAL):
+                    st.dataframe(JOURNAL.totals("type"), use_container_width=True, height=260, hide_index=True)
+                else:
+                    st.info("정산 기록이 없습니다.")
+
+                st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
+
+                # 기간별 지급 (지급 타입만, 직전 기간 대비)
+                st.markdown("**기간별 지급 리포트**")
+                st.caption(f"지급 타입: {', '.join(PROFIT_TYPES)} · 기록이 없는 기간은 0")
+                unit = st.radio("단위", list(REPORT_PERIODS), horizontal=True, key="report_unit")
+                gran, last = REPORT_PERIODS[unit]
+                series = JOURNAL.period_totals(gran, PROFIT_TYPES, last=last, until=now_ts())
+                cur, prev = series.iloc[-1], series.iloc[-2]
+                p1, p2, p3 = st.columns(3)
+                p1.metric(f"이번 {unit} 지급액", f"${cur['amount']:,.2f}", delta=f"{cur['change']:+,.2f}")
+                p2.metric(f"이번 {unit} 지급 건수", f"{int(cur['count']):,}", delta=int(cur["count"] - prev["count"]))
+                p3.metric(f"최근 {last}{unit} 합계", f"${series['amount'].sum():,.2f}")
+                st.bar_chart(series.set_index("period")["amount"])
+                st.dataframe(
+                    series.rename(columns={"period": "기간", "amount": "지급액($)", "count": "건수", "change": "증감($)", "change_pct": "증감률(%)"}).iloc[::-1],
+                    use_container_width=True,
+                    height=260,
+                    hide_index=True,
+                )
 
-        st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
-
-        # Ledger 요약(타입별 합계)
-        st.markdown("**정산/기록 타입별 합계(금액)**")
-        if not lg.empty:
-            lg_sum = lg.groupby("type", as_index=False)["amount"].sum().sort_values("amount", ascending=False)
-            st.dataframe(lg_sum, use_container_width=True, height=260)
-        else:
-            st.info("정산 기록이 없습니다.")
-        st.markdown("</div>", unsafe_allow_html=True)
+                c3, c4 = st.columns(2)
+                with c3:
+                    st.markdown("**관리자별 지급 합계**")
+                    st.dataframe(JOURNAL.totals("admin_id", PROFIT_TYPES), use_container_width=True, height=260, hide_index=True)
+                with c4:
+                    st.markdown("**지급 상위 20 (대상별 누적)**")
+                    st.dataframe(JOURNAL.totals("target_id", PROFIT_TYPES).head(20), use_container_width=True, height=260, hide_index=True)
+                st.markdown("</div>", unsafe_allow_html=True)
 
     # -------------------
     # TAB 4: 데이터 점검
     # -------------------
+    # 전체 표(store.df → 추가분/삭제 정리)가 필요한 점검은 탭을 열었을 때만 실행
     with tab4:
-        st.markdown("<div class='panel'>", unsafe_allow_html=True)
-        st.subheader("⚠️ 데이터 점검")
+        if tab4.open:
+            with METRICS.span("admin.tab.checks"):
+                df = store.df  # 공용 스냅샷 (읽기 전용, 복사하지 않음)
+
+                st.markdown("<div class='panel'>", unsafe_allow_html=True)
+                st.subheader("⚠️ 데이터 점검")
+
+                # 1) 잘못된 추천인
+                bad_rec = df[(df["추천인"] != "-") & (~df["추천인"].isin(df["ID"]))][["ID","추천인","이름","Role"]]
+                st.markdown("**1) 존재하지 않는 추천인**")
+                if bad_rec.empty:
+                    st.success("이상 없음")
+                else:
+                    st.warning(f"{len(bad_rec)}건")
+                    st.dataframe(bad_rec, use_container_width=True, height=220)
 
-        # 1) 잘못된 추천인
-        bad_rec = df[(df["추천인"] != "-") & (~df["추천인"].isin(df["ID"]))][["ID","추천인","이름","Role"]]
-        st.markdown("**1) 존재하지 않는 추천인**")
-        if bad_rec.empty:
-            st.success("이상 없음")
-        else:
-            st.warning(f"{len(bad_rec)}건")
-            st.dataframe(bad_rec, use_container_width=True, height=220)
+                st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
 
-        st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
+                # 2) 자기 자신 추천인
+                self_rec = df[df["추천인"] == df["ID"]][["ID","추천인","이름","Role"]]
+                st.markdown("**2) 자기 자신을 추천인으로 설정**")
+                if self_rec.empty:
+                    st.success("이상 없음")
+                else:
+                    st.warning(f"{len(self_rec)}건")
+                    st.dataframe(self_rec, use_container_width=True, height=220)
 
-        # 2) 자기 자신 추천인
-        self_rec = df[df["추천인"] == df["ID"]][["ID","추천인","이름","Role"]]
-        st.markdown("**2) 자기 자신을 추천인으로 설정**")
-        if self_rec.empty:
-            st.success("이상 없음")
-        else:
-            st.warning(f"{len(self_rec)}건")
-            st.dataframe(self_rec, use_container_width=True, height=220)
+                st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
 
-        st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
+                # 3) Duplicate ID (방어)
+                st.markdown("**3) 중복 ID 점검**")
+                dup = df[df["ID"].duplicated(keep=False)][["ID","이름","이메일","Role"]]
+                if dup.empty:
+                    st.success("이상 없음")
+                else:
+                    st.error("중복 ID가 존재합니다(치명적).")
+                    st.dataframe(dup, use_container_width=True, height=220)
+
+                st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
+
+                # 4) 자동 수정 도구
+                st.markdown("**🔧 자동 수정 도구**")
+                colx, coly = st.columns([1,1])
+                with colx:
+                    if st.button("잘못된 추천인 → '-' 로 일괄 수정", use_container_width=True):
+                        bad_mask = (store.df["추천인"] != "-") & (~store.df["추천인"].isin(store.df["ID"]))
+                        bad_ids = store.df.loc[bad_mask, "ID"].tolist()
+                        store.update_many({uid: {"추천인": "-"} for uid in bad_ids})
+                        persist_members(store)
+                        log_ledger(admin_id, "-", "fix_invalid_recommender", 0.0, "invalid recommender -> '-'")
+                        st.success("수정 완료")
+                        st.rerun()
+                with coly:
+                    if st.button("직추천 재계산만 실행", use_container_width=True):
+                        st.session_state.referral_drift = repair_direct_referrals(store)
+                        log_ledger(admin_id, "-", "recalc_referrals", 0.0, f"직추천 재계산 (불일치 {len(st.session_state.referral_drift)}건 복구)")
+                        st.success("재계산 완료")
+                        st.rerun()
 
-        # 3) Duplicate ID (방어)
-        st.markdown("**3) 중복 ID 점검**")
-        dup = df[df["ID"].duplicated(keep=False)][["ID","이름","이메일","Role"]]
-        if dup.empty:
-            st.success("이상 없음")
-        else:
-            st.error("중복 ID가 존재합니다(치명적).")
-            st.dataframe(dup, use_container_width=True, height=220)
+                drift = st.session_state.get("referral_drift")
+                if drift is not None:
+                    st.markdown("**최근 직추천 점검 결과**")
+                    if drift.empty:
+                        st.success("불일치 없음")
+                    else:
+                        st.warning(f"불일치 {len(drift)}건 복구됨")
+                        st.dataframe(drift, use_container_width=True, height=220)
 
-        st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
+                st.markdown("</div>", unsafe_allow_html=True)
+
+    # -------------------
+    # TAB 5: Ops (성능 계측)
+    # -------------------
+    with tab5:
+        if tab5.open:
+            st.markdown("<div class='panel'>", unsafe_allow_html=True)
+            st.subheader("⏱️ 성능 계측")
+
+            # 1) 구간별 시간 (누적 시간 큰 순)
+            rows = METRICS.stats()
+            if not METRICS.enabled:
+                st.info("계측이 꺼져 있습니다 (TRADINGX_METRICS=0).")
+            elif not rows:
+                st.info("아직 측정된 구간이 없습니다.")
+            else:
+                ops = pd.DataFrame(rows)
+                table = pd.DataFrame(
+                    {
+                        "구간": ops["name"],
+                        "건수": ops["count"],
+                        "오류": ops["errors"],
+                        "평균(ms)": ops["total"] / ops["count"] * 1000,
+                        "p50(ms)": ops["p50"] * 1000,
+                        "p95(ms)": ops["p95"] * 1000,
+                        "p99(ms)": ops["p99"] * 1000,
+                        "최대(ms)": ops["max"] * 1000,
+                        "누적(s)": ops["total"],
+                    }
+                ).round(2)
+                st.dataframe(table, use_container_width=True, height=420, hide_index=True)
+                st.markdown("**p95 상위 구간(ms)**")
+                st.bar_chart(table.nlargest(15, "p95(ms)").set_index("구간")["p95(ms)"])
+            st.caption(f"분위수는 구간별 최근 {METRICS.window:,}건 기준 · Prometheus 파일: {METRICS_FILE or '미설정 (TRADINGX_METRICS_FILE)'}")
+            o1, o2 = st.columns(2)
+            with o1:
+                st.download_button(
+                    "⬇️ Prometheus 텍스트",
+                    data=METRICS.prometheus(),
+                    file_name="tradingx.prom",
+                    mime="text/plain",
+                    on_click="ignore",
+                    use_container_width=True,
+                )
+            with o2:
+                if st.button("계측 초기화", use_container_width=True):
+                    METRICS.reset()
+                    st.rerun()
 
-        # 4) 자동 수정 도구
-        st.markdown("**🔧 자동 수정 도구**")
-        colx, coly = st.columns([1,1])
-        with colx:
-            if st.button("잘못된 추천인 → '-' 로 일괄 수정", use_container_width=True):
-                df2 = st.session_state.db.copy()
-                bad_mask = (df2["추천인"] != "-") & (~df2["추천인"].isin(df2["ID"]))
-                df2.loc[bad_mask, "추천인"] = "-"
-                df2 = recalc_direct_referrals(df2)
-                st.session_state.db = df2
-                save_db(df2)
-                log_ledger(admin_id, "-", "fix_invalid_recommender", 0.0, "invalid recommender -> '-'")
-                st.success("수정 완료")
-                st.rerun()
-        with coly:
-            if st.button("직추천 재계산만 실행", use_container_width=True):
-                st.session_state.db = recalc_direct_referrals(st.session_state.db)
-                save_db(st.session_state.db)
-                log_ledger(admin_id, "-", "recalc_referrals", 0.0, "직추천 재계산")
-                st.success("재계산 완료")
-                st.rerun()
+            st.markdown("<div class='hr'></div>", unsafe_allow_html=True)
 
-        st.markdown("</div>", unsafe_allow_html=True)
+            # 2) 비밀번호 해시 풀
+            st.markdown("**🔐 비밀번호 해시 처리 현황**")
+            hp = HASH_POOL.stats()
+            st.caption(
+                f"workers {hp['workers']} · 처리중 {hp['in_flight']}/{hp['queue_limit']} · 완료 {hp['completed']:,} · "
+                f"거절 {hp['rejected']:,} · 시간초과 {hp['timeouts']:,} · p50 {hp['p50_ms']:.0f}ms · p99 {hp['p99_ms']:.0f}ms"
+            )
+
+            # 3) 백그라운드 저장
+            st.markdown("**💾 백그라운드 저장 현황**")
+            ws = WRITER.stats()
+            st.caption(
+                f"변경 알림 {ws['notified']:,} · 저장 {ws['writes']:,} · 대기 기록 {ws['unsaved_ledger']:,}건 · 실패 {ws['failures']:,} · 충돌 {ws['conflicts']:,}"
+            )
+            if ws["last_error"]:
+                st.warning(f"마지막 저장 오류 (자동 재시도 중): {ws['last_error']}")
+            if ws["last_conflict"]:
+                st.info(f"다른 프로세스가 먼저 변경해 저장하지 않은 회원 (저장소 값 유지): {ws['last_conflict']}")
+
+            st.markdown("</div>", unsafe_allow_html=True)
 
 
 # =========================
@@ -876,18 +1342,19 @@ def admin_page():
 # =========================
 page = st.session_state.page
 
-if page == "login":
-    login_page()
-elif page == "signup":
-    signup_page()
-elif page == "pw_manage":
-    pw_manage_page()
-elif page == "admin":
-    admin_page()
-elif page == "user":
-    if "current_user" not in st.session_state:
+with METRICS.span(f"page.{page}"):
+    if page == "login":
+        login_page()
+    elif page == "signup":
+        signup_page()
+    elif page == "pw_manage":
+        pw_manage_page()
+    elif page == "admin":
+        admin_page()
+    elif page == "user":
+        if "current_user" not in st.session_state:
+            goto("login")
+        user_dashboard()
+    else:
+        st.error("알 수 없는 페이지입니다.")
         goto("login")
-    user_dashboard()
-else:
-    st.error("알 수 없는 페이지입니다.")
-    goto("login")
@@ -0,0 +1,357 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from ledger_store import LedgerJournal
+from member_store import MemberStore, count_direct_referrals
+from payout import DEFAULT_RATES, check_rates, compute_payout
+from persistence import WriteBehind
+from referral_tree import ReferralTree
+from security import hash_password, verify_password
+from settlement import PROFIT_TYPES
+from storage import COLUMNS, LEDGER_COLS, coerce_members, open_storage
+
+# =========================================================
+# 벤치마크 (python bench.py)
+# - 합성 데이터: 회원(깊은/넓은 추천 트리, Left/Right 배치, 한글 이름) + 정산 기록 (1천 ~ 1천만 건)
+# - 측정: 저장소 로드(원본/스냅샷), 회원 정리(coerce), 직추천 재계산, 기록 추가(동기/지연/durable),
+#   로그인 검증, 관리자 화면 계산(KPI/목록/검색/트리/기록 집계), 수수료 지급 계산, AppTest 로 실제 페이지 재실행
+# - 결과는 JSON 파일로 저장 → python bench.py --compare 이전.json 새.json 으로 버전 간 비교
+# - 데이터는 임시 디렉터리에 만들고 끝나면 삭제 (작업 디렉터리의 저장소는 건드리지 않음)
+# =========================================================
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+SCALES = {"small": (1_000, 1_000), "medium": (100_000, 1_000_000), "large": (1_000_000, 10_000_000)}
+BENCH_PASSWORD = "bench1234"
+APPTEST_MAX_MEMBERS = 200_000  # 이보다 큰 회원 수는 AppTest 생략 (--apptest-max 로 조정)
+
+_SURNAMES = list("김이박최정강조윤장임한오서신권황안송류홍")
+_GIVEN = list("민서지현준우예도하윤수아은진영성호연동희재경태혜")
+_LEDGER_TYPES = {
+    "commission_add": 0.35,
+    "update_user": 0.25,
+    "bonus_add": 0.10,
+    "create_user": 0.10,
+    "profit_adjust": 0.05,
+    "manual_note": 0.05,
+    "reset_password": 0.05,
+    "delete_user": 0.05,
+}
+
+
+# =========================
+# 합성 데이터
+# =========================
+def make_members(n: int, shape: str = "mixed", seed: int = 0, pw_hash: str = "") -> pd.DataFrame:
+    # shape: wide (앞선 회원 중 무작위 추천인 → 얕고 넓은 트리) / deep (직전 회원 위주 → 긴 체인) / mixed (8:2)
+    rng = np.random.default_rng(seed)
+    idx = np.arange(n)
+    anywhere = (rng.random(n) * idx).astype(np.int64)
+    recent = np.maximum(idx - rng.integers(1, 4, n), 0)
+    if shape == "wide":
+        sponsor = anywhere
+    elif shape == "deep":
+        sponsor = recent
+    else:
+        sponsor = np.where(rng.random(n) < 0.8, anywhere, recent)
+
+    ids = np.array(["admin", "admin2", "admin3"][: min(n, 3)] + [f"m{i:07d}" for i in range(3, n)], dtype=object)
+    rec = ids[sponsor]
+    rec[0] = "-"
+    pos = rng.choice(np.array(["Left", "Right"], dtype=object), n)
+    pos[0] = "-"
+    names = (
+        pd.Series(np.array(_SURNAMES, dtype=object)[rng.integers(0, len(_SURNAMES), n)])
+        + np.array(_GIVEN, dtype=object)[rng.integers(0, len(_GIVEN), n)]
+        + np.array(_GIVEN, dtype=object)[rng.integers(0, len(_GIVEN), n)]
+    )
+    profit = np.round(rng.lognormal(5.0, 1.5, n) * (rng.random(n) > 0.3), 2)
+    df = pd.DataFrame(
+        {
+            "ID": ids,
+            "PW": pw_hash,
+            "이름": names.to_numpy(),
+            "이메일": [f"{u}@example.com" for u in ids],
+            "연락처": [f"010-{i // 10000 % 10000:04d}-{i % 10000:04d}" for i in range(n)],
+            "추천인": rec,
+            "위치": pos,
+            "직추천": 0,
+            "소실적": 0,
+            "수익($)": profit,
+            "Role": np.where(idx < 3, "admin", "user"),
+        }
+    )
+    # 파생 컬럼도 트리와 맞춰 둠 (운영 데이터처럼 로드 시 복구할 행이 없도록)
+    df["직추천"] = count_direct_referrals(df)
+    df["소실적"] = ReferralTree(df).weak_legs()
+    return df[COLUMNS]
+
+
+def make_ledger(m: int, member_ids, seed: int = 0, days: int = 365) -> pd.DataFrame:
+    rng = np.random.default_rng(seed + 1)
+    now = np.datetime64(datetime.now().replace(microsecond=0), "s")
+    ts = np.sort(now - rng.integers(0, days * 86_400, m).astype("timedelta64[s]"))
+    ts = np.char.replace(np.datetime_as_string(ts, unit="s"), "T", " ").astype(object)
+    types = np.array(list(_LEDGER_TYPES), dtype=object)
+    typ = types[rng.choice(len(types), m, p=list(_LEDGER_TYPES.values()))]
+    member_ids = np.asarray(member_ids, dtype=object)
+    amount = np.where(np.isin(typ, PROFIT_TYPES), np.round(rng.lognormal(3.0, 1.0, m), 2), 0.0)
+    return pd.DataFrame(
+        {
+            "ts": ts,
+            "admin_id": member_ids[rng.integers(0, min(3, len(member_ids)), m)],
+            "target_id": member_ids[rng.integers(0, len(member_ids), m)],
+            "type": typ,
+            "amount": amount,
+            "note": "",
+        }
+    )[LEDGER_COLS]
+
+
+# =========================
+# 측정
+# =========================
+class Bench:
+    def __init__(self, repeat: int = 3):
+        self.repeat = repeat
+        self.results = []
+        self.context = {}
+
+    def time(self, case: str, fn, repeat: int | None = None, ops: int = 1):
+        times, out = [], None
+        for _ in range(repeat or self.repeat):
+            start = time.perf_counter()
+            out = fn()
+            times.append(time.perf_counter() - start)
+        row = {
+            **self.context,
+            "case": case,
+            "seconds": min(times),
+            "median": statistics.median(times),
+            "repeat": len(times),
+            "ops": ops,
+            "per_op_ms": min(times) / ops * 1000,
+        }
+        self.results.append(row)
+        print(f"  {case:<34} {row['seconds'] * 1000:>11.1f} ms" + (f"  ({row['per_op_ms']:.3f} ms/op)" if ops > 1 else ""), flush=True)
+        return out
+
+
+def _drop_snapshots(storage) -> None:
+    for attr in ("db_snapshot", "members_snapshot", "ledger_snapshot"):
+        path = getattr(storage, attr, None)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def _record(i: int, target: str) -> dict:
+    return {"ts": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "admin_id": "admin", "target_id": target, "type": "update_user", "amount": 0.0, "note": f"bench {i}"}
+
+
+def _member(i: int, sponsor: str) -> dict:
+    return {"ID": f"bench_new{i}", "PW": "", "이름": f"벤치{i}", "이메일": "", "연락처": "", "추천인": sponsor, "위치": "-", "직추천": 0, "소실적": 0, "수익($)": 0.0, "Role": "user"}
+
+
+def bench_storage(b: Bench, backend: str, members: pd.DataFrame, ledger: pd.DataFrame) -> None:
+    storage = open_storage(backend)
+    b.time("save_members_full", lambda: storage.save_members(members), repeat=1)
+    b.time("save_ledger_full", lambda: storage.save_ledger(ledger), repeat=1)
+
+    def cold_members():
+        _drop_snapshots(storage)
+        return storage.load_members()
+
+    def cold_ledger():
+        _drop_snapshots(storage)
+        return storage.load_ledger()
+
+    # load_db / load_ledger: 스냅샷이 없을 때(원본 파싱)와 있을 때
+    b.time("load_members_cold", cold_members, repeat=1)
+    b.time("load_members_snapshot", storage.load_members)
+    b.time("load_ledger_cold", cold_ledger, repeat=1)
+    lg = b.time("load_ledger_snapshot", storage.load_ledger)
+
+    raw = members.astype(str)
+    b.time("coerce_members", lambda: coerce_members(raw.copy()))
+    b.time("recalc_direct_referrals", lambda: count_direct_referrals(members))
+
+    store = b.time("member_store_build", lambda: MemberStore(members.copy()), repeat=1)
+    journal = b.time("ledger_journal_build", lambda: LedgerJournal(storage, lg), repeat=1)
+
+    # log_ledger: 동기 1건씩 / 백그라운드 writer 로 미룬 뒤 한 번에 flush / durable(fsync)
+    ids = store.ids()
+    k = 200
+    b.time("log_ledger_sync", lambda: [journal.append(_record(i, ids[i % len(ids)])) for i in range(k)], repeat=1, ops=k)
+    writer = WriteBehind(storage, delay=3600)  # 측정 중에는 자동 flush 없이
+    writer.attach(store, journal)
+    b.time("log_ledger_deferred", lambda: [journal.append(_record(i, ids[i % len(ids)])) for i in range(k)], repeat=1, ops=k)
+    b.time("write_behind_flush", writer.flush, repeat=1)
+    b.time("log_ledger_durable", lambda: [journal.append(_record(i, ids[i % len(ids)]), durable=True) for i in range(20)], repeat=1, ops=20)
+    journal.on_dirty = None
+
+    # 회원 변경 → 행 단위 저장
+    b.time("member_update", lambda: [store.update(ids[i % len(ids)], {"이름": f"벤치{i}"}) for i in range(k)], repeat=1, ops=k)
+    b.time("member_signup", lambda: [store.add(_member(i, ids[i % len(ids)])) for i in range(k)], repeat=1, ops=k)
+    b.time("member_delete", lambda: [store.delete(f"bench_new{i}") for i in range(k)], repeat=1, ops=k)
+    b.time("persist_members", writer.flush, repeat=1)
+
+    # 로그인 검증: ID 조회 + PBKDF2
+    b.time("login_verify", lambda: [verify_password(BENCH_PASSWORD, store.get(ids[i], "PW")) for i in range(5)], repeat=1, ops=5)
+
+    # 관리자 화면 계산
+    b.time("admin_kpis", store.kpis)
+    b.time("admin_page_sorted", lambda: store.page(sort_by="수익($)", ascending=False, offset=0, limit=50))
+    b.time("admin_search", lambda: store.search("김민", limit=1000))
+    b.time("admin_tree_stats", lambda: store.tree_stats().nlargest(20, ["소실적", "소실적($)"]))
+    b.time("admin_top_profit", lambda: store.top_profit(20))
+    b.time("admin_top_direct", lambda: store.df.nlargest(20, "직추천"))
+    b.time("ledger_totals_type", lambda: journal.totals("type"))
+    b.time("ledger_totals_target", lambda: journal.totals("target_id", PROFIT_TYPES))
+    b.time("ledger_period_month", lambda: journal.period_totals("month", PROFIT_TYPES, last=12))
+    b.time("ledger_latest", lambda: journal.latest(100))
+    b.time("ledger_member_daily", lambda: journal.member_daily(ids[len(ids) // 2], 30, balance=0.0))
+
+    # 수수료 지급: 전체 회원 기간 거래량 → 직추천/단계/바이너리 수당
+    volume = pd.Series(np.round(np.random.default_rng(0).lognormal(6.0, 1.0, len(ids)), 2), index=ids)
+    b.time("payout_compute", lambda: compute_payout(store.df, volume, check_rates(DEFAULT_RATES)), repeat=1)
+    if hasattr(storage, "close"):
+        storage.close()
+
+
+def bench_apptest(b: Bench, backend: str) -> None:
+    # 실제 화면을 헤드리스로 재실행 (로그인 → 관리자 화면 → 탭별)
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["TRADINGX_STORAGE"] = backend
+    st.cache_resource.clear()
+    at = AppTest.from_file(APP_FILE, default_timeout=3600)
+    b.time("apptest_cold_start", at.run, repeat=1)
+    at.text_input[0].input("admin")
+    at.text_input[1].input(BENCH_PASSWORD)
+    b.time("apptest_login", at.button[0].click().run, repeat=1)
+    at.session_state.page = "admin"
+    b.time("apptest_admin_page", at.run)
+    for i, tab in enumerate(at.tabs):
+        at.session_state["admin_tab"] = tab.label
+        b.time(f"apptest_admin_tab{i + 1}", at.run)
+    at.session_state["admin_tab"] = at.tabs[0].label
+    at.run()
+    search = at.text_input[0]
+    b.time("apptest_admin_search", lambda: search.input("김민").run(), repeat=1)
+    if at.exception:
+        print("  ! AppTest 예외:", at.exception[0].message, file=sys.stderr)
+    st.cache_resource.clear()
+
+
+def run(args) -> dict:
+    b = Bench(repeat=args.repeat)
+    pw_hash = hash_password(BENCH_PASSWORD)
+    sizes = [SCALES[s] for s in args.scales.split(",")] if args.members is None else [(args.members, args.ledger or args.members)]
+    home = os.getcwd()
+    for backend in args.backends.split(","):
+        for n, m in sizes:
+            print(f"[{backend}] members={n:,} ledger={m:,} shape={args.shape}", flush=True)
+            work = tempfile.mkdtemp(prefix="tradingx-bench-")
+            os.chdir(work)
+            try:
+                b.context = {"backend": backend, "members": n, "ledger": m, "shape": args.shape}
+                members = b.time("generate_members", lambda: make_members(n, args.shape, args.seed, pw_hash), repeat=1)
+                ledger = b.time("generate_ledger", lambda: make_ledger(m, members["ID"].to_numpy(), args.seed), repeat=1)
+                bench_storage(b, backend, members, ledger)
+                if not args.no_apptest and n <= args.apptest_max:
+                    bench_apptest(b, backend)
+            finally:
+                os.chdir(home)
+                shutil.rmtree(work, ignore_errors=True)
+    return {"meta": _meta(args), "results": b.results}
+
+
+def _meta(args) -> dict:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(APP_FILE)).stdout.strip()
+    except OSError:
+        rev = ""
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git": rev,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": vars(args),
+    }
+
+
+# =========================
+# 비교
+# =========================
+def compare(old_file: str, new_file: str, threshold: float) -> int:
+    # 같은 (backend, 회원 수, 기록 수, 항목) 끼리 최솟값 비교 → threshold 배 이상 느려진 항목 수 반환
+    with open(old_file, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_file, encoding="utf-8") as f:
+        new = json.load(f)
+
+    def key(r):
+        return r["backend"], r["members"], r["ledger"], r.get("shape", "mixed"), r["case"]
+
+    base = {key(r): r for r in old["results"]}
+    slower = 0
+    print(f"{old['meta'].get('git') or old_file} → {new['meta'].get('git') or new_file}")
+    print(f"{'backend':<7} {'members':>9} {'ledger':>10} {'case':<32} {'old ms':>10} {'new ms':>10} {'ratio':>7}")
+    for r in new["results"]:
+        o = base.get(key(r))
+        if o is None or r["case"].startswith("generate_"):
+            continue
+        ratio = r["seconds"] / o["seconds"] if o["seconds"] > 0 else float("inf")
+        flag = " ▲" if ratio >= threshold else (" ▼" if ratio <= 1 / threshold else "")
+        slower += ratio >= threshold
+        print(
+            f"{r['backend']:<7} {r['members']:>9,} {r['ledger']:>10,} {r['case']:<32} "
+            f"{o['seconds'] * 1000:>10.1f} {r['seconds'] * 1000:>10.1f} {ratio:>6.2f}x{flag}"
+        )
+    print(f"{threshold:.2f}배 이상 느려진 항목: {slower}")
+    return slower
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(description="TRADING X 벤치마크")
+    p.add_argument("--scales", default="small,medium", help=f"쉼표 구분 ({', '.join(f'{k}={v[0]:,}/{v[1]:,}' for k, v in SCALES.items())})")
+    p.add_argument("--members", type=int, help="회원 수 직접 지정 (--scales 대신)")
+    p.add_argument("--ledger", type=int, help="기록 수 직접 지정 (기본: 회원 수와 같음)")
+    p.add_argument("--shape", default="mixed", choices=["mixed", "wide", "deep"], help="추천 트리 모양")
+    p.add_argument("--backends", default="sqlite", help="sqlite,csv")
+    p.add_argument("--repeat", type=int, default=3, help="반복 측정 횟수 (최솟값 기록)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--no-apptest", action="store_true", help="AppTest 페이지 측정 생략")
+    p.add_argument("--apptest-max", type=int, default=APPTEST_MAX_MEMBERS, help="AppTest 를 실행할 최대 회원 수")
+    p.add_argument("--out", default="bench_results.json")
+    p.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="두 결과 파일 비교")
+    p.add_argument("--threshold", type=float, default=1.25, help="--compare: 느려짐 판정 배율")
+    args = p.parse_args()
+
+    if args.compare:
+        return 1 if compare(*args.compare, args.threshold) else 0
+    out = os.path.abspath(args.out)
+    report = run(args)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"결과 저장: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import gzip
+import os
+import tempfile
+import threading
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pcsv
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet 내보내기/빠른 CSV 직렬화는 pyarrow 가 있을 때만
+    pa = pcsv = pq = None
+
+# =========================================================
+# 내보내기 (ExportCache)
+# - 다운로드 버튼을 눌렀을 때만 생성 (화면 재실행마다 to_csv 하지 않음)
+# - 행을 청크 단위로 gzip CSV / Parquet(row group) 파일에 흘려 씀 → 전체 CSV 문자열을 메모리에 만들지 않음
+#   CSV 직렬화는 pyarrow 가 있으면 pyarrow.csv (pandas to_csv 보다 수 배 빠름), gzip 은 속도 우선(level 1)
+# - (이름, 형식) 별로 데이터 version 이 같으면 만들어 둔 파일 재사용, 바뀌면 새로 만들고 이전 파일 삭제
+# =========================================================
+
+EXPORT_MIME = {"csv.gz": "application/gzip", "parquet": "application/vnd.apache.parquet"}
+CHUNK_ROWS = 100_000
+
+
+def export_formats() -> list:
+    return [f for f in EXPORT_MIME if f != "parquet" or pq is not None]
+
+
+def frame_chunks(df: pd.DataFrame, size: int = CHUNK_ROWS):
+    # 빈 표도 헤더/스키마는 써야 하므로 최소 1개는 돌려줌
+    yield df.iloc[:size]
+    for start in range(size, len(df), size):
+        yield df.iloc[start : start + size]
+
+
+def write_csv_gz(path: str, chunks) -> None:
+    with gzip.open(path, "wb", compresslevel=1) as f:
+        schema = None
+        for i, chunk in enumerate(chunks):
+            if pcsv is None:
+                f.write(chunk.to_csv(index=False, header=i == 0).encode("utf-8"))
+            else:
+                schema = schema or _schema(chunk)
+                table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+                pcsv.write_csv(table, f, pcsv.WriteOptions(include_header=i == 0))
+
+
+def write_parquet(path: str, chunks) -> None:
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                writer = pq.ParquetWriter(path, _schema(chunk))
+            writer.write_table(pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _schema(frame: pd.DataFrame):
+    # 숫자 컬럼은 dtype 그대로, 나머지는 문자열 (첫 청크가 전부 빈 값이어도 청크마다 같은 스키마)
+    return pa.schema(
+        [(c, pa.from_numpy_dtype(frame[c].dtype) if pd.api.types.is_numeric_dtype(frame[c]) else pa.string()) for c in frame.columns]
+    )
+
+
+class ExportCache:
+    def __init__(self, directory: str | None = None):
+        self.dir = directory or tempfile.mkdtemp(prefix="tradingx-export-")
+        self._lock = threading.Lock()  # 같은 내보내기를 동시에 두 번 만들지 않도록 생성은 직렬화
+        self._files = {}  # (이름, 형식) → (version, 경로)
+
+    def path(self, name: str, fmt: str, version, chunks) -> str:
+        # chunks: 호출하면 DataFrame 청크를 차례로 내주는 함수 (캐시가 없을 때만 호출)
+        with self._lock:
+            hit = self._files.get((name, fmt))
+            if hit is not None and hit[0] == version and os.path.exists(hit[1]):
+                return hit[1]
+            path = os.path.join(self.dir, f"{name}-{version}.{fmt}")
+            tmp = path + ".tmp"
+            (write_parquet if fmt == "parquet" else write_csv_gz)(tmp, chunks())
+            os.replace(tmp, path)
+            if hit is not None and hit[1] != path and os.path.exists(hit[1]):
+                os.remove(hit[1])
+            self._files[(name, fmt)] = (version, path)
+            return path
+
+    def clear(self) -> None:
+        # 데이터를 다시 로드한 경우 (version 이 처음부터 다시 시작하므로 기존 파일은 모두 폐기)
+        with self._lock:
+            for _version, path in self._files.values():
+                if os.path.exists(path):
+                    os.remove(path)
+            self._files = {}
+
+    def read(self, name: str, fmt: str, version, chunks) -> bytes:
+        with open(self.path(name, fmt, version, chunks), "rb") as f:
+            return f.read()
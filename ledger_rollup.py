@@ -0,0 +1,399 @@
+import numpy as np
+import pandas as pd
+
+from settlement import PROFIT_TYPES
+from storage import ROLLUP_COLS
+
+# =========================================================
+# 정산 기록 집계 (LedgerRollup)
+# - 기록이 추가될 때마다 증감으로 유지하는 금액 합계/건수
+#   차원: 전체 / 관리자(admin_id) / 대상(target_id) / 일·주·월 — 모두 타입별로 나눠 보관
+#   (타입별로 나눠 두어야 지급 타입만 고르거나 batch_settlement 요약 행을 빼고 합산 가능)
+# - 셀 = (키, 타입) → 슬롯 번호, 슬롯별 키 번호/타입 번호/금액/건수는 배열 → 합산은 bincount 로 벡터화
+# - 저장소에 스냅샷으로 보관 → 시작 시 스냅샷 이후 추가된 기록만 더함 (기록은 append-only)
+# - 리포트는 전체 기록을 다시 훑지 않고 집계 셀만 읽음 (결과는 다음 추가 전까지 캐시)
+# - 회원별 일별 수익 증감(_DailySeries): 수익($)을 바꾸는 타입만, 회원 1명 조회 = 그 회원 구간만 읽음 (전체 기록 크기와 무관)
+#   스냅샷에는 넣지 않음 (회원×일 행이 집계 셀보다 훨씬 많음) → 시작 시 기록 컬럼에서 벡터화로 한 번에 구성
+# =========================================================
+
+DIMS = ["all", "admin_id", "target_id", "day", "week", "month"]
+PERIODS = ["day", "week", "month"]
+
+_DAY_NS = 86_400 * 10**9
+_NAT = np.iinfo(np.int64).min
+_SMALL = 256  # 이보다 적은 행은 파이썬 루프로 더함 (factorize 고정 비용이 더 큼)
+
+
+def period_keys(ts_ns: np.ndarray) -> dict:
+    # ns 시각 → 기간 번호 (일: 1970-01-01 부터 일수, 주: 그 주 월요일의 일수, 월: 1970-01 부터 월수)
+    ts = np.asarray(ts_ns, dtype=np.int64)
+    day = ts // _DAY_NS
+    month = ts.view("datetime64[ns]").astype("datetime64[M]").astype(np.int64)
+    return {"day": day, "week": day - (day + 3) % 7, "month": month}
+
+
+def period_labels(gran: str, keys) -> list:
+    # 기간 번호 → "2026-10-18" (일/주: 시작일) / "2026-10" (월)
+    unit = "M" if gran == "month" else "D"
+    return np.datetime_as_string(np.asarray(keys, dtype=np.int64).astype(f"datetime64[{unit}]")).tolist()
+
+
+def _label_keys(gran: str, labels) -> np.ndarray:
+    unit = "M" if gran == "month" else "D"
+    return np.asarray(labels, dtype=f"datetime64[{unit}]").astype(np.int64)
+
+
+def as_text(v) -> str:
+    return "" if v is None or v != v else str(v)
+
+
+class _Codes:
+    # 값 → 번호 (처음 나온 순서)
+    def __init__(self):
+        self.values = []
+        self.index = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def code(self, v) -> int:
+        c = self.index.get(v)
+        if c is None:
+            c = self.index[v] = len(self.values)
+            self.values.append(v)
+        return c
+
+    def codes(self, values) -> np.ndarray:
+        return np.fromiter((self.code(v) for v in values), dtype=np.int64, count=len(values))
+
+
+class _Cells:
+    # 한 차원의 집계 셀: (키 번호, 타입 번호) → 슬롯, 슬롯별 배열은 용량 2배씩 증가
+    def __init__(self):
+        self.keys = _Codes()
+        self._slot = {}
+        self.n = 0
+        self.key = np.empty(0, dtype=np.int64)
+        self.type = np.empty(0, dtype=np.int64)
+        self.amount = np.empty(0, dtype=float)
+        self.count = np.empty(0, dtype=np.int64)
+
+    def slot(self, key_code: int, type_code: int) -> int:
+        s = self._slot.get((key_code, type_code))
+        if s is None:
+            s = self._slot[(key_code, type_code)] = self.n
+            self._grow(self.n + 1)
+            self.key[s], self.type[s] = key_code, type_code
+            self.n += 1
+        return s
+
+    def slots(self, key_codes: np.ndarray, type_codes: np.ndarray) -> np.ndarray:
+        # 기존 슬롯은 한 번에 조회, 없는 조합만 새 슬롯 배정 후 배열에 일괄 기록
+        pairs = list(zip(key_codes.tolist(), type_codes.tolist()))
+        get = self._slot.get
+        out = np.fromiter((get(p, -1) for p in pairs), dtype=np.int64, count=len(pairs))
+        new = np.flatnonzero(out < 0)
+        if len(new):
+            setdefault = self._slot.setdefault
+            out[new] = [setdefault(pairs[i], len(self._slot)) for i in new.tolist()]
+            self._grow(len(self._slot))
+            self.key[out[new]] = key_codes[new]
+            self.type[out[new]] = type_codes[new]
+            self.n = len(self._slot)
+        return out
+
+    def _grow(self, need: int) -> None:
+        if need <= len(self.amount):
+            return
+        cap = max(1024, len(self.amount))
+        while cap < need:
+            cap *= 2
+        for name in ("key", "type", "amount", "count"):
+            grown = np.zeros(cap, dtype=getattr(self, name).dtype)
+            grown[: self.n] = getattr(self, name)[: self.n]
+            setattr(self, name, grown)
+
+
+class _DailySeries:
+    # 회원 번호 → 일별 (일 번호, 금액 합, 건수), 일 오름차순
+    # 구성 시점 값은 CSR(회원별 구간), 이후 추가분은 회원별 {일: [금액, 건수]} → 꼬리가 커지면 CSR 로 다시 압축
+    def __init__(self):
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._day = np.empty(0, dtype=np.int64)
+        self._amount = np.empty(0, dtype=float)
+        self._count = np.empty(0, dtype=np.int64)
+        self._tail = {}
+        self.tail_size = 0
+
+    def add(self, codes: np.ndarray, day: np.ndarray, amount: np.ndarray) -> None:
+        # 큰 묶음(시작 시 구성/대량 정산)은 CSR 과 합쳐 한 번에 다시 만들고, 작은 묶음은 꼬리에 더함
+        if len(codes) >= max(_SMALL, len(self._day) // 4):
+            self._rebuild(codes, day, amount)
+            return
+        for c, d, a in zip(codes.tolist(), day.tolist(), amount.tolist()):
+            cell = self._tail.setdefault(c, {}).get(d)
+            if cell is None:
+                self._tail[c][d] = [a, 1]
+                self.tail_size += 1
+            else:
+                cell[0] += a
+                cell[1] += 1
+        if self.tail_size > max(50_000, len(self._day) // 4):
+            self._rebuild()
+
+    def _rebuild(self, codes=None, day=None, amount=None) -> None:
+        parts = [(np.repeat(np.arange(len(self._offsets) - 1), np.diff(self._offsets)), self._day, self._amount, self._count)]
+        if self._tail:
+            c, d, a, k = zip(*[(c, d, a, k) for c, days in self._tail.items() for d, (a, k) in days.items()])
+            parts.append((np.asarray(c, dtype=np.int64), np.asarray(d, dtype=np.int64), np.asarray(a, dtype=float), np.asarray(k, dtype=np.int64)))
+        if codes is not None:
+            parts.append((np.asarray(codes, dtype=np.int64), np.asarray(day, dtype=np.int64), np.asarray(amount, dtype=float), np.ones(len(codes), dtype=np.int64)))
+        c, d, a, k = (np.concatenate(cols) for cols in zip(*parts))
+        # (회원, 일) 순 정렬 후 같은 칸 합산
+        order = np.lexsort((d, c))
+        c, d, a, k = c[order], d[order], a[order], k[order]
+        if len(c):
+            first = np.flatnonzero(np.concatenate(([True], (c[1:] != c[:-1]) | (d[1:] != d[:-1]))))
+            a, k = np.add.reduceat(a, first), np.add.reduceat(k, first)
+            c, d = c[first], d[first]
+        self._offsets = np.concatenate(([0], np.cumsum(np.bincount(c, minlength=int(c.max()) + 1 if len(c) else 0))))
+        self._day, self._amount, self._count = d, a, k
+        self._tail = {}
+        self.tail_size = 0
+
+    def get(self, code: int) -> tuple:
+        # (일 배열, 금액 배열, 건수 배열) — 그 회원 구간 + 꼬리만 읽음
+        lo, hi = (int(self._offsets[code]), int(self._offsets[code + 1])) if code + 1 < len(self._offsets) else (0, 0)
+        day, amount, count = self._day[lo:hi], self._amount[lo:hi], self._count[lo:hi]
+        tail = self._tail.get(code)
+        if tail:
+            day = np.concatenate((day, np.fromiter(tail.keys(), dtype=np.int64, count=len(tail))))
+            amount = np.concatenate((amount, [v[0] for v in tail.values()]))
+            count = np.concatenate((count, np.asarray([v[1] for v in tail.values()], dtype=np.int64)))
+            day, inv = np.unique(day, return_inverse=True)
+            amount = np.bincount(inv, weights=amount, minlength=len(day))
+            count = np.bincount(inv, weights=count, minlength=len(day)).astype(np.int64)
+        return day, amount, count
+
+
+class LedgerRollup:
+    def __init__(self):
+        self._types = _Codes()
+        self._cells = {dim: _Cells() for dim in DIMS}
+        self._daily = _DailySeries()  # 회원 번호는 target_id 집계 셀의 키 번호
+        self._cache = {}
+        self.rows = 0  # 집계에 반영된 기록 수
+        self.amount = 0.0  # 반영된 금액 합계 (스냅샷 검증용)
+
+    # ---------- 스냅샷 ----------
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "LedgerRollup":
+        rollup = cls()
+        for dim, part in frame.groupby("dim", sort=False):
+            if dim not in rollup._cells:
+                continue
+            cells = rollup._cells[dim]
+            keys = _label_keys(dim, part["key"].to_numpy()).tolist() if dim in PERIODS else part["key"].tolist()
+            slots = cells.slots(cells.keys.codes(keys), rollup._types.codes(part["type"].tolist()))
+            np.add.at(cells.amount, slots, part["amount"].to_numpy(dtype=float))
+            np.add.at(cells.count, slots, part["count"].to_numpy(dtype=np.int64))
+        cells = rollup._cells["all"]
+        rollup.rows = int(cells.count[: cells.n].sum())
+        rollup.amount = float(cells.amount[: cells.n].sum())
+        return rollup
+
+    def to_frame(self) -> pd.DataFrame:
+        parts = []
+        types = np.asarray(self._types.values, dtype=object)
+        for dim, cells in self._cells.items():
+            if not cells.n:
+                continue
+            key = cells.key[: cells.n]
+            if dim in PERIODS:
+                key = period_labels(dim, np.asarray(cells.keys.values, dtype=np.int64)[key])
+            else:
+                key = np.asarray(cells.keys.values, dtype=object)[key]
+            parts.append(
+                pd.DataFrame(
+                    {
+                        "dim": dim,
+                        "key": key,
+                        "type": types[cells.type[: cells.n]],
+                        "amount": cells.amount[: cells.n],
+                        "count": cells.count[: cells.n],
+                    }
+                )
+            )
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=ROLLUP_COLS)
+
+    # ---------- 증감 ----------
+    def add(self, ts_ns, admin_id, target_id, typ, amount) -> None:
+        n = len(amount)
+        if n == 0:
+            return
+        amount = np.asarray(amount, dtype=float)
+        ts_ns = np.asarray(ts_ns, dtype=np.int64)
+        dated = ts_ns != _NAT  # ts 를 파싱할 수 없는 기록은 기간 집계에서만 제외
+        cols = {"all": None, "admin_id": admin_id, "target_id": target_id, **period_keys(ts_ns)}
+
+        if n < _SMALL:
+            tcodes = [self._types.code(as_text(t)) for t in typ]
+            target_codes = self._cells["target_id"].keys.codes([as_text(k) for k in target_id])
+            amt = amount.tolist()
+            for dim, key in cols.items():
+                cells = self._cells[dim]
+                if dim in PERIODS:
+                    rows = np.flatnonzero(dated).tolist()
+                    key = key.tolist()
+                else:
+                    rows = range(n)
+                    key = [""] * n if key is None else [as_text(k) for k in key]
+                for i in rows:
+                    s = cells.slot(cells.keys.code(key[i]), tcodes[i])
+                    cells.amount[s] += amt[i]
+                    cells.count[s] += 1
+        else:
+            tcodes, tvals = pd.factorize(np.asarray(typ, dtype=object), use_na_sentinel=False)
+            tcodes = self._types.codes([as_text(t) for t in tvals])[tcodes]
+            for dim, key in cols.items():
+                cells = self._cells[dim]
+                if dim in PERIODS:
+                    kcodes, kvals = pd.factorize(key[dated])
+                    kcodes = cells.keys.codes(kvals.tolist())[kcodes]
+                    tc, amt = tcodes[dated], amount[dated]
+                else:
+                    if key is None:
+                        kcodes = np.full(n, cells.keys.code(""), dtype=np.int64)
+                    else:
+                        kcodes, kvals = pd.factorize(np.asarray(key, dtype=object), use_na_sentinel=False)
+                        kcodes = cells.keys.codes([as_text(k) for k in kvals])[kcodes]
+                        if dim == "target_id":
+                            target_codes = kcodes
+                    tc, amt = tcodes, amount
+                if not len(kcodes):
+                    continue
+                # (키, 타입) 조합별로 한 번에 합산한 뒤 슬롯에 더함
+                width = len(self._types)
+                pair, upair = pd.factorize(kcodes * width + tc)
+                slots = cells.slots(upair // width, upair % width)
+                cells.amount[slots] += np.bincount(pair, weights=amt, minlength=len(upair))
+                cells.count[slots] += np.bincount(pair, minlength=len(upair))
+        self._add_daily(target_codes, cols["day"], np.asarray(tcodes, dtype=np.int64), amount, dated)
+        self.rows += n
+        self.amount += float(amount.sum())
+        self._cache = {}
+
+    def add_daily(self, ts_ns, target_id, typ, amount) -> None:
+        # 회원별 일별 증감만 더함 (스냅샷에서 시작할 때 스냅샷 이전 기록분 — 나머지 집계는 이미 스냅샷에 있음)
+        if len(amount) == 0:
+            return
+        # 대상 ID 는 수익 타입 행만 번호로 바꿈
+        ts_ns = np.asarray(ts_ns, dtype=np.int64)
+        m = (ts_ns != _NAT) & np.isin(np.asarray(typ, dtype=object), PROFIT_TYPES)
+        if not m.any():
+            return
+        kcodes, kvals = pd.factorize(np.asarray(target_id, dtype=object)[m], use_na_sentinel=False)
+        target_codes = self._cells["target_id"].keys.codes([as_text(k) for k in kvals])[kcodes]
+        self._daily.add(target_codes, period_keys(ts_ns[m])["day"], np.asarray(amount, dtype=float)[m])
+
+    def _add_daily(self, target_codes, day, tcodes, amount, dated) -> None:
+        # 수익($)을 바꾸는 타입 + 날짜가 있는 기록만
+        profit = [self._types.index[t] for t in PROFIT_TYPES if t in self._types.index]
+        m = dated & np.isin(tcodes, profit)
+        if m.any():
+            self._daily.add(np.asarray(target_codes)[m], day[m], amount[m])
+
+    # ---------- 조회 ----------
+    def member_daily(self, target_id, last: int = 30, end_ns: int | None = None, balance: float | None = None) -> pd.DataFrame:
+        # 회원 1명의 end 까지 연속된 last 일 (기록이 없는 날은 0) → date, amount, count[, balance]
+        # balance(현재 잔액)를 주면 그날 마감 잔액 = 현재 잔액 − 그날 이후 증감 합
+        code = self._cells["target_id"].keys.index.get(as_text(target_id))
+        if code is None:
+            day, amount, count = np.empty(0, dtype=np.int64), np.empty(0, dtype=float), np.empty(0, dtype=np.int64)
+        else:
+            day, amount, count = self._daily.get(code)
+        if end_ns is None or end_ns == _NAT:
+            if not len(day):
+                return pd.DataFrame(columns=["date", "amount", "count"] + ([] if balance is None else ["balance"]))
+            end = int(day[-1])
+        else:
+            end = int(period_keys(np.asarray([end_ns]))["day"][0])
+        span = np.arange(end - last + 1, end + 1, dtype=np.int64)
+        pos = pd.Index(day).get_indexer(span)
+        found = pos >= 0
+        amt = np.zeros(len(span), dtype=float)
+        cnt = np.zeros(len(span), dtype=np.int64)
+        amt[found] = amount[pos[found]]
+        cnt[found] = count[pos[found]]
+        out = pd.DataFrame({"date": period_labels("day", span), "amount": amt, "count": cnt})
+        if balance is not None:
+            after = float(amount[day > end].sum())
+            out["balance"] = float(balance) - after - (amt.sum() - np.cumsum(amt))
+        return out
+
+    def totals(self, dim: str, types=None) -> pd.DataFrame:
+        # dim: "type" | "admin_id" | "target_id" | "day" | "week" | "month" → [dim, amount, count]
+        # types 를 주면 해당 타입만 합산 (예: 지급 타입)
+        cache_key = ("totals", dim, None if types is None else tuple(types))
+        if cache_key not in self._cache:
+            keys, amount, count = self._sum(dim, types)
+            if dim in PERIODS:
+                order = np.argsort(keys, kind="stable")
+                label = period_labels(dim, keys[order])
+            else:
+                order = np.argsort(-amount, kind="stable")
+                label = keys[order]
+            self._cache[cache_key] = pd.DataFrame({dim: label, "amount": amount[order], "count": count[order]})
+        return self._cache[cache_key]
+
+    def period_series(self, gran: str, types=None, last: int = 12, end_ns: int | None = None) -> pd.DataFrame:
+        # end 가 속한 기간까지 연속된 last 개 기간 (기록이 없는 기간은 0) + 직전 기간 대비 증감
+        keys, amount, count = self._sum(gran, types)
+        if end_ns is None or end_ns == _NAT:
+            if not len(keys):
+                return pd.DataFrame(columns=["period", "amount", "count", "change", "change_pct"])
+            end = int(keys.max())
+        else:
+            end = int(period_keys(np.asarray([end_ns]))[gran][0])
+        step = 7 if gran == "week" else 1
+        span = np.arange(end - step * last, end + 1, step, dtype=np.int64)  # 첫 칸은 증감 계산용 직전 기간
+        pos = pd.Index(keys).get_indexer(span)
+        found = pos >= 0
+        amt = np.zeros(len(span), dtype=float)
+        cnt = np.zeros(len(span), dtype=np.int64)
+        amt[found] = amount[pos[found]]
+        cnt[found] = count[pos[found]]
+
+        change = np.diff(amt)
+        prev = amt[:-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = np.where(prev != 0, change / np.abs(prev) * 100.0, np.nan)
+        return pd.DataFrame(
+            {
+                "period": period_labels(gran, span[1:]),
+                "amount": amt[1:],
+                "count": cnt[1:],
+                "change": change,
+                "change_pct": pct,
+            }
+        )
+
+    def _sum(self, dim: str, types) -> tuple:
+        # 집계 셀을 키별로 합산 (types 로 타입 선택) → (키 배열, 금액, 건수), 다음 추가 전까지 캐시
+        cache_key = ("sum", dim, None if types is None else tuple(types))
+        if cache_key not in self._cache:
+            by_type = dim == "type"
+            cells = self._cells["all" if by_type else dim]
+            n = cells.n
+            key = cells.type[:n] if by_type else cells.key[:n]
+            m = np.ones(n, dtype=bool)
+            if types is not None:
+                m = np.isin(cells.type[:n], [self._types.index[t] for t in types if t in self._types.index])
+            size = len(self._types) if by_type else len(cells.keys)
+            amount = np.bincount(key[m], weights=cells.amount[:n][m], minlength=size)
+            count = np.bincount(key[m], weights=cells.count[:n][m], minlength=size).astype(np.int64)
+            hit = np.flatnonzero(count > 0)
+            values = self._types.values if by_type else cells.keys.values
+            keys = np.asarray(values, dtype=np.int64 if dim in PERIODS else object)[hit]
+            self._cache[cache_key] = (keys, amount[hit], count[hit])
+        return self._cache[cache_key]
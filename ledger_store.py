@@ -0,0 +1,451 @@
+import re
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from ledger_rollup import LedgerRollup, as_text
+from storage import LEDGER_COLS
+
+# =========================================================
+# 정산 기록 저널 (LedgerJournal)
+# - append-only: 이벤트 1건 = 저장소에 레코드 1건 추가 (파일 재작성 없음)
+# - 메모리 뷰는 컬럼 버퍼(용량 2배 증가)에 덧붙이기만 함 → 이벤트당 O(1) 분할상환
+# - group(): 대량 정산 등 버스트 구간을 한 번의 쓰기/fsync 로 묶는 그룹 커밋
+# - on_dirty 가 설정되면(WriteBehind) durable 이 아닌 추가는 메모리에만 반영하고 저장은 flush() 로 미룸
+#   durable 추가/대량 정산은 미뤄 둔 레코드까지 순서대로 즉시 저장
+# - 조회 엔진: ts 를 파싱한 정수(ns) 배열 + 시간순 보관 + target_id / type 별 행 위치 인덱스
+#   최근 N건/필터 조회는 인덱스에서 고른 행만 읽음 (전체 정렬/문자열 스캔 없음)
+#   동시 세션에서 ts 가 조금 늦게 도착한 기록은 시간순 위치 버퍼의 끝부분에만 끼움 (조회 때 재정렬 없음)
+# - 수당 지급 run_id(대량 정산 요약 메모의 [run_id]) 집합 → 중복 지급 확인은 has_run() 한 번 (기록 개수와 무관)
+# - 집계(LedgerRollup): 추가할 때마다 타입/관리자/대상/일·주·월 합계 + 회원별 일별 수익 증감 → 리포트/대시보드는 집계만 읽음
+#   스냅샷은 저장소에 보관, 시작 시 스냅샷 이후 추가분만 더함
+#   스냅샷에는 마지막으로 반영한 기록(워터마크)을 함께 저장 → 저장 순서상 rows 번째 기록과 다르면 재구성
+#   (앱과 API 가 각자 집계를 저장 → 다른 프로세스의 기록이 사이에 끼어든 집계는 건수/금액이 같아도 버림)
+# =========================================================
+
+_TEXT_COLS = [c for c in LEDGER_COLS if c != "amount"]
+_NAT = np.iinfo(np.int64).min  # 파싱 불가 ts (가장 오래된 것으로 취급)
+_INDEX_LIMIT = 50_000  # 인덱스 후보가 이보다 많으면 최신 행부터 거꾸로 훑는 편이 빠름
+_ROLLUP_SAVE_EVERY = 10_000  # 스냅샷 이후 추가분이 이만큼(또는 전체의 1/10) 쌓이면 스냅샷 갱신
+_RUN_TYPE = "batch_settlement"
+_WATERMARK = "watermark"  # 집계 스냅샷의 워터마크 행 dim (LedgerRollup.from_frame 은 모르는 dim 을 건너뜀)
+_RUN_ID = re.compile(r"\[([0-9a-f]{12})\]")  # payout.payout_run_id()
+
+
+def parse_ts(values) -> np.ndarray:
+    ts = pd.to_datetime(pd.Index(values, dtype=object), format="ISO8601", errors="coerce")
+    return ts.as_unit("ns").asi8
+
+
+class _KeyIndex:
+    # 키 → 행 위치(오름차순). 빌드 시점 행은 CSR(키별 구간), 이후 추가분은 키별 리스트
+    def __init__(self, values: np.ndarray):
+        codes, uniques = pd.factorize(pd.Index(values, dtype=object), use_na_sentinel=False)
+        self.key_list = uniques.tolist()  # 키 목록 (처음 나온 순서)
+        self._code = {k: i for i, k in enumerate(self.key_list)}
+        self._order = np.argsort(codes, kind="stable")
+        self._offsets = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(uniques)))))
+        self._tail = {}
+        self.tail_size = 0
+
+    def add(self, key, pos: int) -> None:
+        tail = self._tail.get(key)
+        if tail is None:
+            if key not in self._code:
+                self.key_list.append(key)
+            tail = self._tail[key] = []
+        tail.append(pos)
+        self.tail_size += 1
+
+    def count(self, key) -> int:
+        c = self._code.get(key)
+        base = 0 if c is None else int(self._offsets[c + 1] - self._offsets[c])
+        return base + len(self._tail.get(key, ()))
+
+    def positions(self, key, last: int | None = None) -> np.ndarray:
+        # last 가 주어지면 마지막 last 개만 (행 위치 = 추가 순서)
+        tail = self._tail.get(key, [])
+        if last is not None and len(tail) >= last:
+            return np.asarray(tail[len(tail) - last :], dtype=np.int64)
+        c = self._code.get(key)
+        if c is None:
+            base = np.empty(0, dtype=np.int64)
+        else:
+            lo, hi = int(self._offsets[c]), int(self._offsets[c + 1])
+            if last is not None:
+                lo = max(lo, hi - (last - len(tail)))
+            base = self._order[lo:hi]
+        return np.concatenate((base, np.asarray(tail, dtype=np.int64)))
+
+
+class LedgerJournal:
+    def __init__(self, storage, lg: pd.DataFrame):
+        self._storage = storage
+        self._lock = threading.RLock()
+        self._pending = None  # group() 중 모아둔 레코드
+        self._pending_durable = False
+        self._unsaved = []  # 메모리에는 반영됐지만 아직 저장소에 없는 레코드 (저장 순서대로)
+        self._io_lock = threading.Lock()  # 저장소 쓰기 순서 보장 (메모리 lock 과 분리 → 쓰는 동안에도 조회/지연 추가 가능)
+        self.on_dirty = None  # 설정되면 durable 이 아닌 추가는 저장을 미루고 호출 (WriteBehind 가 flush)
+
+        n = len(lg)
+        ts = parse_ts(lg["ts"])
+        self._rollup = self._load_rollup(lg, ts)
+        # 메모리에서는 시간순으로 보관 (같은 시각은 기존 순서 유지)
+        order = np.argsort(ts, kind="stable")
+        cap = max(1024, 1 << (n + 1).bit_length())
+        self._cols = {c: np.empty(cap, dtype=object) for c in _TEXT_COLS}
+        self._amount = np.zeros(cap, dtype=float)
+        self._ts = np.zeros(cap, dtype=np.int64)
+        for c in _TEXT_COLS:
+            self._cols[c][:n] = lg[c].astype(object).to_numpy()[order]
+        self._amount[:n] = lg["amount"].to_numpy(dtype=float)[order]
+        self._ts[:n] = ts[order]
+        self._n = n
+        self._sorted = True  # 이후 추가분까지 ts 가 단조 증가인지 (늦게 도착한 기록이 생기면 False)
+        self._order = None  # _sorted 가 아닐 때의 시간순 위치 버퍼 (추가 때마다 갱신, 전체 재정렬 없음)
+        self._build_indexes()
+        self._frame = None
+
+    def __len__(self) -> int:
+        return self._n
+
+    # ---------- 쓰기 ----------
+    def append(self, record: dict, durable: bool = False) -> None:
+        self.append_many([record], durable=durable)
+
+    def append_many(self, records: list, durable: bool = False) -> None:
+        if not records:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(records)
+                self._pending_durable = self._pending_durable or durable
+                self._extend(records)
+                return
+            deferred = self.on_dirty is not None and not durable
+            if deferred:
+                self._unsaved.extend(records)
+                self._extend(records)
+        if deferred:
+            self.on_dirty()
+        else:
+            self._write(records, lambda batch: self._storage.append_ledger(batch, durable=durable))
+
+    def append_with_members(self, records: list, df: pd.DataFrame, changed: pd.DataFrame, durable: bool = False, edits: dict | None = None) -> None:
+        # 회원 행 변경과 기록을 저장소에 함께 커밋한 뒤 메모리 뷰 확장 (대량 정산, edits: 잔액 증감)
+        with self._lock:
+            if self._pending is not None:
+                raise RuntimeError("group() 안에서는 사용할 수 없습니다")
+        self._write(records, lambda batch: self._storage.save_batch(df, changed, batch, durable=durable, edits=edits))
+
+    def flush(self, durable: bool = False) -> int:
+        # 미뤄 둔 레코드를 한 번에 저장 → 저장한 건수
+        return self._write([], lambda batch: batch and self._storage.append_ledger(batch, durable=durable))
+
+    def unsaved(self) -> int:
+        return len(self._unsaved)
+
+    def _write(self, records: list, write) -> int:
+        # 미뤄 둔 레코드 + records 를 순서대로 저장하고, 성공한 뒤에만 records 로 메모리 뷰 확장 (디스크와 어긋나지 않도록)
+        # 실패하면 미뤄 둔 레코드는 다음 저장을 위해 되돌려 둠
+        with self._io_lock:
+            with self._lock:
+                batch, self._unsaved = self._unsaved, []
+            try:
+                write(batch + records)
+            except Exception:
+                with self._lock:
+                    self._unsaved = batch + self._unsaved
+                raise
+            with self._lock:
+                if records:
+                    self._extend(records)
+                self._maybe_save_rollup()
+            return len(batch) + len(records)
+
+    @contextmanager
+    def group(self, durable: bool = False):
+        # 본문 동안 lock 을 잡아 다른 스레드의 추가가 섞이지 않게 하고, 저장은 lock 을 놓은 뒤
+        # (_write 는 _io_lock → _lock 순서로 잡으므로 _lock 을 쥔 채 저장하지 않음)
+        self._lock.acquire()
+        if self._pending is not None:  # 중첩 호출은 바깥 group 에 합류
+            try:
+                yield self
+            finally:
+                self._lock.release()
+            return
+        self._pending = []
+        self._pending_durable = durable
+        try:
+            yield self
+        finally:
+            records, self._pending = self._pending, None
+            durable = self._pending_durable
+            self._unsaved.extend(records)
+            self._lock.release()
+            if records:
+                if durable or self.on_dirty is None:
+                    self.flush(durable=durable)
+                else:
+                    self.on_dirty()
+
+    def _extend(self, records: list) -> None:
+        need = self._n + len(records)
+        if need > len(self._amount):
+            cap = len(self._amount)
+            while cap < need:
+                cap *= 2
+            for c in _TEXT_COLS:
+                grown = np.empty(cap, dtype=object)
+                grown[: self._n] = self._cols[c][: self._n]
+                self._cols[c] = grown
+            grown = np.zeros(cap, dtype=float)
+            grown[: self._n] = self._amount[: self._n]
+            self._amount = grown
+            grown = np.zeros(cap, dtype=np.int64)
+            grown[: self._n] = self._ts[: self._n]
+            self._ts = grown
+            if self._order is not None:
+                grown = np.empty(cap, dtype=np.int64)
+                grown[: self._n] = self._order[: self._n]
+                self._order = grown
+
+        ts = parse_ts([rec.get("ts", "") for rec in records])
+        self._ts[self._n : need] = ts
+        self._place(ts, self._n)
+
+        start = self._n
+        i = start
+        for rec in records:
+            for c in _TEXT_COLS:
+                self._cols[c][i] = rec.get(c, "")
+            self._amount[i] = float(rec.get("amount", 0.0) or 0.0)
+            self._by_target.add(self._cols["target_id"][i], i)
+            self._by_type.add(self._cols["type"][i], i)
+            if self._cols["type"][i] == _RUN_TYPE:
+                self._runs.update(_RUN_ID.findall(str(self._cols["note"][i])))
+            i += 1
+        self._last = _watermark(records[-1])
+        cols = self._cols
+        self._rollup.add(ts, cols["admin_id"][start:need], cols["target_id"][start:need], cols["type"][start:need], self._amount[start:need])
+        self._n = need
+        self._frame = None
+        if self._by_target.tail_size > max(50_000, need // 4):
+            self._build_indexes()
+
+    # ---------- 집계 스냅샷 ----------
+    def _load_rollup(self, lg: pd.DataFrame, ts: np.ndarray) -> LedgerRollup:
+        # 저장된 스냅샷 + 그 이후 추가된 기록(저장 순서상 뒤쪽)만 더함
+        # 스냅샷의 건수/금액 합계/워터마크가 기록 앞부분과 맞지 않으면 기록 전체에서 재구성
+        amount = lg["amount"].to_numpy(dtype=float)
+        self._last = _watermark(lg.iloc[-1]) if len(lg) else None
+        frame = self._storage.load_rollup()
+        rollup = None if frame is None else LedgerRollup.from_frame(frame)
+        if rollup is not None and rollup.rows:
+            mark = frame.loc[frame["dim"] == _WATERMARK, "key"].tolist()
+            if (
+                rollup.rows > len(lg)
+                or not np.isclose(rollup.amount, amount[: rollup.rows].sum(), rtol=1e-9, atol=1e-6)
+                or mark != [_watermark(lg.iloc[rollup.rows - 1])]
+            ):
+                rollup = None
+        if rollup is None:
+            rollup = LedgerRollup()
+        start = rollup.rows
+        if start:
+            rollup.add_daily(ts[:start], lg["target_id"].to_numpy()[:start], lg["type"].to_numpy()[:start], amount[:start])
+        if start < len(lg):
+            rollup.add(ts[start:], lg["admin_id"].to_numpy()[start:], lg["target_id"].to_numpy()[start:], lg["type"].to_numpy()[start:], amount[start:])
+            self._save_rollup(rollup)
+        self._rollup_saved = rollup.rows
+        return rollup
+
+    def _maybe_save_rollup(self) -> None:
+        if self._pending is None and not self._unsaved and self._n - self._rollup_saved >= max(_ROLLUP_SAVE_EVERY, self._n // 10):
+            self._save_rollup(self._rollup)
+            self._rollup_saved = self._n
+
+    def _save_rollup(self, rollup: LedgerRollup) -> None:
+        # 스냅샷은 시작 속도용 캐시 → 저장 실패는 기록 추가를 막지 않음 (다음 시작 때 재구성)
+        # 호출 시점에 rollup 은 이 저널이 본 기록 전체(미저장/그룹 대기 없음) → 마지막 기록이 워터마크
+        frame = rollup.to_frame()
+        if self._last is not None:
+            frame = pd.concat([frame, pd.DataFrame([{"dim": _WATERMARK, "key": self._last, "type": "", "amount": 0.0, "count": 0}])], ignore_index=True)
+        try:
+            self._storage.save_rollup(frame)
+        except Exception:
+            pass
+
+    def _build_indexes(self) -> None:
+        self._by_target = _KeyIndex(self._cols["target_id"][: self._n])
+        self._by_type = _KeyIndex(self._cols["type"][: self._n])
+        self._runs = {run for note in self._cols["note"][self._by_type.positions(_RUN_TYPE)] for run in _RUN_ID.findall(str(note))}
+        self._folded = []  # target_id 키 목록의 casefold (부분 일치 검색용, 키 추가 시 뒤에만 덧붙임)
+
+    # ---------- 조회 ----------
+    def totals(self, dim: str, types=None) -> pd.DataFrame:
+        # 집계 합계: dim = "type" | "admin_id" | "target_id" | "day" | "week" | "month"
+        with self._lock:
+            return self._rollup.totals(dim, types)
+
+    def period_totals(self, gran: str, types=None, last: int = 12, until: str | None = None) -> pd.DataFrame:
+        # until 이 속한 기간까지 연속된 last 개 기간의 합계 + 직전 기간 대비 증감 (gran = "day" | "week" | "month")
+        with self._lock:
+            end_ns = None if until is None else int(parse_ts([until])[0])
+            return self._rollup.period_series(gran, types, last=last, end_ns=end_ns)
+
+    def member_daily(self, target_id, last: int = 30, until: str | None = None, balance: float | None = None) -> pd.DataFrame:
+        # 회원 1명의 일별 수익 증감/마감 잔액 (집계 시계열에서 그 회원 구간만 읽음)
+        with self._lock:
+            end_ns = None if until is None else int(parse_ts([until])[0])
+            return self._rollup.member_daily(target_id, last, end_ns, balance)
+
+    def has_run(self, run_id: str) -> bool:
+        # 이 run_id 의 수당 지급이 이미 반영됐는지
+        with self._lock:
+            return run_id in self._runs
+
+    def types(self) -> list:
+        with self._lock:
+            return sorted(str(t) for t in self._by_type.key_list)
+
+    def latest(
+        self,
+        n: int = 20,
+        target: str | None = None,
+        target_contains: str | None = None,
+        typ: str | None = None,
+        since: str | None = None,
+    ) -> pd.DataFrame:
+        # 최신순 n 건
+        # - 조건에 맞는 행이 적으면: 가장 좁은 인덱스(대상/타입)에서 후보를 고르고 나머지 조건은 후보에만 적용
+        # - 많으면: 시간 역순으로 조금씩 훑다가 n 건이 차면 중단
+        with self._lock:
+            since_ns = None if since is None else int(parse_ts([since])[0])
+            keys = None
+            if target is not None:
+                keys = [target]
+            elif target_contains:
+                keys = self._match_targets(target_contains)
+
+            sizes = []
+            if keys is not None:
+                sizes.append(sum(self._by_target.count(k) for k in keys))
+            if typ is not None:
+                sizes.append(self._by_type.count(typ))
+            if sizes and min(sizes) <= _INDEX_LIMIT:
+                if keys is not None and (typ is None or sizes[0] <= sizes[1]):
+                    parts = [self._by_target.positions(k) for k in keys]
+                    pos = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+                    if typ is not None:
+                        pos = pos[self._cols["type"][pos] == typ]
+                else:
+                    pos = self._by_type.positions(typ)
+                    if keys is not None:
+                        keyset = set(keys)
+                        pos = pos[np.fromiter((v in keyset for v in self._cols["target_id"][pos]), dtype=bool, count=len(pos))]
+                if since_ns is not None:
+                    pos = pos[self._ts[pos] >= since_ns]
+                return self._take(self._newest(pos, n))
+            return self._take(self._scan(n, None if keys is None else set(keys), typ, since_ns))
+
+    def _match_targets(self, needle: str) -> list:
+        # 대상 ID 부분 일치 (대소문자 무시) — 행이 아니라 서로 다른 대상 ID 목록만 확인
+        keys = self._by_target.key_list
+        if len(self._folded) < len(keys):
+            self._folded += [str(k).casefold() for k in keys[len(self._folded) :]]
+        needle = needle.casefold()
+        return [k for k, f in zip(keys, self._folded) if needle in f]
+
+    def _scan(self, n: int, keyset, typ, since_ns) -> np.ndarray:
+        order = None if self._sorted else self._order[: self._n]
+        out, end, step = [], self._n, 1024
+        while end > 0 and len(out) < n:
+            start = max(0, end - step)
+            pos = np.arange(end - 1, start - 1, -1) if order is None else order[start:end][::-1]
+            m = np.ones(len(pos), dtype=bool)
+            if keyset is not None:
+                m &= np.fromiter((v in keyset for v in self._cols["target_id"][pos]), dtype=bool, count=len(pos))
+            if typ is not None:
+                m &= self._cols["type"][pos] == typ
+            if since_ns is not None:
+                m &= self._ts[pos] >= since_ns
+                if self._ts[pos[-1]] < since_ns:
+                    end = 0  # 시간 역순이므로 이후 구간은 모두 기간 밖
+            out.extend(pos[m][: n - len(out)].tolist())
+            end, step = (start if end else 0), min(step * 2, 1 << 16)
+        return np.asarray(out, dtype=np.int64)
+
+    def _newest(self, pos: np.ndarray, n: int) -> np.ndarray:
+        # 시간 역순, 같은 시각은 나중에 추가된 것 먼저
+        if self._sorted:
+            return np.sort(pos)[::-1][:n]
+        key = np.lexsort((pos, self._ts[pos]))[::-1]
+        return pos[key][:n]
+
+    def _place(self, ts: np.ndarray, start: int) -> None:
+        # 새 기록(위치 start 부터)을 시간순 위치 버퍼에 반영
+        # 버퍼 위치는 추가 순서 그대로 두고(인덱스/내보내기용), 늦게 도착한 기록만 시간순 버퍼의 끝부분에 끼움
+        m = start
+        last = _NAT if not m else self._ts[m - 1 if self._order is None else self._order[m - 1]]
+        if ts[0] >= last and (len(ts) == 1 or (np.diff(ts) >= 0).all()):
+            if self._order is not None:
+                self._order[m : m + len(ts)] = np.arange(m, m + len(ts))
+            return
+        if self._order is None:
+            self._order = np.arange(len(self._ts), dtype=np.int64)
+            self._sorted = False
+        for pos in range(start, start + len(ts)):
+            t = self._ts[pos]
+            # 끝에서부터 창을 넓혀 가며 자리 탐색 → 비용은 얼마나 늦게 도착했는지에 비례
+            w = 64
+            while True:
+                lo = max(0, m - w)
+                window = self._ts[self._order[lo:m]]
+                if lo == 0 or window[0] <= t:
+                    break
+                w *= 4
+            at = lo + int(np.searchsorted(window, t, side="right"))
+            self._order[at + 1 : m + 1] = self._order[at:m]
+            self._order[at] = pos
+            m += 1
+
+    def _take(self, pos: np.ndarray) -> pd.DataFrame:
+        data = {c: self._cols[c][pos] for c in _TEXT_COLS}
+        data["amount"] = self._amount[pos]
+        return pd.DataFrame(data, columns=LEDGER_COLS)
+
+    # ---------- 읽기 ----------
+    def chunks(self, size: int = 100_000, n: int | None = None):
+        # 내보내기용: 앞에서부터 n 행(기본: 현재 전체)을 size 행씩 DataFrame 으로
+        # 버퍼는 덧붙이기만 하고 기존 행은 바뀌지 않으므로 잡아 둔 배열은 잠금 없이 읽어도 안전
+        with self._lock:
+            n = self._n if n is None else min(n, self._n)
+            cols, amount = dict(self._cols), self._amount
+        start = 0
+        while True:
+            end = min(n, start + size)
+            data = {c: cols[c][start:end] for c in _TEXT_COLS}
+            data["amount"] = amount[start:end]
+            yield pd.DataFrame(data, columns=LEDGER_COLS)
+            start = end
+            if start >= n:
+                return
+
+    def frame(self) -> pd.DataFrame:
+        # 화면용 DataFrame 은 길이가 바뀐 경우에만 다시 만든다
+        with self._lock:
+            if self._frame is None:
+                data = {c: self._cols[c][: self._n] for c in _TEXT_COLS}
+                data["amount"] = self._amount[: self._n]
+                self._frame = pd.DataFrame(data, columns=LEDGER_COLS)
+            return self._frame
+
+
+def _watermark(rec) -> str:
+    # 기록 1건의 식별 문자열 (집계 스냅샷 워터마크) — 저장소에서 읽은 행(Series)과 추가한 레코드(dict) 모두
+    text = [as_text(rec.get(c)) for c in ("ts", "admin_id", "target_id", "type", "note")]
+    return "\x1f".join([*text, f"{float(rec.get('amount') or 0.0):.6f}"])
@@ -0,0 +1,655 @@
+import heapq
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from referral_tree import CycleError, ReferralTree
+from search_index import SEARCH_FIELDS, MemberSearchIndex
+from storage import same_value
+
+# =========================================================
+# 회원 저장소 (MemberStore)
+# - ID → 행 라벨 해시 인덱스 / Role → ID 집합 인덱스
+# - df 는 고정 라벨을 유지 (삭제해도 다른 행 라벨은 그대로) → 인덱스 재구축 불필요
+# - 가입/삭제는 표를 다시 만들지 않음: 새 행은 꼬리(dict)에 덧붙이고 삭제는 표시만 → 전체 표가 필요한
+#   읽기(store.df) 또는 밀린 건수가 _COMPACT_EVERY(또는 전체의 1/10)를 넘을 때 한꺼번에 정리
+# - 생성/삭제/수정은 반드시 store 를 거쳐야 인덱스가 최신으로 유지됨
+# - 직추천: 추천인별 카운터를 증감(+1/-1)으로 유지, 전체 재계산은 점검/복구용
+# - 소실적: ReferralTree 가 계산 (단건 변경은 조상 경로만 갱신)
+# - 변경된 행/삭제된 ID 를 기록 → take_changes() 로 저장소에 해당 행만 반영
+#   행마다 바뀐 컬럼과 바꾸기 전 값, 수익 증감도 기록 → 저장소는 그 컬럼만 compare-and-set, 수익은 증감으로 (다른 프로세스와 공유)
+# - 프로세스 공용: 변경은 lock 안에서 df 를 얕은 복사하고 고칠 컬럼만 새 배열로 바꿔 끼운 뒤 수정 → 읽는 쪽은
+#   복사 없이 store.df 스냅샷을 그대로 사용, 변경마다 version 증가 (pandas 전역 옵션에 의존하지 않음)
+# - 관리자 KPI(회원/관리자 수, 수익 합계/평균, 수익 상위 힙, 추천인 오류 수)도 변경 시 증감 유지
+# - 검색 인덱스(ID/이름/이메일/추천인)는 첫 검색 때 만들고 이후 변경분만 반영
+# - 목록 화면용 page(): 필터/정렬/페이지 자르기를 서버에서 처리 (정렬 순서는 version 별 캐시)
+# - cached(): 리포트 같은 읽기 전용 계산을 version 별로 보관 (변경이 없는 재실행에서는 재계산 없음)
+# - 낙관적 동시성: 회원 행마다 버전 스탬프(row_version) → 수정/리셋/삭제는 화면에 불러온 시점의 버전과
+#   비교 후 반영(compare-and-set), 그 사이 다른 관리자가 바꿨으면 ConflictError
+#   편집한 컬럼 값이 그대로면(다른 컬럼만 바뀜) 충돌로 보지 않음 / 수익 증감(add_profits)은 순서와 무관 → 버전 비교 없음
+# =========================================================
+
+_COMPACT_EVERY = 10_000
+
+
+class ConflictError(Exception):
+    # 화면에 불러온 뒤 다른 관리자가 먼저 바꾸거나 삭제한 회원
+    def __init__(self, ids: list):
+        super().__init__(f"다른 관리자가 먼저 변경한 회원: {', '.join(map(str, ids))}")
+        self.ids = ids
+
+
+class MemberStore:
+    def __init__(self, df: pd.DataFrame):
+        self._lock = threading.RLock()
+        self.version = 0
+        # 저장소에서 읽은 상태 그대로 시작 (파생 컬럼이 어긋난 행만 변경분으로 기록됨)
+        self._load(df)
+
+    @contextmanager
+    def write(self):
+        # 여러 변경을 하나의 단위로 묶을 때 사용 (중첩 가능)
+        with self._lock:
+            self._df = self._df.copy(deep=False)
+            self._owned = set()  # 이번 얕은 복사 이후 새 배열로 바꾼 컬럼
+            try:
+                yield self
+            finally:
+                self.version += 1
+
+    def _load(self, df: pd.DataFrame) -> None:
+        if not df.index.is_unique:
+            df = df.reset_index(drop=True)
+        self._df = df
+        self._owned = set()  # 넘겨받은 표는 호출 측 것 → 고치기 전에 컬럼 복사
+        self._tail = {}  # 새로 추가된 행 (라벨 → 행 dict), 표에는 정리 때 합침
+        self._dead = set()  # 삭제 표시된 표의 라벨 (정리 때 제거)
+        self._next_label = int(df.index.max()) + 1 if len(df) else 0
+        self._dirty = set()
+        self._deleted = set()
+        # 저장소에 행 단위로 반영할 내용: 새 회원 / 회원별 바뀐 컬럼과 저장소에서 읽었던 값 / 수익 증감
+        self._new = set()
+        self._fields = {}
+        self._profit = {}
+        # 행 버전: 로드 이후 바뀐 행만 기록, 나머지는 로드 시각 (다시 로드해도 이전 스탬프와 겹치지 않도록 단조 시계)
+        self._ver_base = self._ver_clock = time.monotonic_ns()
+        self._row_ver = {}
+        self._rebuild_index()
+
+    def _rebuild_index(self) -> None:
+        ids = self.df["ID"].astype(str)
+        self._label = {}
+        for uid, label in zip(ids, self.df.index):
+            self._label.setdefault(uid, label)  # 중복 ID 는 첫 행 기준 (기존 get_user_row 와 동일)
+
+        self._roles = {}
+        for uid, label, role in zip(ids, self.df.index, self.df["Role"]):
+            if self._label[uid] == label:
+                self._roles.setdefault(_norm_role(role), set()).add(uid)
+
+        # 추천인 ID → 직추천 수 (존재하지 않는 추천인도 보관: 나중에 그 ID 가 생기면 그대로 반영)
+        self._sponsor_count = self.df["추천인"].astype(str).value_counts().to_dict()
+
+        self._rebuild_tree()
+        self._rebuild_kpi()
+        self._search = None  # 첫 검색 시 생성
+        self._sort_cache = {}  # (version, 컬럼, 오름차순) → 정렬된 라벨 배열
+        self._derived = {}  # 이름 → (version, 계산 결과) (리포트 등)
+
+    # ---------- 추가/삭제분 정리 ----------
+    @property
+    def df(self) -> pd.DataFrame:
+        # 전체 표가 필요한 읽기에서만 밀린 추가/삭제를 합침 (변경 후 첫 전체 읽기에서 한 번)
+        if self._tail or self._dead:
+            with self._lock:
+                self._compact()
+        return self._df
+
+    def _compact(self) -> None:
+        if not self._tail and not self._dead:
+            return
+        df = self._df
+        if self._dead:
+            df = df[~df.index.isin(list(self._dead))]
+        if self._tail:
+            df = pd.concat([df, self._tail_frame(list(self._tail))])
+        self._df, self._tail, self._dead = df, {}, set()
+        self._owned = set(df.columns)  # 필터/concat 결과는 새 배열
+
+    def _maybe_compact(self) -> None:
+        if len(self._tail) + len(self._dead) > max(_COMPACT_EVERY, len(self._df) // 10):
+            self._compact()
+
+    def _tail_frame(self, labels: list) -> pd.DataFrame:
+        return pd.DataFrame.from_records([self._tail[label] for label in labels], index=labels, columns=self._df.columns)
+
+    def _at(self, label, col):
+        row = self._tail.get(label)
+        return self._df.at[label, col] if row is None else row[col]
+
+    def _set(self, label, col, value) -> None:
+        row = self._tail.get(label)
+        if row is None:
+            self._own(col)
+            self._df.at[label, col] = value
+        else:
+            row[col] = value
+
+    def _own(self, col: str) -> None:
+        # 얕은 복사본의 컬럼은 이전 스냅샷과 배열을 공유 → 이번 변경 단위에서 처음 고칠 때 그 컬럼만 복사해서 바꿔 끼움
+        if col not in self._owned:
+            self._df[col] = self._df[col].copy()
+            self._owned.add(col)
+
+    # ---------- 조회 (O(1)) ----------
+    def snapshot(self) -> tuple:
+        # (version, df) 를 함께 읽음 — 변경 도중의 df 와 이전 version 이 짝지어지지 않도록
+        with self._lock:
+            return self.version, self.df
+
+    def __len__(self) -> int:
+        return len(self._df) - len(self._dead) + len(self._tail)
+
+    def __contains__(self, user_id) -> bool:
+        return str(user_id) in self._label
+
+    def label(self, user_id):
+        return self._label.get(str(user_id))
+
+    def get_row(self, user_id):
+        label = self._label.get(str(user_id))
+        if label is None:
+            return None
+        row = self._tail.get(label)
+        return self._df.loc[label] if row is None else pd.Series(row, name=label)
+
+    def row_version(self, user_id) -> int | None:
+        uid = str(user_id)
+        return self._row_ver.get(uid, self._ver_base) if uid in self._label else None
+
+    def versions(self, user_ids) -> dict:
+        return {str(u): self.row_version(u) for u in user_ids}
+
+    def conflicts(self, changes: dict, expected: dict, base: dict | None = None) -> list:
+        # changes: {ID: {컬럼: 값}} / expected: {ID: 불러올 때의 버전} / base: {ID: {컬럼: 불러올 때 값}}
+        # 버전이 바뀐 회원 중 삭제됐거나 편집한 컬럼 값이 달라진 회원 ID 목록
+        out = []
+        for uid, fields in changes.items():
+            uid = str(uid)
+            version = self.row_version(uid)
+            if version is None:
+                out.append(uid)
+            elif uid in expected and version != expected[uid]:
+                old = (base or {}).get(uid)
+                label = self._label[uid]
+                if old is None or any(not same_value(self._at(label, c), old.get(c)) for c in fields):
+                    out.append(uid)
+        return out
+
+    def _touch(self, uids) -> None:
+        for uid in uids:
+            self._ver_clock += 1
+            self._row_ver[uid] = self._ver_clock
+
+    def get(self, user_id, col: str, default=None):
+        label = self._label.get(str(user_id))
+        return default if label is None else self._at(label, col)
+
+    def role_of(self, user_id) -> str | None:
+        label = self._label.get(str(user_id))
+        return None if label is None else _norm_role(self._at(label, "Role"))
+
+    def is_admin(self, user_id) -> bool:
+        return str(user_id) in self._roles.get("admin", ())
+
+    def ids_with_role(self, role: str) -> set:
+        return self._roles.get(_norm_role(role), set())
+
+    def count_role(self, role: str) -> int:
+        return len(self._roles.get(_norm_role(role), ()))
+
+    def has_ids(self, user_ids: pd.Series) -> np.ndarray:
+        # 여러 ID 존재 여부를 한 번에 (대량 정산 검증)
+        label = self._label
+        return np.fromiter((u in label for u in user_ids.astype(str).tolist()), dtype=bool, count=len(user_ids))
+
+    def ids(self) -> list:
+        return self.df["ID"].tolist()
+
+    def rows(self, user_ids) -> pd.DataFrame:
+        # 저장소 행 단위 upsert 용 (존재하는 ID 만) — 아직 표에 합치지 않은 새 행은 따로 붙임 (정리 없이)
+        labels = [self._label[str(u)] for u in dict.fromkeys(user_ids) if str(u) in self._label]
+        new = [label for label in labels if label in self._tail]
+        if not new:
+            return self._df.loc[labels]
+        old = [label for label in labels if label not in self._tail]
+        return pd.concat([self._df.loc[old], self._tail_frame(new)])
+
+    def search(self, query: str, limit: int | None = None) -> list:
+        # 순위순 ID 목록 (완전 일치 > 접두 > 부분 일치)
+        with self._lock:
+            if self._search is None:
+                self._search = MemberSearchIndex(self.df)
+            return self._search.search(query, limit)
+
+    def page(
+        self,
+        ids: list | None = None,
+        sort_by: str | None = None,
+        ascending: bool = True,
+        role: str | None = None,
+        position: str | None = None,
+        offset: int = 0,
+        limit: int = 50,
+    ) -> tuple:
+        # (해당 페이지 행, 필터 후 전체 건수) — ids 가 주어지면 그 순서(검색 순위)를 기본으로 사용
+        with self._lock:
+            df = self.df
+            if ids is None:
+                labels = self._sorted_labels(sort_by, ascending) if sort_by else df.index.to_numpy()
+            else:
+                labels = np.asarray([self._label[str(u)] for u in dict.fromkeys(ids) if str(u) in self._label], dtype=df.index.dtype)
+                if sort_by and len(labels):
+                    labels = df.loc[labels, sort_by].sort_values(ascending=ascending, kind="stable").index.to_numpy()
+            if role:
+                want = [self._label[u] for u in self._roles.get(_norm_role(role), ()) if u in self._label]
+                labels = labels[np.isin(labels, want)]
+            if position:
+                labels = labels[(df.loc[labels, "위치"].astype(str) == position).to_numpy()]
+            return df.loc[labels[offset : offset + limit]], len(labels)
+
+    def _sorted_labels(self, col: str, ascending: bool) -> np.ndarray:
+        key = (self.version, col, ascending)
+        cached = self._sort_cache.get(key)
+        if cached is None:
+            cached = self.df[col].sort_values(ascending=ascending, kind="stable").index.to_numpy()
+            self._sort_cache = {key: cached}  # 최신 version 의 한 가지 정렬만 보관
+        return cached
+
+    def tree_stats(self) -> pd.DataFrame:
+        return self.tree.stats_frame()
+
+    def cached(self, name: str, compute):
+        # version 별 파생 값 캐시: 변경이 없으면 compute(df) 없이 이전 결과 재사용
+        # 계산은 lock 밖에서 (그동안 변경이 들어와도 결과는 읽은 version 기준으로 보관)
+        # 보관은 lock 안에서, 다른 세션이 더 새 version 으로 먼저 보관했으면 덮어쓰지 않음
+        with self._lock:
+            version, df = self.version, self.df
+            hit = self._derived.get(name)
+        if hit is not None and hit[0] == version:
+            return hit[1]
+        value = compute(df)
+        with self._lock:
+            if version >= self._derived.get(name, (-1,))[0]:
+                self._derived[name] = (version, value)
+        return value
+
+    def kpis(self) -> dict:
+        total_admin = self.count_role("admin")
+        total_users = len(self._label) - total_admin
+        total_profit = sum(self._profit_by_role.values())
+        user_profit = total_profit - self._profit_by_role.get("admin", 0.0)
+        top = self.top_profit(1)
+        return {
+            "total_users": total_users,
+            "total_admin": total_admin,
+            "total_profit": total_profit,
+            "avg_profit": user_profit / total_users if total_users > 0 else 0.0,
+            "top_user": top[0] if top else ("-", 0.0),
+            "orphan_cnt": self._orphans,
+        }
+
+    def top_profit(self, k: int = 1) -> list:
+        # 지연 삭제 힙: 현재 값과 다른(오래된) 항목은 꺼내면서 버린다
+        with self._lock:
+            out, keep = [], []
+            while self._heap and len(out) < k:
+                item = heapq.heappop(self._heap)
+                neg, uid = item
+                label = self._label.get(uid)
+                if label is None or float(self._at(label, "수익($)")) != -neg or uid in (u for u, _ in out):
+                    continue
+                out.append((uid, -neg))
+                keep.append(item)
+            for item in keep:
+                heapq.heappush(self._heap, item)
+            return out
+
+    # ---------- 변경 ----------
+    def add(self, row: dict):
+        with self.write():
+            return self._add(row)
+
+    def _add(self, row: dict):
+        uid = str(row["ID"])
+        if uid in self._label:
+            raise KeyError(f"이미 존재하는 ID: {uid}")
+        label = self._next_label
+        self._next_label += 1
+
+        sponsor = str(row.get("추천인", "-"))
+        self._orphans -= self._sponsor_count.get(uid, 0)  # 이 ID 를 기다리던 회원들은 더 이상 오류 아님
+        self._sponsor_count[sponsor] = self._sponsor_count.get(sponsor, 0) + 1
+        row = {**row, "직추천": int(self._sponsor_count.get(uid, 0))}
+
+        self._tail[label] = {c: row.get(c, np.nan) for c in self._df.columns}  # 표 재구성 없이 덧붙임
+
+        self._label[uid] = label
+        role = _norm_role(row.get("Role", "user"))
+        self._roles.setdefault(role, set()).add(uid)
+        self._orphans += self._is_orphan_sponsor(sponsor)
+        self._kpi_add(uid, role, float(row.get("수익($)", 0.0) or 0.0))
+        self._dirty.add(uid)
+        self._new.add(uid)
+        self._touch([uid])
+        if self._search is not None:
+            self._search.add(row)
+        self._refresh_direct(sponsor)
+        self._tree_apply(self.tree.add, uid, sponsor, row.get("위치", "-"), float(row.get("수익($)", 0.0) or 0.0))
+        self._maybe_compact()
+        return label
+
+    def delete(self, user_id, expected: int | None = None) -> bool:
+        # expected: 불러올 때의 row_version (주면 그 뒤 바뀐 회원은 삭제하지 않고 ConflictError)
+        with self._lock:
+            if expected is not None and self.row_version(user_id) != expected:
+                raise ConflictError([str(user_id)])
+            with self.write():
+                return self._delete(user_id)
+
+    def _delete(self, user_id) -> bool:
+        uid = str(user_id)
+        label = self._label.pop(uid, None)
+        if label is None:
+            return False
+        role = _norm_role(self._at(label, "Role"))
+        self._roles.get(role, set()).discard(uid)
+        sponsor = str(self._at(label, "추천인"))
+        if sponsor != uid:  # uid 는 이미 _label 에서 빠졌으므로 자기 추천은 제외
+            self._orphans -= self._is_orphan_sponsor(sponsor)
+        self._profit_by_role[role] = self._profit_by_role.get(role, 0.0) - float(self._at(label, "수익($)"))
+        if self._tail.pop(label, None) is None:
+            self._dead.add(label)  # 표에서는 정리 때 한꺼번에 제거
+        self._dirty.discard(uid)
+        self._fields.pop(uid, None)
+        self._profit.pop(uid, None)
+        if uid in self._new:
+            self._new.discard(uid)  # 아직 저장 안 된 회원 → 저장소에서 지울 것 없음
+        else:
+            self._deleted.add(uid)
+        self._row_ver.pop(uid, None)
+        self._bump_sponsor(sponsor, -1)
+        self._orphans += self._sponsor_count.get(uid, 0)  # 이 회원을 추천인으로 둔 회원들은 오류가 됨
+        self._tree_apply(self.tree.remove, uid)
+        if self._search is not None:
+            self._search.remove(uid)
+        self._maybe_compact()
+        return True
+
+    def update(self, user_id, fields: dict, expected: int | None = None, base: dict | None = None) -> bool:
+        uid = str(user_id)
+        return bool(
+            self.update_many(
+                {uid: fields},
+                expected=None if expected is None else {uid: expected},
+                base=None if base is None else {uid: base},
+            )
+        )
+
+    def update_many(self, changes: dict, expected: dict | None = None, base: dict | None = None) -> int:
+        # {ID: {컬럼: 값}} 를 한 번의 변경 단위로 반영 (바뀐 회원 수만큼만 작업)
+        # expected/base 를 주면 충돌 검사 후 반영 — 충돌이 하나라도 있으면 아무것도 바꾸지 않고 ConflictError
+        with self._lock:
+            if expected is not None:
+                bad = self.conflicts(changes, expected, base)
+                if bad:
+                    raise ConflictError(bad)
+            with self.write():
+                return sum(self._update(uid, fields) for uid, fields in changes.items())
+
+    def _update(self, user_id, fields: dict) -> bool:
+        uid = str(user_id)
+        label = self._label.get(uid)
+        if label is None:
+            return False
+        fields = {k: v for k, v in fields.items() if k != "소실적"}  # 파생 컬럼 (트리 계산값 유지)
+        self._dirty.add(uid)
+        self._touch([uid])
+        for col in fields:
+            if col != "수익($)":  # 수익은 아래에서 증감으로 기록
+                self._mark(uid, label, col)
+        searchable = self._search is not None and any(c in fields for c in SEARCH_FIELDS)
+
+        old_sponsor = str(self._at(label, "추천인"))
+        old_side = str(self._at(label, "위치"))
+        if "추천인" in fields:
+            new_sponsor = str(fields["추천인"])
+            if old_sponsor != new_sponsor:
+                self._set(label, "추천인", new_sponsor)
+                self._orphans += self._is_orphan_sponsor(new_sponsor) - self._is_orphan_sponsor(old_sponsor)
+                self._bump_sponsor(old_sponsor, -1)
+                self._bump_sponsor(new_sponsor, +1)
+            fields = {k: v for k, v in fields.items() if k != "추천인"}
+        old_role = _norm_role(self._at(label, "Role"))
+        old_profit = float(self._at(label, "수익($)"))
+        if "Role" in fields:
+            new_role = _norm_role(fields["Role"])
+            if old_role != new_role:
+                self._roles.get(old_role, set()).discard(uid)
+                self._roles.setdefault(new_role, set()).add(uid)
+        for col, val in fields.items():
+            self._set(label, col, val)
+        if "Role" in fields or "수익($)" in fields:
+            self._profit_by_role[old_role] = self._profit_by_role.get(old_role, 0.0) - old_profit
+            self._kpi_add(uid, _norm_role(self._at(label, "Role")), float(self._at(label, "수익($)")))
+        if "수익($)" in fields and uid not in self._new:
+            self._profit[uid] = self._profit.get(uid, 0.0) + float(self._at(label, "수익($)")) - old_profit
+
+        new_sponsor = str(self._at(label, "추천인"))
+        new_side = str(self._at(label, "위치"))
+        if (new_sponsor, new_side) != (old_sponsor, old_side):
+            self._tree_apply(self.tree.move, uid, new_sponsor, new_side)
+        if "수익($)" in fields:
+            self._tree_apply(self.tree.set_profit, uid, float(self._at(label, "수익($)")))
+        if searchable:
+            self._search.update({c: self._at(label, c) for c in SEARCH_FIELDS})
+        return True
+
+    def add_profits(self, deltas: pd.Series, commit=None) -> None:
+        # deltas: ID → 수익($) 증감액 (대량 정산). 열 단위로 한 번에 더하고 KPI/트리는 규모에 따라
+        # 증분 또는 전체 재계산. commit(df, 변경 행) 이 주어지면 같은 lock 안에서 저장하고,
+        # 실패하면 메모리 변경도 되돌린다.
+        with self.write():
+            labels = deltas.index.map(self._label)
+            keep = labels.notna()
+            deltas, labels = deltas[keep], labels[keep].astype(self._df.index.dtype)
+            if deltas.empty:
+                return
+            if self._tail and any(label in self._tail for label in labels):
+                self._compact()  # 열 단위 갱신은 표에 있는 행만 (방금 추가된 회원이 대상이면 먼저 합침)
+            ids = deltas.index.astype(str).tolist()
+            old = self._df.loc[labels, "수익($)"].astype(float)
+            new = old + deltas.to_numpy(dtype=float)
+            self._own("수익($)")
+            self._df.loc[labels, "수익($)"] = new.to_numpy()
+            self._refresh_profits(ids, labels, new, deltas)
+            self._touch(ids)
+            if commit is None:
+                self._dirty.update(ids)
+                for uid, delta in zip(ids, deltas.to_numpy(dtype=float).tolist()):
+                    if uid not in self._new:
+                        self._profit[uid] = self._profit.get(uid, 0.0) + delta
+                return
+            # 저장소에는 증감으로 (아직 저장 안 된 새 회원은 행 전체를 함께 INSERT)
+            inserted = {uid for uid in ids if uid in self._new}
+            edits = {"new": inserted, "fields": {}, "profit": dict(zip(ids, deltas.to_numpy(dtype=float).tolist()))}
+            try:
+                commit(self.df, self._df.loc[labels], edits)
+            except Exception:
+                self._df.loc[labels, "수익($)"] = old.to_numpy()
+                self._rebuild_kpi()
+                self._rebuild_tree()
+                raise
+            self._new -= inserted
+
+    def _refresh_profits(self, ids: list, labels, new: pd.Series, deltas: pd.Series) -> None:
+        if len(ids) * 8 > len(self):
+            # 대부분의 회원이 바뀐 경우 조상 경로 갱신보다 벡터화 전체 재계산이 빠름
+            self._rebuild_kpi()
+            self._rebuild_tree()
+            return
+        roles = self._df.loc[labels, "Role"].map(_norm_role).to_numpy()
+        for role, total in deltas.groupby(roles).sum().items():
+            self._profit_by_role[role] = self._profit_by_role.get(role, 0.0) + float(total)
+        for uid, profit in zip(ids, new.tolist()):
+            heapq.heappush(self._heap, (-profit, uid))
+            self._tree_apply(self.tree.set_profit, uid, profit)
+        if len(self._heap) > 2 * len(self._label) + 1024:
+            self._rebuild_kpi()
+
+    # ---------- 변경 추적 ----------
+    def take_changes(self) -> tuple:
+        # (변경된 ID 집합, 삭제된 ID 집합, edits) 반환 후 초기화
+        # edits = {"new": 새 회원 ID, "fields": {ID: {컬럼: 저장소에서 읽었던 값}}, "profit": {ID: 수익 증감}}
+        # → 저장소는 바뀐 컬럼만 compare-and-set 으로, 수익은 증감으로 기록 (다른 프로세스의 변경을 덮어쓰지 않음)
+        with self._lock:
+            edits = {"new": self._new & self._dirty, "fields": self._fields, "profit": self._profit}
+            out = (self._dirty, self._deleted, edits)
+            self._dirty, self._deleted = set(), set()
+            self._new, self._fields, self._profit = self._new - edits["new"], {}, {}
+            return out
+
+    def take_dirty_rows(self, table: bool = True) -> tuple:
+        # 백그라운드 저장용: 변경분과 그 시점의 테이블/변경 행을 한 번에 (다른 스레드의 변경 도중 상태를 읽지 않도록)
+        # table=False: 행 단위 저장소(SQLite)는 전체 표가 필요 없음 → 밀린 추가/삭제를 정리하지 않음
+        with self._lock:
+            changed, deleted, edits = self.take_changes()
+            return changed, deleted, self.df if table else None, self.rows(changed), edits
+
+    def requeue_changes(self, changed, deleted, edits: dict | None = None) -> None:
+        # 저장 실패 시 take_changes() 로 가져간 변경분을 되돌려 다음 저장에 포함
+        # (그 사이 다시 추가/삭제된 ID 는 현재 상태 기준으로만 남김, 읽었던 값은 먼저 가져간 쪽이 저장소 값)
+        with self._lock:
+            self._dirty.update(u for u in changed if u in self._label)
+            self._deleted.update(u for u in deleted if u not in self._label)
+            if edits is None:
+                return
+            self._new.update(u for u in edits["new"] if u in self._label)
+            for uid, fields in edits["fields"].items():
+                if uid in self._label:
+                    self._fields.setdefault(uid, {}).update(fields)
+            for uid, delta in edits["profit"].items():
+                if uid in self._label:
+                    self._profit[uid] = self._profit.get(uid, 0.0) + delta
+
+    def _mark(self, uid: str, label, col: str) -> None:
+        # 처음 바뀌는 컬럼이면 바꾸기 전 값(= 저장소에 있다고 보는 값)을 기록 → 저장 시 compare-and-set 기준
+        if uid not in self._new:
+            fields = self._fields.setdefault(uid, {})
+            if col not in fields:
+                fields[col] = self._at(label, col)
+        self._dirty.add(uid)
+
+    def _mark_derived(self, uids, col: str) -> None:
+        # 파생 컬럼(직추천/소실적)은 트리에서 다시 계산되므로 비교 기준 없이 기록
+        for uid in uids:
+            if uid not in self._new:
+                self._fields.setdefault(uid, {}).setdefault(col, None)
+            self._dirty.add(uid)
+
+    # ---------- KPI ----------
+    def _rebuild_kpi(self) -> None:
+        roles = self.df["Role"].map(_norm_role)
+        profit = pd.to_numeric(self.df["수익($)"], errors="coerce").fillna(0.0)
+        self._profit_by_role = profit.groupby(roles).sum().to_dict()
+        sponsors = self.df["추천인"].astype(str)
+        self._orphans = int(((sponsors != "-") & ~self.has_ids(sponsors)).sum())
+        self._heap = list(zip((-profit).tolist(), self.df["ID"].astype(str).tolist()))
+        heapq.heapify(self._heap)
+
+    def _kpi_add(self, uid: str, role: str, profit: float) -> None:
+        self._profit_by_role[role] = self._profit_by_role.get(role, 0.0) + profit
+        heapq.heappush(self._heap, (-profit, uid))
+        if len(self._heap) > 2 * len(self._label) + 1024:
+            # 오래된 항목이 쌓이면 현재 값으로 다시 구성
+            self._heap = list(zip((-self.df["수익($)"].astype(float)).tolist(), self.df["ID"].astype(str).tolist()))
+            heapq.heapify(self._heap)
+
+    def _is_orphan_sponsor(self, sponsor: str) -> int:
+        return int(sponsor != "-" and sponsor not in self._label)
+
+    # ---------- 소실적 (트리) ----------
+    def _rebuild_tree(self) -> None:
+        # 소실적은 트리에서 파생 → 저장된 값과 다르면 갱신 대상으로 기록
+        self.tree = ReferralTree(self.df)
+        weak = pd.Series(self.tree.weak_legs(), index=self.df.index)
+        bad = weak != self.df["소실적"]
+        if bad.any():
+            self._own("소실적")
+            self.df.loc[bad, "소실적"] = weak[bad]
+            self._mark_derived(self.df.loc[bad, "ID"].astype(str), "소실적")
+
+    def _tree_apply(self, op, *args) -> None:
+        try:
+            touched = op(*args)
+        except CycleError:
+            # 순환이 생기거나 풀리는 변경은 드묾 → 전체 재빌드로 정확도 유지
+            self._rebuild_tree()
+            return
+        self._sync_weak(touched)
+
+    def _sync_weak(self, user_ids) -> None:
+        for uid in dict.fromkeys(user_ids):
+            label = self._label.get(uid)
+            if label is None:
+                continue
+            weak = self.tree.weak_leg(uid)
+            if self._at(label, "소실적") != weak:
+                self._set(label, "소실적", weak)
+                self._mark_derived([uid], "소실적")
+
+    # ---------- 직추천 카운터 ----------
+    def _bump_sponsor(self, sponsor: str, delta: int) -> None:
+        cnt = self._sponsor_count.get(sponsor, 0) + delta
+        if cnt > 0:
+            self._sponsor_count[sponsor] = cnt
+        else:
+            self._sponsor_count.pop(sponsor, None)
+        self._refresh_direct(sponsor)
+
+    def _refresh_direct(self, sponsor: str) -> None:
+        label = self._label.get(sponsor)
+        if label is not None:
+            self._set(label, "직추천", int(self._sponsor_count.get(sponsor, 0)))
+            self._mark_derived([sponsor], "직추천")
+
+    def direct_referrals(self, user_id) -> int:
+        return int(self._sponsor_count.get(str(user_id), 0))
+
+    def verify_direct_referrals(self, repair: bool = False) -> pd.DataFrame:
+        # 전체 재계산(벡터화) 결과와 저장된 직추천 비교 → 어긋난 행 보고, repair=True 면 복구
+        with self.write():
+            expected = count_direct_referrals(self.df)
+            current = self.df["직추천"]
+            bad = expected != current
+            drift = pd.DataFrame({"ID": self.df.loc[bad, "ID"], "직추천(저장)": current[bad], "직추천(재계산)": expected[bad]})
+            if repair and bad.any():
+                self._own("직추천")
+                self.df.loc[bad, "직추천"] = expected[bad]
+                self._mark_derived(drift["ID"].astype(str), "직추천")
+            self._sponsor_count = self.df["추천인"].astype(str).value_counts().to_dict()
+            return drift
+
+
+def count_direct_referrals(df: pd.DataFrame) -> pd.Series:
+    counts = df["추천인"].astype(str).value_counts()
+    return df["ID"].astype(str).map(counts).fillna(0).astype(int)
+
+
+def _norm_role(role) -> str:
+    if role is None or (isinstance(role, float) and pd.isna(role)):
+        return "user"
+    return str(role).lower()
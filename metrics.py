@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# =========================================================
+# 성능 계측 (Metrics)
+# - span(이름): with 블록으로 구간 시간 측정 / instrument(): 객체의 메서드를 이름별 span 으로 감쌈
+# - 이름별 최근 표본(링 버퍼) + 누적 건수/합계 → p50/p95/p99 는 조회할 때만 정렬해서 계산
+#   error(이름): 구간 안에서 처리하지 못한 예외 건수 (API 500 응답 등)
+#   기록 비용은 perf_counter 2회 + append 1회 (TRADINGX_METRICS=0 이면 아무것도 하지 않음)
+# - Prometheus 텍스트 형식(summary)으로 파일 저장 (node exporter textfile collector 용)
+#   TRADINGX_METRICS_FILE 경로에 TRADINGX_METRICS_INTERVAL(기본 15초)마다 임시 파일 → 교체
+# =========================================================
+
+METRICS_ENABLED = os.environ.get("TRADINGX_METRICS", "1") != "0"
+METRICS_FILE = os.environ.get("TRADINGX_METRICS_FILE", "")
+METRICS_INTERVAL = float(os.environ.get("TRADINGX_METRICS_INTERVAL", "15"))
+METRICS_WINDOW = 2048  # 이름별 최근 표본 수 (분위수 계산 범위)
+QUANTILES = (0.50, 0.95, 0.99)
+
+
+class _Series:
+    __slots__ = ("samples", "count", "total", "errors")
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+
+
+class Metrics:
+    def __init__(self, enabled: bool = METRICS_ENABLED, window: int = METRICS_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self._lock = threading.Lock()
+        self._series = {}
+        self._exporter = None
+
+    def observe(self, name: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            s = self._get(name)
+            s.samples.append(seconds)
+            s.count += 1
+            s.total += seconds
+
+    def error(self, name: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._get(name).errors += 1
+
+    def _get(self, name: str) -> _Series:
+        s = self._series.get(name)
+        if s is None:
+            s = self._series[name] = _Series(self.window)
+        return s
+
+    @contextmanager
+    def span(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            # 예외(st.rerun 포함)로 빠져나가도 기록
+            self.observe(name, time.perf_counter() - started)
+
+    def timed(self, name: str, fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.observe(name, time.perf_counter() - started)
+
+        return wrapper
+
+    def instrument(self, obj, prefix: str, methods: list):
+        # 인스턴스 속성으로 감싼 메서드를 덮어씀 (클래스/다른 인스턴스는 그대로)
+        if self.enabled:
+            for m in methods:
+                setattr(obj, m, self.timed(f"{prefix}.{m}", getattr(obj, m)))
+        return obj
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series = {}
+
+    def stats(self) -> list:
+        # [{name, count, errors, total, p50, p95, p99, max}] (초 단위, 누적 시간 큰 순)
+        with self._lock:
+            items = [(name, s.count, s.errors, s.total, list(s.samples)) for name, s in self._series.items()]
+        out = []
+        for name, count, errors, total, samples in items:
+            samples.sort()
+            row = {"name": name, "count": count, "errors": errors, "total": total, "max": samples[-1] if samples else 0.0}
+            for q in QUANTILES:
+                row[f"p{round(q * 100)}"] = _quantile(samples, q)
+            out.append(row)
+        out.sort(key=lambda r: r["total"], reverse=True)
+        return out
+
+    def prometheus(self) -> str:
+        lines = [
+            "# HELP tradingx_span_seconds Duration of instrumented TRADING X code paths (recent window quantiles).",
+            "# TYPE tradingx_span_seconds summary",
+        ]
+        rows = self.stats()
+        for row in rows:
+            label = _escape(row["name"])
+            for q in QUANTILES:
+                lines.append(f'tradingx_span_seconds{{span="{label}",quantile="{q}"}} {row[f"p{round(q * 100)}"]:.6f}')
+            lines.append(f'tradingx_span_seconds_sum{{span="{label}"}} {row["total"]:.6f}')
+            lines.append(f'tradingx_span_seconds_count{{span="{label}"}} {row["count"]}')
+        lines += [
+            "# HELP tradingx_span_errors_total Unhandled errors inside instrumented TRADING X code paths.",
+            "# TYPE tradingx_span_errors_total counter",
+        ]
+        for row in rows:
+            lines.append(f'tradingx_span_errors_total{{span="{_escape(row["name"])}"}} {row["errors"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        # 수집기가 쓰는 도중의 파일을 읽지 않도록 임시 파일 → 교체
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(tmp, path)
+
+    def start_exporter(self, path: str = METRICS_FILE, interval: float = METRICS_INTERVAL) -> bool:
+        # 프로세스당 1회 (이미 실행 중이거나 경로가 없으면 무시)
+        if not (self.enabled and path) or self._exporter is not None:
+            return False
+        self._exporter = threading.Thread(target=self._export_loop, args=(path, interval), name="tradingx-metrics", daemon=True)
+        self._exporter.start()
+        return True
+
+    def _export_loop(self, path: str, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                self.write_textfile(path)
+            except OSError:
+                pass  # 다음 주기에 재시도
+
+
+def _quantile(samples: list, q: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics()
@@ -0,0 +1,157 @@
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from referral_tree import LEFT, RIGHT, level_order
+
+# =========================================================
+# 수수료 지급 엔진 (Payout)
+# - 입력: 기간 거래량(ID, volume) + 수당 비율표(tradingx_payout_rates.json, 없으면 기본값)
+#   direct: 직추천(1대) 하위 거래량 × 비율 / levels: 2대, 3대 ... 상위 추천인 비율 / binary: 좌·우 하위 거래량 중 작은 쪽 × 비율
+# - 계산: 추천인/위치 트리를 레벨 순서 배열로 만들어 전체 회원을 한 번에 계산 (회원별 재귀 없음)
+#   단계 수당 = 부모 배열을 세대 수만큼 따라 올라가며 bincount / 바이너리 = 깊은 레벨부터 좌·우 하위 거래량 누적
+# - 같은 회원 트리 + 같은 거래량 + 같은 비율표 → 같은 결과 (센트 반올림, run_id 로 중복 지급 확인)
+# - 결과는 대량 정산 형식(target_id, type, amount, note) → settlement.plan_batch / apply_batch 로 미리보기·반영
+# =========================================================
+
+PAYOUT_RATES_FILE = os.environ.get("TRADINGX_PAYOUT_RATES", "tradingx_payout_rates.json")
+DEFAULT_RATES = {
+    "direct": 0.175,  # 직추천 하위 거래량의 17.5%
+    "levels": [0.05, 0.03, 0.02],  # 2대, 3대, 4대
+    "binary": 0.10,  # 소실적(좌·우 중 작은 쪽) 거래량의 10%
+    "binary_cap": 0.0,  # 회원별 바이너리 수당 상한 ($, 0 이면 없음)
+}
+PAYOUT_COLS = ["ID", "거래량", "직추천수당", "단계수당", "바이너리수당", "합계"]
+
+
+_RATES_CACHE: dict = {}  # path -> ((size, mtime_ns), 비율표)
+
+
+def load_rates(path: str = PAYOUT_RATES_FILE) -> dict:
+    # 화면 재실행마다 불림 → 파일 크기·수정 시각이 같으면 이전에 읽은 비율표 사용 (파일을 새로 저장하면 다시 읽음)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return check_rates(DEFAULT_RATES)
+    key = (stat.st_size, stat.st_mtime_ns)
+    hit = _RATES_CACHE.get(path)
+    if hit is None or hit[0] != key:
+        with open(path, encoding="utf-8") as f:
+            hit = _RATES_CACHE[path] = (key, check_rates(json.load(f)))
+    return {**hit[1], "levels": list(hit[1]["levels"])}
+
+
+def check_rates(rates: dict) -> dict:
+    out = {**DEFAULT_RATES, **rates}
+    try:
+        out["direct"] = float(out["direct"])
+        out["levels"] = [float(r) for r in out["levels"]]
+        out["binary"] = float(out["binary"])
+        out["binary_cap"] = float(out["binary_cap"] or 0.0)
+    except (TypeError, ValueError):
+        raise ValueError("수당 비율표 형식이 올바르지 않습니다 (direct/binary/binary_cap: 숫자, levels: 숫자 목록).") from None
+    if any(not 0 <= r <= 1 for r in [out["direct"], out["binary"], *out["levels"]]) or out["binary_cap"] < 0:
+        raise ValueError("수당 비율은 0~1 사이, 상한은 0 이상이어야 합니다.")
+    return out
+
+
+def read_volumes(name: str, data: bytes) -> pd.DataFrame:
+    if name.lower().endswith((".parquet", ".pq")):
+        df = pd.read_parquet(io.BytesIO(data))
+    else:
+        df = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    df.columns = [str(c).strip() for c in df.columns]
+    if "ID" not in df.columns and "target_id" in df.columns:
+        df = df.rename(columns={"target_id": "ID"})
+    missing = [c for c in ["ID", "volume"] if c not in df.columns]
+    if missing:
+        raise ValueError(f"필수 컬럼이 없습니다: {', '.join(missing)}")
+    return df[["ID", "volume"]].reset_index(drop=True)
+
+
+def compute_payout(members: pd.DataFrame, volume: pd.Series, rates: dict) -> pd.DataFrame:
+    # members: 회원 표(ID/추천인/위치), volume: ID → 기간 거래량 → 회원별 수당 (PAYOUT_COLS, 회원 표 순서)
+    ids, parent, side, levels, _self_ref = level_order(members)
+    n = len(ids)
+    vol = volume.groupby(level=0).sum().reindex(ids).fillna(0.0).to_numpy(dtype=float)
+
+    in_tree = np.zeros(n, dtype=bool)
+    for lvl in levels:
+        in_tree[lvl] = True
+    parent = np.where(in_tree, parent, -1)  # 순환에 걸린 회원은 상위로 지급하지 않음
+
+    # 1) 직추천/단계 수당: 거래량이 있는 회원에서 시작해 세대마다 부모로 한 칸씩 (세대 수만큼 O(n) 연산)
+    gen_rates = [rates["direct"], *rates["levels"]]
+    per_gen = []
+    who = np.flatnonzero((vol != 0) & (parent >= 0))
+    anc = parent[who]
+    for rate in gen_rates:
+        per_gen.append(np.bincount(anc, weights=vol[who] * rate, minlength=n) if rate else np.zeros(n))
+        up = parent[anc]
+        keep = up >= 0
+        who, anc = who[keep], up[keep]
+        if not len(anc):
+            break
+    direct = per_gen[0]
+    level = np.sum(per_gen[1:], axis=0) if len(per_gen) > 1 else np.zeros(n)
+
+    # 2) 바이너리: 깊은 레벨부터 (본인 + 하위) 거래량을 부모의 좌/우 칸에 누적 → 레벨마다 한 번의 벡터 연산
+    legs = np.zeros((3, n))  # 0: 위치 없음, LEFT, RIGHT
+    for lvl in reversed(levels[1:]):
+        sub = vol[lvl] + legs[:, lvl].sum(axis=0)
+        np.add.at(legs, (side[lvl], parent[lvl]), sub)
+    binary = rates["binary"] * np.minimum(legs[LEFT], legs[RIGHT])
+    if rates["binary_cap"] > 0:
+        binary = np.minimum(binary, rates["binary_cap"])
+
+    out = pd.DataFrame(
+        {
+            "ID": ids,
+            "거래량": vol,
+            "직추천수당": np.round(direct, 2),
+            "단계수당": np.round(level, 2),
+            "바이너리수당": np.round(binary, 2),
+        }
+    )
+    out["합계"] = out["직추천수당"] + out["단계수당"] + out["바이너리수당"]
+    return out[~pd.Series(ids).duplicated().to_numpy()].reset_index(drop=True)
+
+
+def plan_payout(store, volumes: pd.DataFrame, rates: dict, period: str) -> dict:
+    # 반영 전 계산만 수행 (dry-run). batch 는 settlement.plan_batch 에 그대로 넘길 수 있는 형식
+    vid = volumes["ID"].fillna("").astype(str).str.strip()
+    amount = pd.to_numeric(volumes["volume"], errors="coerce")
+    reason = np.select(
+        [vid == "", ~store.has_ids(vid), ~np.isfinite(amount.to_numpy(dtype=float)) | (amount < 0).to_numpy()],
+        ["ID 없음", "존재하지 않는 회원", "거래량 오류"],
+        "",
+    )
+    ok = reason == ""
+    errors = pd.DataFrame({"line": np.arange(len(volumes)) + 2, "ID": vid, "volume": volumes["volume"]})[~ok].assign(사유=reason[~ok])
+    volume = pd.Series(amount[ok].to_numpy(dtype=float), index=vid[ok].to_numpy())
+
+    _version, df = store.snapshot()
+    result = compute_payout(df, volume, rates)
+    run_id = payout_run_id(df, volume, rates, period)
+    paid = result[result["합계"] > 0]
+    note = [
+        f"수당 {period} [{run_id}] 직추천 {d:.2f} / 단계 {lv:.2f} / 바이너리 {b:.2f}"
+        for d, lv, b in zip(paid["직추천수당"], paid["단계수당"], paid["바이너리수당"])
+    ]
+    batch = pd.DataFrame({"target_id": paid["ID"], "type": "commission_add", "amount": paid["합계"], "note": note})
+    return {"result": result, "paid": paid, "errors": errors, "batch": batch.reset_index(drop=True), "run_id": run_id}
+
+
+def payout_run_id(members: pd.DataFrame, volume: pd.Series, rates: dict, period: str) -> str:
+    # 트리 구조(ID/추천인/위치) + 거래량 + 비율표 + 기간이 같으면 같은 ID
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(members[["ID", "추천인", "위치"]], index=False).to_numpy().tobytes())
+    vol = volume.groupby(level=0).sum().sort_index()
+    h.update(pd.util.hash_pandas_object(vol, index=True).to_numpy().tobytes())
+    h.update(json.dumps(rates, sort_keys=True).encode("utf-8"))
+    h.update(period.encode("utf-8"))
+    return h.hexdigest()[:12]
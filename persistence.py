@@ -0,0 +1,94 @@
+import atexit
+import os
+import threading
+import time
+
+# =========================================================
+# 백그라운드 저장 (WriteBehind)
+# - 화면(UI 스레드)은 메모리(MemberStore / LedgerJournal)만 바꾸고 notify() → 저장은 백그라운드 스레드가 수행
+# - 짧은 대기 창(TRADINGX_WRITE_DELAY, 기본 0.2초) 안에 들어온 변경은 한 번의 쓰기로 합침
+#   회원: take_dirty_rows() 로 모인 변경 행만 / 기록: 저널에 밀린 레코드를 한 번에 append
+# - flush(durable=True): 금액 변경(정산) 등은 밀린 변경까지 즉시 동기 저장 (fsync / synchronous=FULL)
+# - 저장 실패 시 변경분을 되돌려 두고 잠시 뒤 재시도, 마지막 오류는 stats() 로 확인
+# - 회원은 바뀐 컬럼만 compare-and-set, 수익은 증감으로 저장 → 다른 프로세스가 먼저 바꾼 회원은 충돌로 건너뜀
+#   (건수/마지막 충돌 ID 는 stats(), 해당 회원은 changed_externally() 로 다시 로드될 때 저장소 값으로 맞춰짐)
+# - 프로세스 종료 시(atexit) 남은 변경을 flush
+# =========================================================
+
+WRITE_DELAY = float(os.environ.get("TRADINGX_WRITE_DELAY", "0.2"))
+_RETRY_DELAY = 2.0
+
+
+class WriteBehind:
+    def __init__(self, storage, delay: float = WRITE_DELAY):
+        self._storage = storage
+        self.delay = delay
+        self._store = None
+        self._journal = None
+        self._wake = threading.Event()
+        self._io_lock = threading.Lock()  # 백그라운드 쓰기와 flush() 직렬화
+        self.notified = 0
+        self.writes = 0
+        self.failures = 0
+        self.last_error = None
+        self.conflicts = 0
+        self.last_conflict = None
+        threading.Thread(target=self._run, name="tradingx-write-behind", daemon=True).start()
+        atexit.register(self.flush)
+
+    def attach(self, store, journal) -> None:
+        # 재실행마다 호출 (다시 로드된 경우에만 새 객체로 교체)
+        if journal is not self._journal:
+            journal.on_dirty = self.notify
+        self._store, self._journal = store, journal
+
+    def notify(self) -> None:
+        self.notified += 1
+        self._wake.set()
+
+    def flush(self, durable: bool = False) -> None:
+        with self._io_lock:
+            self._write(durable)
+
+    def stats(self) -> dict:
+        journal = self._journal
+        return {
+            "notified": self.notified,
+            "writes": self.writes,
+            "failures": self.failures,
+            "unsaved_ledger": journal.unsaved() if journal is not None else 0,
+            "last_error": self.last_error,
+            "conflicts": self.conflicts,
+            "last_conflict": self.last_conflict,
+        }
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            time.sleep(self.delay)  # 대기 창 안의 변경은 다음 한 번의 쓰기로 합쳐짐
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                time.sleep(_RETRY_DELAY)
+                self._wake.set()
+
+    def _write(self, durable: bool) -> None:
+        store, journal = self._store, self._journal
+        if store is not None:
+            # CSV 는 저장 때마다 전체 재작성 → 전체 표 필요, SQLite 는 변경 행만
+            changed, deleted, df, rows, edits = store.take_dirty_rows(table=self._storage.kind == "csv")
+            if changed or deleted:
+                try:
+                    conflicts = self._storage.save_members(df, changed=rows, deleted=list(deleted), durable=durable, edits=edits)
+                except Exception:
+                    store.requeue_changes(changed, deleted, edits)
+                    raise
+                self.writes += 1
+                if conflicts:
+                    self.conflicts += len(conflicts)
+                    self.last_conflict = ", ".join(map(str, conflicts[:20]))
+        if journal is not None and journal.flush(durable=durable):
+            self.writes += 1
@@ -0,0 +1,311 @@
+import numpy as np
+import pandas as pd
+
+# =========================================================
+# 추천/바이너리 트리 엔진 (ReferralTree)
+# - 추천인(부모) + 위치(Left/Right) 컬럼으로 배치 트리 구성
+# - 회원별: 좌/우 인원, 좌/우 실적(수익($) 합), 소실적(인원이 적은 쪽), 깊이, 하위 인원
+# - 전체 빌드: 레벨 순서 배열 + 역순 누적(후위 순회와 동일) → O(n) 벡터화
+# - 단건 변경: 조상 경로만 갱신 → O(depth)
+# - 순환(자기 추천, A↔B) 에 걸린 회원은 트리에서 제외 (깊이 -1)
+#   단건 변경이 순환을 만들거나 순환 구간을 건드리면 CycleError → 호출 측에서 전체 재빌드
+# =========================================================
+
+LEFT, RIGHT = 1, 2
+
+STAT_COLS = ["좌측인원", "우측인원", "좌측실적", "우측실적", "소실적", "소실적($)", "하위인원", "깊이"]
+
+
+class CycleError(Exception):
+    pass
+
+
+def _side_code(pos) -> int:
+    s = str(pos).strip().lower()
+    return LEFT if s == "left" else RIGHT if s == "right" else 0
+
+
+def level_order(df: pd.DataFrame) -> tuple:
+    # (ids, parent, side, levels, self_ref) — levels[d] 는 깊이 d 회원 위치 배열 (루트부터 한 레벨씩 BFS, 벡터화)
+    # 순환(자기 추천, A↔B)에 걸린 회원은 어느 레벨에도 들어가지 않음
+    ids = df["ID"].astype(str).to_numpy()
+    n = len(ids)
+    pos_of = pd.Series(np.arange(n), index=ids)
+    pos_of = pos_of[~pos_of.index.duplicated(keep="first")]
+
+    parent = pos_of.reindex(df["추천인"].astype(str).to_numpy()).fillna(-1).to_numpy(dtype=np.int64, copy=True)
+    # 자기 추천은 부모 없음 + 루트에서도 제외 → 순환으로 처리
+    parent[parent == np.arange(n)] = -1
+    self_ref = df["추천인"].astype(str).to_numpy() == ids
+    pos_s = df["위치"].astype(str).str.strip().str.lower()
+    side = np.select([(pos_s == "left").to_numpy(), (pos_s == "right").to_numpy()], [LEFT, RIGHT], 0).astype(np.int8)
+
+    roots = np.flatnonzero((parent < 0) & ~self_ref)
+    levels = []
+
+    # 부모별 자식 CSR
+    has_parent = np.flatnonzero(parent >= 0)
+    order = has_parent[np.argsort(parent[has_parent], kind="stable")]
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(offsets, parent[has_parent] + 1, 1)
+    offsets = np.cumsum(offsets)
+
+    frontier = roots
+    while len(frontier):
+        levels.append(frontier)
+        starts, ends = offsets[frontier], offsets[frontier + 1]
+        counts = ends - starts
+        total = int(counts.sum())
+        if total == 0:
+            break
+        # 각 frontier 노드의 자식 구간 [start, end) 를 한 번에 펼침
+        rep = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+        frontier = order[np.arange(total) + rep]
+    return ids, parent, side, levels, self_ref
+
+
+class ReferralTree:
+    def __init__(self, df: pd.DataFrame):
+        ids, parent, side, levels, self_ref = level_order(df)
+        n = len(ids)
+        profit = pd.to_numeric(df["수익($)"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+        roots = levels[0] if levels else np.zeros(0, dtype=np.int64)
+
+        depth = np.full(n, -1, dtype=np.int64)
+        for d, lvl in enumerate(levels):
+            depth[lvl] = d
+
+        in_tree = depth >= 0
+        size = in_tree.astype(np.int64)
+        vol = np.where(in_tree, profit, 0.0)
+        left_n = np.zeros(n, dtype=np.int64)
+        right_n = np.zeros(n, dtype=np.int64)
+        left_v = np.zeros(n, dtype=float)
+        right_v = np.zeros(n, dtype=float)
+
+        # 깊은 레벨부터 부모로 누적 (후위 순회 결과와 동일)
+        for lvl in reversed(levels[1:]):
+            p = parent[lvl]
+            np.add.at(size, p, size[lvl])
+            np.add.at(vol, p, vol[lvl])
+            for code, cnt, amt in ((LEFT, left_n, left_v), (RIGHT, right_n, right_v)):
+                m = side[lvl] == code
+                np.add.at(cnt, p[m], size[lvl][m])
+                np.add.at(amt, p[m], vol[lvl][m])
+
+        # 순환에 걸린 회원은 부모 연결을 끊고 (깊이 -1) 독립 노드로 둔다
+        cyclic = np.flatnonzero(~in_tree)
+        parent[cyclic] = -1
+        size[cyclic] = 1
+        vol[cyclic] = profit[cyclic]
+        has_parent = np.flatnonzero(parent >= 0)
+
+        self._pos = dict(zip(ids[::-1].tolist(), range(n - 1, -1, -1)))  # 중복 ID 는 첫 행
+        self.ids = ids.tolist()
+        self.parent = parent.tolist()
+        self.side = side.tolist()
+        self.profit = profit.tolist()
+        self.depth = depth.tolist()
+        self.size = size.tolist()  # 본인 포함 서브트리 인원
+        self.vol = vol.tolist()  # 본인 포함 서브트리 실적
+        self.left_n = left_n.tolist()
+        self.right_n = right_n.tolist()
+        self.left_v = left_v.tolist()
+        self.right_v = right_v.tolist()
+        self.alive = [True] * n
+
+        # 부모 → 자식 목록 / 아직 없는 추천인 ID → 대기 중인 자식 목록
+        self._kids = {}
+        for c in has_parent.tolist():
+            self._kids.setdefault(self.parent[c], []).append(c)
+        self._waiting = {}
+        self._waits_on = {}
+        rec = df["추천인"].astype(str).tolist()
+        for i in roots.tolist():
+            if rec[i] != "-" and rec[i] not in self._pos:
+                self._wait(i, rec[i])
+
+    # ---------- 조회 ----------
+    def weak_leg(self, user_id) -> int:
+        i = self._pos.get(str(user_id))
+        return 0 if i is None else min(self.left_n[i], self.right_n[i])
+
+    def weak_legs(self) -> np.ndarray:
+        return np.minimum(np.asarray(self.left_n), np.asarray(self.right_n))
+
+    def stats(self, user_id) -> dict | None:
+        i = self._pos.get(str(user_id))
+        return None if i is None else self._row(i)
+
+    def _row(self, i: int) -> dict:
+        weak_left = self.left_n[i] <= self.right_n[i]
+        return {
+            "좌측인원": self.left_n[i],
+            "우측인원": self.right_n[i],
+            "좌측실적": self.left_v[i],
+            "우측실적": self.right_v[i],
+            "소실적": self.left_n[i] if weak_left else self.right_n[i],
+            "소실적($)": self.left_v[i] if weak_left else self.right_v[i],
+            "하위인원": self.size[i] - 1 if self.depth[i] >= 0 else 0,
+            "깊이": self.depth[i],
+        }
+
+    def stats_frame(self) -> pd.DataFrame:
+        left_n, right_n = np.asarray(self.left_n), np.asarray(self.right_n)
+        left_v, right_v = np.asarray(self.left_v), np.asarray(self.right_v)
+        weak_left = left_n <= right_n
+        depth = np.asarray(self.depth)
+        out = pd.DataFrame(
+            {
+                "ID": self.ids,
+                "좌측인원": left_n,
+                "우측인원": right_n,
+                "좌측실적": left_v,
+                "우측실적": right_v,
+                "소실적": np.where(weak_left, left_n, right_n),
+                "소실적($)": np.where(weak_left, left_v, right_v),
+                "하위인원": np.where(depth >= 0, np.asarray(self.size) - 1, 0),
+                "깊이": depth,
+            }
+        )
+        return out[np.asarray(self.alive)]
+
+    # ---------- 단건 변경 (조상 경로 갱신) ----------
+    # 모든 변경 메서드는 소실적이 바뀌었을 수 있는 회원 ID 목록을 돌려준다
+    def add(self, user_id, sponsor, position, profit: float = 0.0) -> list:
+        uid = str(user_id)
+        i = len(self.ids)
+        self.ids.append(uid)
+        self._pos[uid] = i
+        self.parent.append(-1)
+        self.side.append(_side_code(position))
+        self.profit.append(float(profit))
+        self.depth.append(0)
+        self.size.append(1)
+        self.vol.append(float(profit))
+        for arr in (self.left_n, self.right_n):
+            arr.append(0)
+        for arr in (self.left_v, self.right_v):
+            arr.append(0.0)
+        self.alive.append(True)
+
+        touched = [uid]
+        # 이 ID 를 추천인으로 먼저 등록해 둔 회원들 연결
+        for c in self._waiting.pop(uid, []):
+            self._waits_on.pop(c, None)
+            touched += self._attach(c, i)
+        touched += self._link(i, str(sponsor))
+        return touched
+
+    def remove(self, user_id) -> list:
+        i = self._pos.get(str(user_id))
+        if i is None:
+            return []
+        if self.depth[i] < 0:
+            raise CycleError(user_id)
+        del self._pos[str(user_id)]
+        touched = self._detach(i)
+        # 자식들은 추천인이 사라졌으므로 루트가 되고, 같은 ID 가 다시 생기면 재연결
+        for c in self._kids.pop(i, []):
+            self.parent[c] = -1
+            self._set_depth(c, 0)
+            self._wait(c, self.ids[i])
+        self._unwait(i)
+        self.alive[i] = False
+        return touched
+
+    def move(self, user_id, sponsor, position) -> list:
+        i = self._pos.get(str(user_id))
+        if i is None:
+            return []
+        if self.depth[i] < 0:
+            raise CycleError(user_id)
+        touched = self._detach(i)
+        self._unwait(i)
+        self.side[i] = _side_code(position)
+        return touched + self._link(i, str(sponsor))
+
+    def set_profit(self, user_id, profit: float) -> list:
+        i = self._pos.get(str(user_id))
+        if i is None:
+            return []
+        delta = float(profit) - self.profit[i]
+        self.profit[i] = float(profit)
+        if delta == 0:
+            return []
+        self.vol[i] += delta
+        return self._propagate(i, 0, delta)
+
+    def _link(self, i: int, sponsor: str) -> list:
+        p = self._pos.get(sponsor)
+        if p is None:
+            if sponsor != "-":
+                self._wait(i, sponsor)
+            return []
+        return self._attach(i, p)
+
+    def _attach(self, c: int, p: int) -> list:
+        # p 가 c 의 하위에 있으면 순환
+        a = p
+        while a >= 0:
+            if a == c:
+                raise CycleError(self.ids[c])
+            a = self.parent[a]
+        if self.depth[p] < 0:
+            raise CycleError(self.ids[c])
+        self.parent[c] = p
+        self._kids.setdefault(p, []).append(c)
+        self._set_depth(c, self.depth[p] + 1)
+        return self._propagate(c, self.size[c], self.vol[c])
+
+    def _detach(self, c: int) -> list:
+        p = self.parent[c]
+        if p < 0:
+            return []
+        touched = self._propagate(c, -self.size[c], -self.vol[c])
+        kids = self._kids.get(p, [])
+        if c in kids:
+            kids.remove(c)
+        self.parent[c] = -1
+        self._set_depth(c, 0)
+        return touched
+
+    def _wait(self, i: int, sponsor: str) -> None:
+        self._waiting.setdefault(sponsor, []).append(i)
+        self._waits_on[i] = sponsor
+
+    def _unwait(self, i: int) -> None:
+        key = self._waits_on.pop(i, None)
+        if key is None:
+            return
+        waiting = self._waiting.get(key, [])
+        if i in waiting:
+            waiting.remove(i)
+        if not waiting:
+            self._waiting.pop(key, None)
+
+    def _propagate(self, c: int, d_size: int, d_vol: float) -> list:
+        # c 의 조상들에 (인원, 실적) 변화량 반영
+        touched = []
+        a = self.parent[c]
+        while a >= 0:
+            self.size[a] += d_size
+            self.vol[a] += d_vol
+            if self.side[c] == LEFT:
+                self.left_n[a] += d_size
+                self.left_v[a] += d_vol
+            elif self.side[c] == RIGHT:
+                self.right_n[a] += d_size
+                self.right_v[a] += d_vol
+            touched.append(self.ids[a])
+            c, a = a, self.parent[a]
+        return touched
+
+    def _set_depth(self, c: int, d: int) -> None:
+        # 서브트리 깊이 재설정 (연결/분리 시에만 호출)
+        stack = [(c, d)]
+        while stack:
+            x, dx = stack.pop()
+            self.depth[x] = dx
+            for k in self._kids.get(x, ()):
+                stack.append((k, dx + 1 if dx >= 0 else -1))
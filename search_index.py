@@ -0,0 +1,182 @@
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+import pandas as pd
+
+# =========================================================
+# 회원 검색 인덱스 (MemberSearchIndex)
+# - 대상 필드: ID / 이름 / 이메일 / 추천인 (기존 str.contains 와 같은 "부분 문자열, 대소문자 무시")
+# - 정규화: casefold + 한글 음절을 자모로 분해 → 입력 중인 글자("기", "김ㅁ")로도 "김민수" 검색,
+#   마지막 받침은 다음 글자 초성으로도 시도 ("김" → "기민")
+# - 이름 초성 검색: "ㄱㅁㅅ" → 김민수
+# - 완전/접두 일치: 필드별 정렬 목록 + bisect → O(log n + 결과 수)
+# - 부분 일치: 필드별로 정규화 값을 구분자(\0)로 이어 붙인 블롭을 str.find(C 구현)로 찾고
+#   limit 건이 차면 중단 (행마다 파이썬 비교/정규식을 돌리지 않음, 정규화도 빌드 시 1회)
+# - 순위: 완전 일치 > 접두 일치 > 부분 일치, 같은 등급은 필드 순서(ID 우선) → 표 순서
+# - 추가/수정: 기존 슬롯은 무효 처리 + 작은 꼬리 목록에 덧붙임 / 삭제: 무효 처리
+#   꼬리가 커지면 블롭 재구성 (정규화된 값을 보관하므로 재정규화 없음)
+# =========================================================
+
+SEARCH_FIELDS = ["ID", "이름", "이메일", "추천인"]
+
+_SEP = "\0"
+_TAIL_LIMIT = 4096
+
+# 호환 자모(키보드 입력) → 조합형 자모
+_COMPAT_CHO = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_COMPAT_MAP = {c: chr(0x1100 + i) for i, c in enumerate(_COMPAT_CHO)}
+_COMPAT_MAP.update({chr(0x314F + i): chr(0x1161 + i) for i in range(21)})  # ㅏ..ㅣ
+_BLOB_TABLE = str.maketrans(_COMPAT_MAP)  # 블롭 정규화용 (구분자 유지)
+_COMPAT_MAP[_SEP] = None
+_COMPAT_TABLE = str.maketrans(_COMPAT_MAP)
+
+# 받침 → 같은 소리의 초성 (입력 중 "김" 이 "기민" 의 앞부분일 수 있음)
+_JONG_TO_CHO = dict(zip("ᆨᆩᆫᆮᆯᆷᆸᆺᆻᆼᆽᆾᆿᇀᇁᇂ", "ᄀᄁᄂᄃᄅᄆᄇᄉᄊᄋᄌᄎᄏᄐᄑᄒ"))
+
+
+def normalize(text) -> str:
+    if text is None or (isinstance(text, float) and text != text):
+        return ""
+    return unicodedata.normalize("NFD", str(text).casefold()).translate(_COMPAT_TABLE)
+
+
+def _initials(normalized: str) -> str:
+    # 분해된 문자열에서 초성(U+1100~U+1112)만 (구분자는 유지)
+    return _NOT_INITIAL.sub("", normalized)
+
+
+_NOT_INITIAL = re.compile("[^\0\u1100-\u1112]+")
+_HAS_COMPAT = re.compile("[\u3131-\u3163]")
+
+
+class MemberSearchIndex:
+    def __init__(self, df: pd.DataFrame):
+        ids = df["ID"].astype(str)
+        first = ~ids.duplicated(keep="first")  # 중복 ID 는 첫 행 기준
+        cols = []
+        for c in SEARCH_FIELDS:
+            raw = df.loc[first, c].fillna("").astype(str).tolist()
+            joined = _SEP.join(raw)
+            if joined.count(_SEP) != max(len(raw) - 1, 0):  # 값 안에 구분자가 있으면 제거 후 다시
+                joined = _SEP.join(x.replace(_SEP, "") for x in raw)
+            # 필드 전체를 한 문자열로 이어 붙인 뒤 한 번에 정규화 (값마다 호출하지 않음)
+            blob = unicodedata.normalize("NFD", joined.casefold())
+            if _HAS_COMPAT.search(blob):
+                blob = blob.translate(_BLOB_TABLE)
+            cols.append(blob.split(_SEP) if raw else [])
+        cols.append(_initials(_SEP.join(cols[1])).split(_SEP) if cols[1] else [])
+        uids = ids[first].tolist()
+        self._values = dict(zip(uids, zip(*cols)))  # ID → 정규화 필드 튜플 (ID, 이름, 이메일, 추천인, 이름초성)
+        self._order = dict(zip(uids, range(len(uids))))  # 같은 등급 내 표 순서
+        self._seq = len(uids)
+        self._build(cols)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _build(self, cols: list | None = None) -> None:
+        self._slot_uid = list(self._values)
+        self._slot_of = {uid: i for i, uid in enumerate(self._slot_uid)}
+        if cols is None:
+            values = list(self._values.values())
+            cols = [[v[f] for v in values] for f in range(len(SEARCH_FIELDS) + 1)]
+        self._blobs, self._starts, self._sorted, self._sorted_slot = [], [], [], []
+        for col in cols:
+            # 부분 일치용: "\0v0\0v1\0..." 블롭 + 각 값 앞 구분자 위치
+            self._blobs.append(_SEP + _SEP.join(col) + _SEP)
+            lens = np.array(list(map(len, col)), dtype=np.int64) + 1
+            self._starts.append(np.concatenate(([0], np.cumsum(lens)[:-1])) if len(col) else lens)
+            # 완전/접두 일치용: 정렬된 값 목록 (bisect 로 범위 검색)
+            order = sorted(range(len(col)), key=col.__getitem__)
+            self._sorted.append([col[i] for i in order])
+            self._sorted_slot.append(np.asarray(order, dtype=np.int64))
+        self._tail = []  # 빌드 이후 추가/수정된 ID (슬롯 번호 = 빌드 시 슬롯 수 + 꼬리 위치)
+        self._base = len(self._slot_uid)
+
+    # ---------- 변경 ----------
+    def add(self, record: dict) -> None:
+        uid = str(record["ID"])
+        self._put(uid, record, self._seq)
+        self._seq += 1
+
+    def update(self, record: dict) -> None:
+        uid = str(record["ID"])
+        self._put(uid, record, self._order.get(uid, self._seq))
+
+    def remove(self, user_id) -> None:
+        uid = str(user_id)
+        self._values.pop(uid, None)
+        self._order.pop(uid, None)
+        self._slot_of.pop(uid, None)
+
+    def _put(self, uid: str, record: dict, order: int) -> None:
+        vals = [normalize(record.get(c, "")) for c in SEARCH_FIELDS]
+        vals.append(_initials(vals[1]))
+        self._values[uid] = tuple(vals)
+        self._order[uid] = order
+        self._slot_of[uid] = self._base + len(self._tail)  # 이전 슬롯은 자동으로 무효
+        self._slot_uid.append(uid)
+        self._tail.append(uid)
+        if len(self._tail) > _TAIL_LIMIT or len(self._slot_uid) > 2 * len(self._values) + _TAIL_LIMIT:
+            self._build()
+
+    # ---------- 검색 ----------
+    def search(self, query: str, limit: int | None = None) -> list:
+        q = normalize(query.strip())
+        if not q:
+            return []
+        variants = [q]
+        if q[-1] in _JONG_TO_CHO:
+            variants.append(q[:-1] + _JONG_TO_CHO[q[-1]])
+        want = len(self._values) if limit is None else limit
+
+        out, seen = [], set()
+        for kind in ("exact", "prefix", "contains"):
+            for f in range(len(SEARCH_FIELDS) + 1):
+                tier = set()
+                for v in variants:
+                    tier.update(self._find(f, v, kind, want - len(out), seen))
+                tier = sorted(tier, key=self._order.__getitem__)
+                seen.update(tier)
+                out += tier
+                if len(out) >= want:
+                    return out[:want]
+        return out
+
+    def _find(self, f: int, v: str, kind: str, want: int, seen: set) -> list:
+        hits = []
+        if kind == "contains":
+            blob, starts = self._blobs[f], self._starts[f]
+            pos = blob.find(v)
+            while pos >= 0 and len(hits) < want:
+                # 검색어에는 구분자가 없으므로 일치 위치 → 슬롯 번호만 구하고 다음 슬롯부터 이어서 찾음
+                slot = int(np.searchsorted(starts, pos, side="right")) - 1
+                self._keep(slot, seen, hits)
+                pos = blob.find(v, starts[slot + 1]) if slot + 1 < len(starts) else -1
+        else:
+            vals = self._sorted[f]
+            lo = bisect_left(vals, v)
+            hi = bisect_right(vals, v) if kind == "exact" else bisect_left(vals, v + "\U0010ffff")
+            for slot in np.sort(self._sorted_slot[f][lo:hi]).tolist():
+                if len(hits) >= want:
+                    break
+                self._keep(slot, seen, hits)
+
+        # 꼬리(빌드 이후 변경분)는 짧으므로 직접 확인
+        for i, uid in enumerate(self._tail):
+            if len(hits) >= want:
+                break
+            if self._slot_of.get(uid) != self._base + i or uid in seen:
+                continue
+            x = self._values[uid][f]
+            if x == v if kind == "exact" else x.startswith(v) if kind == "prefix" else v in x:
+                hits.append(uid)
+        return hits
+
+    def _keep(self, slot: int, seen: set, hits: list) -> None:
+        # 수정/삭제로 무효가 된 슬롯과 이미 상위 등급에 나온 ID 는 제외
+        uid = self._slot_uid[slot]
+        if self._slot_of.get(uid) == slot and uid not in seen:
+            hits.append(uid)
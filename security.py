@@ -0,0 +1,123 @@
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from metrics import METRICS
+
+# =========================================================
+# 비밀번호 해시 (PBKDF2-SHA256)
+# - 해시/검증은 프로세스 공용 워커 풀에서 실행 (hashlib 는 GIL 을 놓으므로 코어 수만큼 병렬)
+# - 대기열 상한 초과/시간 초과 시 HashBusyError → 화면에서 "잠시 후 다시 시도" 처리
+# - 지연시간(대기 포함) p50/p99 집계
+# =========================================================
+
+PBKDF2_ITERATIONS = 200_000
+
+HASH_WORKERS = int(os.environ.get("TRADINGX_HASH_WORKERS", os.cpu_count() or 2))
+HASH_QUEUE_LIMIT = int(os.environ.get("TRADINGX_HASH_QUEUE", HASH_WORKERS * 8))
+HASH_TIMEOUT = float(os.environ.get("TRADINGX_HASH_TIMEOUT", "10"))
+
+
+class HashBusyError(RuntimeError):
+    pass
+
+
+class HashPool:
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT, timeout: float = HASH_TIMEOUT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pbkdf2")
+        self._slots = threading.BoundedSemaphore(queue_limit)  # 실행 중 + 대기 중 작업 수 상한
+        self._lock = threading.Lock()
+        self._latency = deque(maxlen=4096)
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def run(self, fn, *args, timeout: float | None = None):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashBusyError("hash queue full")
+
+        with self._lock:
+            self._in_flight += 1
+        started = time.perf_counter()
+        fut = self._executor.submit(fn, *args)
+        fut.add_done_callback(self._release)
+        try:
+            result = fut.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeout:
+            fut.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise HashBusyError("hash timeout") from None
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._latency.append(elapsed)
+            self.completed += 1
+        METRICS.observe("hash.pbkdf2", elapsed)
+        return result
+
+    def _release(self, _fut) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = sorted(self._latency)
+            out = {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+        out["p50_ms"] = _percentile(samples, 0.50) * 1000
+        out["p99_ms"] = _percentile(samples, 0.99) * 1000
+        return out
+
+
+def _percentile(samples: list, q: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+HASH_POOL = HashPool()
+
+
+def _pbkdf2(password: str, salt_hex: str) -> str:
+    dk = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), bytes.fromhex(salt_hex), PBKDF2_ITERATIONS)
+    return f"pbkdf2${salt_hex}${dk.hex()}"
+
+
+def _verify(password: str, stored: str) -> bool:
+    try:
+        _, salt_hex, _hash_hex = stored.split("$", 2)
+        return hmac.compare_digest(_pbkdf2(password, salt_hex), stored)
+    except Exception:
+        return False
+
+
+def hash_password(password: str, salt_hex: str | None = None) -> str:
+    if salt_hex is None:
+        salt_hex = secrets.token_hex(16)
+    return HASH_POOL.run(_pbkdf2, password, salt_hex)
+
+
+def verify_password(password: str, stored: str) -> bool:
+    if isinstance(stored, str) and stored.startswith("pbkdf2$"):
+        return HASH_POOL.run(_verify, password, stored)
+    return password == stored  # legacy plain-text fallback
@@ -0,0 +1,99 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+# =========================================================
+# 대량 정산 (Batch settlement)
+# - 입력: CSV/Parquet (target_id, type, amount, note)
+# - 검증: 회원 ID / 정산 타입 / 금액을 행 전체에 대해 한 번에(벡터화) 점검 → 오류 행은 사유와 함께 보고
+# - 반영: 대상별 금액 합계(groupby) → 회원 수익($) 열 갱신 + 정산 기록 추가를 한 트랜잭션으로 커밋
+# - plan_batch() 는 아무것도 바꾸지 않음 → 화면에서 미리보기(dry-run) 후 apply_batch()
+# =========================================================
+
+SETTLE_TYPES = ["commission_add", "profit_adjust", "bonus_add", "manual_note"]
+PROFIT_TYPES = ["commission_add", "profit_adjust", "bonus_add"]  # 수익($)에 반영되는 타입
+BATCH_COLS = ["target_id", "type", "amount", "note"]
+
+
+def read_batch(name: str, data: bytes) -> pd.DataFrame:
+    if name.lower().endswith((".parquet", ".pq")):
+        df = pd.read_parquet(io.BytesIO(data))
+    else:
+        df = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    df.columns = [str(c).strip() for c in df.columns]
+    missing = [c for c in ["target_id", "type", "amount"] if c not in df.columns]
+    if missing:
+        raise ValueError(f"필수 컬럼이 없습니다: {', '.join(missing)}")
+    if "note" not in df.columns:
+        df["note"] = ""
+    return df[BATCH_COLS].reset_index(drop=True)
+
+
+def plan_batch(store, batch: pd.DataFrame) -> dict:
+    # 반영 전 계산만 수행 (dry-run)
+    tid = batch["target_id"].fillna("").astype(str).str.strip()
+    typ = batch["type"].fillna("").astype(str).str.strip()
+    amount = pd.to_numeric(batch["amount"], errors="coerce")
+    note = batch["note"].fillna("").astype(str)
+
+    reason = np.select(
+        [
+            tid == "",
+            ~store.has_ids(tid),
+            ~typ.isin(SETTLE_TYPES),
+            ~np.isfinite(amount.to_numpy(dtype=float)),
+        ],
+        ["대상 ID 없음", "존재하지 않는 회원", "알 수 없는 정산 타입", "금액 오류"],
+        "",
+    )
+    rows = pd.DataFrame({"line": np.arange(len(batch)) + 2, "target_id": tid, "type": typ, "amount": amount, "note": note})
+    ok = reason == ""
+    valid = rows[ok]
+    errors = rows[~ok].assign(사유=reason[~ok])
+
+    applied = valid[valid["type"].isin(PROFIT_TYPES)]
+    deltas = applied.groupby("target_id", sort=False)["amount"].sum()
+    current = store.rows(deltas.index).set_index("ID")["수익($)"].reindex(deltas.index)
+    totals = pd.DataFrame(
+        {
+            "ID": deltas.index,
+            "건수": applied.groupby("target_id", sort=False).size().reindex(deltas.index).to_numpy(),
+            "현재 수익($)": current.to_numpy(),
+            "증감($)": deltas.to_numpy(),
+            "반영 후($)": (current + deltas).to_numpy(),
+        }
+    )
+    return {"valid": valid, "errors": errors, "deltas": deltas, "totals": totals}
+
+
+def apply_batch(store, journal, plan: dict, admin_id: str, ts: str, source: str = "") -> dict:
+    valid, deltas = plan["valid"], plan["deltas"]
+    records = pd.DataFrame(
+        {
+            "ts": ts,
+            "admin_id": admin_id,
+            "target_id": valid["target_id"],
+            "type": valid["type"],
+            "amount": valid["amount"].astype(float),
+            "note": valid["note"],
+        }
+    ).to_dict("records")
+    total = float(deltas.sum())
+    records.append(
+        {
+            "ts": ts,
+            "admin_id": admin_id,
+            "target_id": "-",
+            "type": "batch_settlement",
+            "amount": total,
+            "note": f"대량 정산{' ' + source if source else ''}: {len(valid)}건, 대상 {len(deltas)}명",
+        }
+    )
+
+    if deltas.empty:
+        journal.append_many(records, durable=True)
+    else:
+        # 잔액과 기록을 함께 커밋 (실패 시 store 메모리 변경도 되돌림)
+        store.add_profits(deltas, commit=lambda df, changed, edits: journal.append_with_members(records, df, changed, durable=True, edits=edits))
+    return {"rows": len(valid), "members": len(deltas), "total": total}
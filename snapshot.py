@@ -0,0 +1,51 @@
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow 가 없으면 스냅샷 없이 기존 방식(CSV/SQL)으로만 로드
+    pa = None
+
+# =========================================================
+# 컬럼형 스냅샷 (Arrow IPC)
+# - 저장소 파일 옆에 타입이 정해진 이진 스냅샷을 둠 → 시작 시 CSV 파싱/숫자 변환/SQL 조회 생략
+# - 메모리 맵으로 열어 요청한 컬럼만 읽음 (숫자 컬럼은 복사 없이 매핑된 버퍼를 그대로 사용)
+# - 스냅샷을 만들 때의 원본 상태(meta)를 함께 기록 → 저장소가 원본과 맞는지 확인한 뒤에만 사용
+# - 쓰기는 임시 파일 → 교체 (중간에 중단돼도 이전 스냅샷 유지), 실패해도 로드는 계속
+# =========================================================
+
+_META_KEY = b"tradingx"
+
+
+def read_snapshot(path: str, columns: list | None = None) -> tuple | None:
+    # → (DataFrame, meta) / 없거나 읽을 수 없으면 None
+    if pa is None or not os.path.exists(path):
+        return None
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        meta = json.loads(reader.schema.metadata[_META_KEY])
+        table = reader.read_all()
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.column_names])
+        return table.to_pandas(), meta
+    except (OSError, KeyError, TypeError, ValueError, pa.ArrowException):
+        return None
+
+
+def write_snapshot(path: str, df: pd.DataFrame, meta: dict) -> bool:
+    if pa is None:
+        return False
+    tmp = path + ".tmp"
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({_META_KEY: json.dumps(meta)})
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+        return True
+    except (OSError, TypeError, ValueError, pa.ArrowException):
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
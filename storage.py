@@ -0,0 +1,618 @@
+import csv
+import os
+import secrets
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from snapshot import read_snapshot, write_snapshot
+
+# =========================================================
+# 저장소 계층 (Storage)
+# - CsvStorage    : 기존 방식 (변경 시 파일 전체 재작성)
+# - SqliteStorage : 내장 SQLite(WAL) · 행 단위 upsert/delete · 트랜잭션
+# - 백엔드 선택: 환경변수 TRADINGX_STORAGE = "sqlite"(기본) | "csv"
+# - CSV → SQLite 1회성 마이그레이션 (python storage.py migrate)
+# - 기록 집계(rollup) 스냅샷: 기록과 함께 보관, 없거나 맞지 않으면 기록에서 재구성
+# - 시작 속도: 회원/기록의 컬럼형(Arrow) 스냅샷을 저장소 파일 옆에 두고, 원본과 맞으면 스냅샷으로 로드
+#   기록은 append-only → 스냅샷 + 그 이후 추가분만 읽음 / load_*(columns=...) 로 필요한 컬럼만
+# - changed_externally(): 다른 프로세스/도구가 저장소를 바꿨는지 (자기 쓰기는 제외) → 앱이 다시 로드
+# - 여러 프로세스(Streamlit 앱 + API)가 같은 저장소를 씀 → 회원 변경은 edits 로 받은 "바뀐 컬럼"만 기록
+#   편집 컬럼은 읽었던 값과 같을 때만 바꾸고(compare-and-set, 다르면 충돌로 건너뜀), 수익($)은 증감으로 더함
+# - CSV 전체 재작성은 임시 파일 → os.replace (중간에 중단돼도 이전 파일 유지), SQLite 는 트랜잭션
+# =========================================================
+
+DB_FILE = "tradingx_db.csv"
+LEDGER_FILE = "tradingx_ledger.csv"
+SQLITE_FILE = "tradingx.sqlite3"
+ROLLUP_FILE = "tradingx_ledger_rollup.csv"
+
+COLUMNS = ["ID", "PW", "이름", "이메일", "연락처", "추천인", "위치", "직추천", "소실적", "수익($)", "Role"]
+LEDGER_COLS = ["ts", "admin_id", "target_id", "type", "amount", "note"]
+DERIVED_COLS = ["직추천", "소실적"]  # 추천 트리에서 다시 계산되는 컬럼 (충돌 검사 없이 기록)
+_FILLED = {"Role": "user", "추천인": "-", "위치": "-"}  # 빈 값이면 기본값으로 읽는 컬럼
+ROLLUP_COLS = ["dim", "key", "type", "amount", "count"]
+
+_SNAPSHOT_EVERY = 10_000  # 스냅샷 이후 추가분이 이만큼(또는 전체의 1/10) 넘으면 로드 시 스냅샷 갱신
+
+
+def coerce_members(df: pd.DataFrame) -> pd.DataFrame:
+    for c in COLUMNS:
+        if c not in df.columns:
+            df[c] = ""
+    df = df[COLUMNS].copy()
+
+    df["직추천"] = pd.to_numeric(df["직추천"], errors="coerce").fillna(0).astype(int)
+    df["소실적"] = pd.to_numeric(df["소실적"], errors="coerce").fillna(0).astype(int)
+    df["수익($)"] = pd.to_numeric(df["수익($)"], errors="coerce").fillna(0.0).astype(float)
+    for c, default in _FILLED.items():
+        df[c] = df[c].fillna(default)
+    return df
+
+
+class WriteConflict(Exception):
+    # 다른 프로세스가 먼저 바꾸거나 삭제한 회원 (이 프로세스의 변경은 반영하지 않음)
+    def __init__(self, ids: list):
+        super().__init__(f"다른 프로세스가 먼저 변경한 회원: {', '.join(map(str, ids[:20]))}")
+        self.ids = ids
+
+
+def merge_member_edits(current: pd.DataFrame, changed: pd.DataFrame, deleted, edits: dict) -> tuple:
+    # 저장소의 최신 회원 표(current)에 이 프로세스의 변경분만 다시 적용 → (병합된 표, 충돌 ID 목록)
+    # edits: {"new": 새 회원 ID 집합, "fields": {ID: {컬럼: 읽었던 값}}, "profit": {ID: 수익 증감}}
+    out = _select(current, COLUMNS).reset_index(drop=True)
+    pos = {}
+    for i, uid in enumerate(out["ID"].astype(str)):
+        pos.setdefault(uid, i)  # 중복 ID 는 첫 행 기준
+    col = {c: out.columns.get_loc(c) for c in COLUMNS}
+    conflicts, appended = [], []
+    for rec in _select(changed, COLUMNS).to_dict("records"):
+        uid = str(rec["ID"])
+        i = pos.get(uid)
+        if uid in edits["new"]:
+            if i is None:
+                appended.append(rec)
+            else:
+                conflicts.append(uid)
+            continue
+        fields = edits["fields"].get(uid, {})
+        if i is None or any(c not in DERIVED_COLS and not same_value(out.iat[i, col[c]], base) for c, base in fields.items()):
+            conflicts.append(uid)
+            continue
+        for c in fields:
+            out.iat[i, col[c]] = rec[c]
+        if edits["profit"].get(uid):
+            out.iat[i, col["수익($)"]] = float(out.iat[i, col["수익($)"]]) + edits["profit"][uid]
+    gone = [pos[u] for u in map(str, deleted or ()) if u in pos]
+    if gone:
+        out = out.drop(index=gone)
+    if appended:
+        out = pd.concat([out, pd.DataFrame(appended, columns=COLUMNS)], ignore_index=True)
+    return out, conflicts
+
+
+def same_value(a, b) -> bool:
+    # 충돌 검사용 값 비교 (빈 값끼리는 같음, 숫자/문자 표현 차이는 문자열로 비교)
+    # MemberStore 의 화면 충돌 검사와 저장소의 compare-and-set 이 같은 기준을 쓰도록 여기 하나만 둠
+    if pd.isna(a) or pd.isna(b):
+        return pd.isna(a) and pd.isna(b)
+    return bool(a == b) or str(a) == str(b)
+
+
+def coerce_ledger(lg: pd.DataFrame) -> pd.DataFrame:
+    for c in LEDGER_COLS:
+        if c not in lg.columns:
+            lg[c] = ""
+    lg = lg[LEDGER_COLS].copy()
+    lg["amount"] = pd.to_numeric(lg["amount"], errors="coerce").fillna(0.0).astype(float)
+    return lg
+
+
+def coerce_rollup(frame: pd.DataFrame) -> pd.DataFrame:
+    frame = _select(frame, ROLLUP_COLS)
+    for c in ["dim", "key", "type"]:
+        frame[c] = frame[c].fillna("").astype(str)
+    frame["amount"] = pd.to_numeric(frame["amount"], errors="coerce").fillna(0.0).astype(float)
+    frame["count"] = pd.to_numeric(frame["count"], errors="coerce").fillna(0).astype("int64")
+    return frame
+
+
+def _project(df: pd.DataFrame | None, columns: list | None) -> pd.DataFrame | None:
+    return df if df is None or columns is None else df[columns]
+
+
+def _stale(tail_rows: int, rows: int) -> bool:
+    return tail_rows >= max(_SNAPSHOT_EVERY, rows // 10)
+
+
+def _write_csv(path: str, frame: pd.DataFrame, durable: bool = False) -> None:
+    # 임시 파일에 쓴 뒤 교체 (원자적) → 쓰는 도중 중단돼도 이전 파일 유지 / durable: 교체 전 fsync
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        frame.to_csv(f, index=False)
+        if durable:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _select(df: pd.DataFrame, cols: list) -> pd.DataFrame:
+    df = df.copy()
+    for c in cols:
+        if c not in df.columns:
+            df[c] = ""
+    return df[cols]
+
+
+# =========================
+# CSV 백엔드
+# =========================
+class CsvStorage:
+    kind = "csv"
+
+    def __init__(self, db_file: str = DB_FILE, ledger_file: str = LEDGER_FILE, rollup_file: str = ROLLUP_FILE):
+        self.db_file = db_file
+        self.ledger_file = ledger_file
+        self.rollup_file = rollup_file
+        self.db_snapshot = os.path.splitext(db_file)[0] + ".arrow"
+        self.ledger_snapshot = os.path.splitext(ledger_file)[0] + ".arrow"
+        # 백그라운드 writer 와 화면 스레드가 같은 객체를 씀 → 쓰기와 변경 확인을 lock 으로 직렬화
+        self._lock = threading.RLock()
+        self._seen = self._stat()
+        self._foreign = False  # 자기 쓰기 직전에 발견한 외부 변경 (다음 changed_externally() 에서 보고)
+
+    # 자기 쓰기 직후의 파일 크기/수정 시각을 기억 → 그 외의 변화는 외부 변경
+    def _stat(self) -> tuple:
+        out = []
+        for path in (self.db_file, self.ledger_file):
+            st = os.stat(path) if os.path.exists(path) else None
+            out.append(None if st is None else (st.st_size, st.st_mtime_ns))
+        return tuple(out)
+
+    def changed_externally(self) -> bool:
+        with self._lock:
+            now = self._stat()
+            changed = self._foreign or now != self._seen
+            self._seen, self._foreign = now, False
+        return changed
+
+    @contextmanager
+    def _writing(self):
+        # 자기 쓰기 구간: 쓰기 전에 이미 바뀌어 있으면 외부 변경으로 남겨 두고, 쓴 직후 상태를 기억
+        with self._lock:
+            self._foreign = self._foreign or self._stat() != self._seen
+            try:
+                yield
+            finally:
+                self._seen = self._stat()
+
+    # 회원 파일은 저장 때마다 전체 재작성 → 스냅샷은 파일 크기/수정 시각이 같을 때만 사용
+    def load_members(self, columns: list | None = None) -> pd.DataFrame | None:
+        if not os.path.exists(self.db_file):
+            return None
+        stat = os.stat(self.db_file)
+        source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        snap = read_snapshot(self.db_snapshot, columns)
+        if snap is not None and snap[1].get("source") == source:
+            return _project(coerce_members(snap[0]), columns)
+        df = coerce_members(pd.read_csv(self.db_file, dtype=str))
+        write_snapshot(self.db_snapshot, df, {"source": source})
+        return _project(df, columns)
+
+    # CSV 는 행 단위 갱신이 불가 → 전체 재작성 (임시 파일 → 교체)
+    # 마지막 자기 쓰기 이후 다른 프로세스가 회원 파일을 바꿨으면 그 파일에 edits 만 다시 적용 (덮어쓰지 않음)
+    def save_members(self, df: pd.DataFrame, changed: pd.DataFrame | None = None, deleted=None, durable: bool = False, edits: dict | None = None) -> list:
+        return self._save_members(df, changed, deleted, durable, edits, strict=False)
+
+    def _save_members(self, df, changed, deleted, durable: bool, edits: dict | None, strict: bool) -> list:
+        # strict: 충돌이 하나라도 있으면 아무것도 쓰지 않고 WriteConflict (대량 정산)
+        with self._writing():
+            conflicts = []
+            if edits is not None and changed is not None and self._stat()[0] != self._seen[0]:
+                df, conflicts = merge_member_edits(coerce_members(pd.read_csv(self.db_file, dtype=str)), changed, deleted, edits)
+                if conflicts and strict:
+                    raise WriteConflict(conflicts)
+            _write_csv(self.db_file, _select(df, COLUMNS), durable=durable)
+        return conflicts
+
+    # 기록 파일은 끝에 덧붙이기만 함 → 스냅샷(파일 앞부분) + 스냅샷 이후 바이트만 파싱
+    # 스냅샷 경계 직전 바이트가 달라졌으면(파일 재작성) 전체를 다시 읽음
+    def load_ledger(self, columns: list | None = None) -> pd.DataFrame | None:
+        if not os.path.exists(self.ledger_file):
+            return None
+        size = os.path.getsize(self.ledger_file)
+        snap = read_snapshot(self.ledger_snapshot, columns)
+        meta = {} if snap is None else snap[1]
+        offset = meta.get("offset", 0)
+        if snap is None or offset > size or meta.get("mark") != self._mark(offset):
+            lg = coerce_ledger(pd.read_csv(self.ledger_file, dtype=str))
+            write_snapshot(self.ledger_snapshot, lg, {"offset": size, "rows": len(lg), "mark": self._mark(size)})
+            return _project(lg, columns)
+
+        head = snap[0]
+        if offset == size:
+            return _project(coerce_ledger(head), columns)
+        with open(self.ledger_file, "rb") as f:
+            f.seek(offset)
+            tail = coerce_ledger(pd.read_csv(f, dtype=str, header=None, names=LEDGER_COLS))
+        lg = pd.concat([coerce_ledger(head), tail], ignore_index=True)
+        if columns is None and _stale(len(tail), len(lg)):
+            write_snapshot(self.ledger_snapshot, lg, {"offset": size, "rows": len(lg), "mark": self._mark(size)})
+        return _project(lg, columns)
+
+    def _mark(self, offset: int) -> str:
+        # 스냅샷 경계 직전 64바이트 (경계 앞부분이 그대로인지 확인용)
+        with open(self.ledger_file, "rb") as f:
+            f.seek(max(0, offset - 64))
+            return f.read(min(offset, 64)).hex()
+
+    def save_ledger(self, lg: pd.DataFrame) -> None:
+        with self._writing():
+            _write_csv(self.ledger_file, _select(lg, LEDGER_COLS))
+            if os.path.exists(self.rollup_file):
+                os.remove(self.rollup_file)  # 기록 전체가 바뀌었으므로 집계 스냅샷 폐기
+
+    # 기록 추가는 파일 끝에 줄 단위로 덧붙임 (기존 내용 재작성 없음)
+    def append_ledger(self, records: list, durable: bool = False) -> None:
+        with self._writing():
+            new_file = not os.path.exists(self.ledger_file) or os.path.getsize(self.ledger_file) == 0
+            with open(self.ledger_file, "a", newline="", encoding="utf-8") as f:
+                w = csv.writer(f)
+                if new_file:
+                    w.writerow(LEDGER_COLS)
+                w.writerows([[rec.get(c, "") for c in LEDGER_COLS] for rec in records])
+                if durable:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    # CSV 는 두 파일을 한 트랜잭션으로 묶을 수 없음 → 회원 파일 먼저, 성공 시 기록 추가
+    def save_batch(self, df: pd.DataFrame, changed: pd.DataFrame, records: list, durable: bool = False, edits: dict | None = None) -> None:
+        with self._lock:
+            self._save_members(df, changed, None, durable, edits, strict=True)
+            self.append_ledger(records, durable=durable)
+
+    def load_rollup(self) -> pd.DataFrame | None:
+        if not os.path.exists(self.rollup_file):
+            return None
+        return coerce_rollup(pd.read_csv(self.rollup_file, dtype=str, keep_default_na=False))
+
+    # 집계 스냅샷은 임시 파일에 쓴 뒤 교체 (쓰는 도중 중단돼도 이전 스냅샷 유지)
+    def save_rollup(self, frame: pd.DataFrame) -> None:
+        with self._lock:
+            _write_csv(self.rollup_file, _select(frame, ROLLUP_COLS))
+
+
+# =========================
+# SQLite(WAL) 백엔드
+# =========================
+_MEMBER_TYPES = {"직추천": "INTEGER NOT NULL DEFAULT 0", "소실적": "INTEGER NOT NULL DEFAULT 0", "수익($)": "REAL NOT NULL DEFAULT 0"}
+
+
+def _q(col: str) -> str:
+    return '"' + col.replace('"', '""') + '"'
+
+
+class SqliteStorage:
+    kind = "sqlite"
+
+    def __init__(self, path: str = SQLITE_FILE):
+        self.path = path
+        self.members_snapshot = path + ".members.arrow"
+        self.ledger_snapshot = path + ".ledger.arrow"
+        # Streamlit 세션 스레드들이 하나의 커넥션을 공유 → 트랜잭션은 lock 으로 직렬화
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._init_schema()
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _init_schema(self) -> None:
+        member_cols = ", ".join(
+            f"{_q(c)} TEXT PRIMARY KEY" if c == "ID" else f"{_q(c)} {_MEMBER_TYPES.get(c, 'TEXT')}" for c in COLUMNS
+        )
+        with self.transaction() as cur:
+            cur.execute(f"CREATE TABLE IF NOT EXISTS members ({member_cols})")
+            cur.execute(f"CREATE INDEX IF NOT EXISTS idx_members_rec ON members({_q('추천인')})")
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS ledger ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, ts TEXT, admin_id TEXT, target_id TEXT, "
+                "type TEXT, amount REAL NOT NULL DEFAULT 0, note TEXT)"
+            )
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_ledger_target ON ledger(target_id)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_ledger_ts ON ledger(ts)")
+            cur.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            # 스냅샷이 이 DB 에서 만들어졌는지 확인하기 위한 식별자
+            cur.execute("INSERT OR IGNORE INTO meta(key, value) VALUES ('db_id', ?)", (secrets.token_hex(8),))
+            cur.execute(
+                "CREATE TABLE IF NOT EXISTS ledger_rollup ("
+                "dim TEXT NOT NULL, key TEXT NOT NULL, type TEXT NOT NULL, "
+                "amount REAL NOT NULL DEFAULT 0, cnt INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (dim, key, type))"
+            )
+
+    def transaction(self):
+        return _Transaction(self._conn, self._lock)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # data_version 은 "다른 커넥션"이 커밋했을 때만 바뀜 → 이 프로세스의 쓰기는 외부 변경으로 보지 않음
+    def changed_externally(self) -> bool:
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            changed, self._data_version = version != self._data_version, version
+        return changed
+
+    def get_meta(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def has_members(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM members LIMIT 1").fetchone() is not None
+
+    # ---------- members ----------
+    # 회원 테이블을 바꾸는 트랜잭션마다 members_gen 증가 → 스냅샷은 (db_id, members_gen) 이 같을 때만 사용
+    def load_members(self, columns: list | None = None) -> pd.DataFrame | None:
+        if not self.has_members() and self.get_meta("initialized") is None:
+            return None
+        with self._lock:
+            source = {"db_id": self.get_meta("db_id"), "gen": self.get_meta("members_gen")}
+            snap = read_snapshot(self.members_snapshot, columns)
+            if snap is not None and snap[1].get("source") == source:
+                return _project(coerce_members(snap[0]), columns)
+            cols = ", ".join(_q(c) for c in COLUMNS)
+            df = coerce_members(pd.read_sql_query(f"SELECT {cols} FROM members ORDER BY rowid", self._conn))
+        write_snapshot(self.members_snapshot, df, {"source": source})
+        return _project(df, columns)
+
+    def _bump_members(self, cur) -> None:
+        cur.execute(
+            "INSERT INTO meta(key, value) VALUES ('members_gen', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    # changed/deleted 없이 부르면 테이블 전체 교체 (초기 데이터 생성 / migrate_storage)
+    # changed/deleted 만 주면 행 전체 upsert (마이그레이션 등 단일 프로세스 도구)
+    # edits 를 주면 바뀐 컬럼만 UPDATE / 새 회원만 INSERT → 다른 프로세스가 먼저 바꾼 회원 ID 목록을 돌려줌
+    def save_members(self, df: pd.DataFrame, changed: pd.DataFrame | None = None, deleted=None, durable: bool = False, edits: dict | None = None) -> list:
+        conflicts = []
+        with self._lock:
+            if durable:
+                self._conn.execute("PRAGMA synchronous=FULL")
+            try:
+                with self.transaction() as cur:
+                    if changed is None and deleted is None:
+                        cur.execute("DELETE FROM members")
+                        self._upsert(cur, df)
+                    else:
+                        if deleted:
+                            cur.executemany(f"DELETE FROM members WHERE {_q('ID')} = ?", [(str(x),) for x in deleted])
+                        if changed is not None and len(changed):
+                            if edits is None:
+                                self._upsert(cur, changed)
+                            else:
+                                conflicts = self._apply_edits(cur, changed, edits)
+                    cur.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('initialized', '1')")
+                    self._bump_members(cur)
+            finally:
+                if durable:
+                    self._conn.execute("PRAGMA synchronous=NORMAL")
+        return conflicts
+
+    def _upsert(self, cur, rows: pd.DataFrame) -> None:
+        rows = _select(rows, COLUMNS)
+        cols = ", ".join(_q(c) for c in COLUMNS)
+        marks = ", ".join("?" for _ in COLUMNS)
+        updates = ", ".join(f"{_q(c)} = excluded.{_q(c)}" for c in COLUMNS if c != "ID")
+        cur.executemany(
+            f"INSERT INTO members ({cols}) VALUES ({marks}) ON CONFLICT({_q('ID')}) DO UPDATE SET {updates}",
+            _records(rows),
+        )
+
+    def _apply_edits(self, cur, rows: pd.DataFrame, edits: dict) -> list:
+        # 새 회원: INSERT (같은 ID 가 이미 있으면 충돌) / 기존 회원: 바뀐 컬럼만 SET, 수익($)은 "+ 증감"
+        # 편집 컬럼은 WHERE 에서 읽었던 값과 비교 (compare-and-set) → 0행이면 충돌 (다른 프로세스가 먼저 변경/삭제)
+        cols = ", ".join(_q(c) for c in COLUMNS)
+        insert = f"INSERT INTO members ({cols}) VALUES ({', '.join('?' for _ in COLUMNS)}) ON CONFLICT({_q('ID')}) DO NOTHING"
+        idx = {c: i for i, c in enumerate(COLUMNS)}
+        conflicts, derived = [], {}
+        for rec in _records(_select(rows, COLUMNS)):
+            uid = rec[0]
+            if uid in edits["new"]:
+                cur.execute(insert, rec)
+                if cur.rowcount == 0:
+                    conflicts.append(uid)
+                continue
+            fields = edits["fields"].get(uid, {})
+            delta = edits["profit"].get(uid, 0.0)
+            checks = [c for c in fields if c not in DERIVED_COLS]
+            if not checks and not delta:
+                if fields:  # 파생 컬럼만 바뀐 회원은 컬럼 조합별로 묶어서
+                    derived.setdefault(tuple(fields), []).append(tuple(rec[idx[c]] for c in fields) + (uid,))
+                continue
+            sets = [f"{_q(c)} = ?" for c in fields] + ([f"{_q('수익($)')} = {_q('수익($)')} + ?"] if delta else [])
+            where = [f"{_q('ID')} = ?"] + [f"IFNULL({_q(c)}, ?) IS ?" if c in _FILLED else f"{_q(c)} IS ?" for c in checks]
+            params = [rec[idx[c]] for c in fields] + ([float(delta)] if delta else []) + [uid]
+            for c in checks:
+                params += [_FILLED[c], _plain(fields[c])] if c in _FILLED else [_plain(fields[c])]
+            cur.execute(f"UPDATE members SET {', '.join(sets)} WHERE {' AND '.join(where)}", params)
+            if cur.rowcount == 0:
+                conflicts.append(uid)
+        for names, params in derived.items():
+            cur.executemany(f"UPDATE members SET {', '.join(f'{_q(c)} = ?' for c in names)} WHERE {_q('ID')} = ?", params)
+        return conflicts
+
+    # ---------- ledger ----------
+    # 기록은 append-only → 스냅샷(id <= max_id) + 그 이후 행만 조회
+    # 스냅샷 범위의 건수/금액 합계가 테이블과 다르면(기록 재작성 등) 전체 조회
+    def load_ledger(self, columns: list | None = None) -> pd.DataFrame | None:
+        if self.get_meta("initialized") is None:
+            return None
+        with self._lock:
+            db_id = self.get_meta("db_id")
+            snap = read_snapshot(self.ledger_snapshot, columns)
+            meta = {} if snap is None else snap[1]
+            max_id = meta.get("max_id", 0) if meta.get("db_id") == db_id else 0
+            if max_id:
+                rows, total = self._conn.execute("SELECT COUNT(*), TOTAL(amount) FROM ledger WHERE id <= ?", (max_id,)).fetchone()
+                if rows != meta.get("rows") or not np.isclose(total, meta.get("amount", 0.0), rtol=1e-9, atol=1e-6):
+                    max_id = 0
+            tail = pd.read_sql_query(
+                "SELECT id, ts, admin_id, target_id, type, amount, note FROM ledger WHERE id > ? ORDER BY id", self._conn, params=(max_id,)
+            )
+        last_id = int(tail["id"].max()) if len(tail) else max_id
+        tail = coerce_ledger(tail)
+        if not max_id:
+            lg = tail
+        elif len(tail):
+            lg = pd.concat([coerce_ledger(snap[0]), tail], ignore_index=True)
+        else:
+            lg = coerce_ledger(snap[0])
+        if columns is None and (not max_id or _stale(len(tail), len(lg))):
+            meta = {"db_id": db_id, "max_id": last_id, "rows": len(lg), "amount": float(lg["amount"].sum())}
+            write_snapshot(self.ledger_snapshot, lg, meta)
+        return _project(lg, columns)
+
+    def save_ledger(self, lg: pd.DataFrame) -> None:
+        with self.transaction() as cur:
+            cur.execute("DELETE FROM ledger")
+            cur.execute("DELETE FROM ledger_rollup")
+            if len(lg):
+                self._insert_ledger(cur, _records(_select(lg, LEDGER_COLS)))
+
+    def append_ledger(self, records: list, durable: bool = False) -> None:
+        # durable: 해당 커밋만 synchronous=FULL (WAL 기본은 NORMAL)
+        with self._lock:
+            if durable:
+                self._conn.execute("PRAGMA synchronous=FULL")
+            try:
+                with self.transaction() as cur:
+                    self._insert_ledger(cur, [tuple(rec.get(c, "") for c in LEDGER_COLS) for rec in records])
+            finally:
+                if durable:
+                    self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    # 회원 잔액 변경 + 정산 기록을 하나의 트랜잭션으로 커밋 (대량 정산)
+    # edits 가 있으면 잔액은 증감으로만 반영, 대상 회원이 다른 프로세스에서 삭제됐으면 전체 롤백 (WriteConflict)
+    def save_batch(self, df: pd.DataFrame, changed: pd.DataFrame, records: list, durable: bool = False, edits: dict | None = None) -> None:
+        with self._lock:
+            if durable:
+                self._conn.execute("PRAGMA synchronous=FULL")
+            try:
+                with self.transaction() as cur:
+                    if len(changed):
+                        if edits is None:
+                            self._upsert(cur, changed)
+                        else:
+                            conflicts = self._apply_edits(cur, changed, edits)
+                            if conflicts:
+                                raise WriteConflict(conflicts)
+                        self._bump_members(cur)
+                    self._insert_ledger(cur, [tuple(rec.get(c, "") for c in LEDGER_COLS) for rec in records])
+            finally:
+                if durable:
+                    self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def _insert_ledger(self, cur, rows: list) -> None:
+        cur.executemany("INSERT INTO ledger (ts, admin_id, target_id, type, amount, note) VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    # ---------- ledger rollup ----------
+    def load_rollup(self) -> pd.DataFrame | None:
+        with self._lock:
+            frame = pd.read_sql_query("SELECT dim, key, type, amount, cnt AS count FROM ledger_rollup", self._conn)
+        return None if frame.empty else coerce_rollup(frame)
+
+    def save_rollup(self, frame: pd.DataFrame) -> None:
+        rows = _select(frame, ROLLUP_COLS)
+        with self.transaction() as cur:
+            cur.execute("DELETE FROM ledger_rollup")
+            cur.executemany(
+                "INSERT INTO ledger_rollup (dim, key, type, amount, cnt) VALUES (?, ?, ?, ?, ?)",
+                zip(rows["dim"].tolist(), rows["key"].tolist(), rows["type"].tolist(), rows["amount"].tolist(), rows["count"].tolist()),
+            )
+
+
+class _Transaction:
+    def __init__(self, conn: sqlite3.Connection, lock):
+        self._conn = conn
+        self._lock = lock
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._cur = self._conn.cursor()
+        self._cur.execute("BEGIN IMMEDIATE")
+        return self._cur
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._cur.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._lock.release()
+        return False
+
+
+def _records(df: pd.DataFrame) -> list:
+    # numpy 스칼라/NaN → sqlite 가 받는 파이썬 기본형
+    return [tuple(_plain(v) for v in row) for row in df.astype(object).itertuples(index=False, name=None)]
+
+
+def _plain(v):
+    if v is None or (isinstance(v, float) and v != v) or v is pd.NA:
+        return None
+    return v.item() if hasattr(v, "item") else v
+
+
+# =========================
+# 백엔드 선택 / 마이그레이션
+# =========================
+def migrate_csv_to_sqlite(db_file: str = DB_FILE, ledger_file: str = LEDGER_FILE, sqlite_file: str = SQLITE_FILE) -> dict:
+    target = SqliteStorage(sqlite_file)
+    if target.get_meta("initialized") is not None:
+        return {"migrated": False, "reason": "already initialized"}
+
+    src = CsvStorage(db_file, ledger_file)
+    df = src.load_members()
+    lg = src.load_ledger()
+    dup = 0
+    if df is not None:
+        # SQLite 는 ID 가 PK → 중복 ID 는 첫 행만 유지
+        dup = int(df["ID"].duplicated().sum())
+        df = df.drop_duplicates("ID", keep="first")
+        target.save_members(df)
+    if lg is not None:
+        target.save_ledger(lg)
+    with target.transaction() as cur:
+        cur.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('migrated_from_csv', '1')")
+    target.close()
+    return {
+        "migrated": df is not None or lg is not None,
+        "members": 0 if df is None else len(df),
+        "ledger": 0 if lg is None else len(lg),
+        "dropped_duplicate_ids": dup,
+    }
+
+
+def open_storage(kind: str | None = None):
+    kind = (kind or os.environ.get("TRADINGX_STORAGE", "sqlite")).lower()
+    if kind == "csv":
+        return CsvStorage()
+    if kind != "sqlite":
+        raise ValueError(f"알 수 없는 저장소 백엔드: {kind}")
+    if not os.path.exists(SQLITE_FILE) and (os.path.exists(DB_FILE) or os.path.exists(LEDGER_FILE)):
+        migrate_csv_to_sqlite()
+    return SqliteStorage()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["migrate"]:
+        print(migrate_csv_to_sqlite())
+    else:
+        print("usage: python storage.py migrate")
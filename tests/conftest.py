@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# 저장소 루트의 모듈(storage.py, member_store.py ...)을 패키지 설치 없이 import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import COLUMNS  # noqa: E402
+
+
+def member(uid: str, sponsor: str = "-", side: str = "-", profit: float = 0.0, role: str = "user", **extra) -> dict:
+    row = {
+        "ID": uid,
+        "PW": "x",
+        "이름": f"name-{uid}",
+        "이메일": f"{uid}@test.com",
+        "연락처": "010",
+        "추천인": sponsor,
+        "위치": side,
+        "직추천": 0,
+        "소실적": 0,
+        "수익($)": float(profit),
+        "Role": role,
+    }
+    row.update(extra)
+    return row
+
+
+def members_frame(rows: list) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+
+@pytest.fixture
+def in_tmp(tmp_path, monkeypatch):
+    # 저장소 기본 파일 이름(집계 스냅샷 등)이 작업 디렉터리 기준 → 테스트마다 임시 디렉터리
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
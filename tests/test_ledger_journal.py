@@ -0,0 +1,128 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import ledger_store
+from conftest import member, members_frame
+from ledger_store import LedgerJournal
+from storage import LEDGER_COLS, CsvStorage, SqliteStorage
+
+_T0 = datetime(2026, 1, 1)
+
+
+def _record(i: int, minute: int, rnd: random.Random) -> dict:
+    return {
+        "ts": (_T0 + timedelta(minutes=minute)).strftime("%Y-%m-%d %H:%M:%S"),
+        "admin_id": rnd.choice(["admin", "ops"]),
+        "target_id": rnd.choice(["u1", "u2", "u3", "-"]),
+        "type": rnd.choice(["commission_add", "profit_adjust", "update_user", "bonus_add"]),
+        "amount": float(rnd.randint(-50, 100)),
+        "note": f"r{i}",
+    }
+
+
+def _journal(in_tmp, records: list) -> LedgerJournal:
+    storage = CsvStorage(str(in_tmp / "db.csv"), str(in_tmp / "ledger.csv"), str(in_tmp / "rollup.csv"))
+    return LedgerJournal(storage, pd.DataFrame(records, columns=LEDGER_COLS))
+
+
+def _newest(records: list, n: int, **where) -> list:
+    df = pd.DataFrame(records, columns=LEDGER_COLS)
+    for col, value in where.items():
+        df = df[df[col] == value]
+    return df.sort_values("ts", ascending=False, kind="stable")["note"].head(n).tolist()
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_late_appends_keep_time_order(in_tmp, seed):
+    # 분 단위 시각을 섞어서 추가 (같은 시각 없음) → latest() == ts 역순 정렬
+    rnd = random.Random(seed)
+    minutes = rnd.sample(range(100_000), 600)
+    records = [_record(i, m, rnd) for i, m in enumerate(minutes)]
+    journal = _journal(in_tmp, records[:200])
+    for i in range(200, 600, 7):
+        journal.append_many(records[i : i + 7])
+        done = records[: i + 7]
+        assert journal.latest(15)["note"].tolist() == _newest(done, 15)
+    assert journal.latest(50, typ="bonus_add")["note"].tolist() == _newest(records, 50, type="bonus_add")
+    assert journal.latest(50, target="u2")["note"].tolist() == _newest(records, 50, target_id="u2")
+    since = (_T0 + timedelta(minutes=50_000)).strftime("%Y-%m-%d %H:%M:%S")
+    assert journal.latest(600, since=since)["note"].tolist() == _newest([r for r in records if r["ts"] >= since], 600)
+
+
+def test_totals_match_groupby(in_tmp):
+    rnd = random.Random(7)
+    records = [_record(i, rnd.randint(0, 60 * 24 * 90), rnd) for i in range(500)]
+    journal = _journal(in_tmp, records[:300])
+    journal.append_many(records[300:])
+    df = pd.DataFrame(records, columns=LEDGER_COLS)
+
+    for dim, col in (("type", "type"), ("admin_id", "admin_id"), ("target_id", "target_id")):
+        got = journal.totals(dim).set_index(dim)
+        want = df.groupby(col)["amount"].agg(["sum", "count"])
+        assert sorted(got.index) == sorted(want.index)
+        np.testing.assert_allclose(got.loc[want.index, "amount"], want["sum"])
+        assert got.loc[want.index, "count"].tolist() == want["count"].tolist()
+
+    paid = ["commission_add", "bonus_add"]
+    got = journal.totals("month", types=paid).set_index("month")
+    part = df[df["type"].isin(paid)]
+    want = part.groupby(pd.to_datetime(part["ts"]).dt.strftime("%Y-%m"))["amount"].sum()
+    np.testing.assert_allclose(got.loc[want.index, "amount"], want)
+
+
+def test_period_totals_fill_gaps_and_change(in_tmp):
+    rows = [
+        {"ts": "2026-03-01 10:00:00", "admin_id": "a", "target_id": "u1", "type": "bonus_add", "amount": 10.0, "note": ""},
+        {"ts": "2026-03-03 09:00:00", "admin_id": "a", "target_id": "u1", "type": "bonus_add", "amount": 30.0, "note": ""},
+        {"ts": "2026-03-03 11:00:00", "admin_id": "a", "target_id": "u2", "type": "update_user", "amount": 0.0, "note": ""},
+    ]
+    journal = _journal(in_tmp, rows)
+    out = journal.period_totals("day", types=["bonus_add"], last=3, until="2026-03-03 23:00:00")
+    assert out["period"].tolist() == ["2026-03-01", "2026-03-02", "2026-03-03"]
+    assert out["amount"].tolist() == [10.0, 0.0, 30.0]
+    assert out["count"].tolist() == [1, 0, 1]
+    assert out["change"].tolist() == [10.0, -10.0, 30.0]
+
+
+def test_has_run_indexes_batch_notes(in_tmp):
+    journal = _journal(in_tmp, [])
+    note = "대량 정산 수당 2026-01 [0123456789ab]: 1건, 대상 1명"
+    journal.append({"ts": "2026-01-01 00:00:00", "admin_id": "a", "target_id": "-", "type": "batch_settlement", "amount": 1.0, "note": note})
+    journal.append({"ts": "2026-01-01 00:00:01", "admin_id": "a", "target_id": "u1", "type": "commission_add", "amount": 1.0, "note": "수당 [ffffffffffff]"})
+    assert journal.has_run("0123456789ab")
+    assert not journal.has_run("ffffffffffff")  # 회원별 지급 기록이 아니라 요약 기록 기준
+
+
+@pytest.mark.parametrize("kind", ["sqlite", "csv"])
+def test_rollup_snapshot_from_other_writer_is_rebuilt(in_tmp, monkeypatch, kind):
+    # 앱/API 가 같은 기록에 금액 0 기록을 번갈아 추가하고 각자 집계 스냅샷을 저장
+    # → 건수/금액 합계는 앞부분과 같아도 다른 프로세스 기록이 빠진 스냅샷은 쓰지 않아야 함
+
+    monkeypatch.setattr(ledger_store, "_ROLLUP_SAVE_EVERY", 1)
+
+    def storage():
+        if kind == "csv":
+            return CsvStorage(str(in_tmp / "db.csv"), str(in_tmp / "ledger.csv"), str(in_tmp / "rollup.csv"))
+        return SqliteStorage(str(in_tmp / "t.sqlite3"))
+
+    def rec(admin, note):
+        return {"ts": "2026-01-01 00:00:00", "admin_id": admin, "target_id": "u1", "type": "update_user", "amount": 0.0, "note": note}
+
+    first = storage()
+    first.save_members(members_frame([member("u1")]))
+    first.append_ledger([rec("a", "seed1"), {**rec("a", "seed2"), "type": "bonus_add", "amount": 5.0}])
+    app = LedgerJournal(first, first.load_ledger())
+    api_storage = storage()
+    api = LedgerJournal(api_storage, api_storage.load_ledger())
+    api.append(rec("b", "api"))  # 저장 순서 3번째, api 의 집계 스냅샷 저장
+    app.append(rec("a", "app"))  # 저장 순서 4번째, app 의 집계(3건: seed1, seed2, app) 스냅샷이 덮어씀
+
+    check = storage()
+    lg = check.load_ledger()
+    fresh = LedgerJournal(check, lg)
+    got = fresh.totals("admin_id").set_index("admin_id")["count"].to_dict()
+    assert got == lg.groupby("admin_id").size().to_dict() == {"a": 3, "b": 1}
@@ -0,0 +1,172 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import member_store
+from conftest import member, members_frame
+from member_store import ConflictError, MemberStore, count_direct_referrals
+from referral_tree import STAT_COLS, ReferralTree
+
+
+def _store(n: int = 30, seed: int = 0) -> MemberStore:
+    rnd = random.Random(seed)
+    rows = [member("admin", role="admin", profit=5.0)]
+    for i in range(n):
+        sponsor = rnd.choice([r["ID"] for r in rows])
+        rows.append(member(f"u{i}", sponsor, rnd.choice(["Left", "Right"]), rnd.randint(0, 100)))
+    store = MemberStore(members_frame(rows))
+    store.verify_direct_referrals(repair=True)  # 앱/API 로드와 같이 (직추천은 표 값 그대로 시작)
+    return store
+
+
+def _assert_matches_rebuild(store: MemberStore) -> None:
+    # 증감으로 유지한 파생 컬럼/KPI/트리 == 현재 표로 처음부터 계산한 값
+    df = store.df.reset_index(drop=True)
+    assert len(store) == len(df)
+    assert df["ID"].astype(str).tolist() == store.ids()
+    assert df["직추천"].tolist() == count_direct_referrals(df).tolist()
+    assert df["소실적"].tolist() == ReferralTree(df).weak_legs().tolist()
+
+    fresh = MemberStore(df.copy())
+    assert fresh.verify_direct_referrals().empty
+    got, want = store.kpis(), fresh.kpis()
+    for key in ("total_users", "total_admin", "orphan_cnt"):
+        assert got[key] == want[key], key
+    for key in ("total_profit", "avg_profit"):
+        assert got[key] == pytest.approx(want[key]), key
+    assert got["top_user"][1] == pytest.approx(want["top_user"][1])
+
+    a = store.tree_stats().sort_values("ID").reset_index(drop=True)
+    b = fresh.tree_stats().sort_values("ID").reset_index(drop=True)
+    pd.testing.assert_frame_equal(a[["ID", *STAT_COLS]], b[["ID", *STAT_COLS]], check_dtype=False)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_random_ops_match_full_rebuild(seed, monkeypatch):
+    # 추가분/삭제 표시 정리도 여러 번 일어나도록 기준을 낮춤
+    monkeypatch.setattr(member_store, "_COMPACT_EVERY", 8)
+    rnd = random.Random(seed)
+    store = _store(seed=seed)
+    for step in range(250):
+        ids = store.ids()
+        op = rnd.random()
+        if op < 0.25:
+            sponsor = rnd.choice(ids + ["-", "ghost"])
+            store.add(member(f"n{step}", sponsor, rnd.choice(["Left", "Right"]), rnd.randint(0, 50)))
+        elif op < 0.4 and len(ids) > 5:
+            store.delete(rnd.choice(ids))
+        elif op < 0.65:
+            # 추천인 변경은 순환(→ 전체 재빌드)도 만들 수 있음
+            store.update(rnd.choice(ids), {"추천인": rnd.choice(ids + ["-"]), "위치": rnd.choice(["Left", "Right"])})
+        elif op < 0.8:
+            store.update(rnd.choice(ids), {"수익($)": float(rnd.randint(0, 500)), "Role": rnd.choice(["user", "admin"])})
+        else:
+            pick = rnd.sample(ids, min(5, len(ids)))
+            store.add_profits(pd.Series({uid: float(rnd.randint(-20, 20)) for uid in pick}))
+        if step % 50 == 49:
+            _assert_matches_rebuild(store)
+    _assert_matches_rebuild(store)
+
+
+def test_add_duplicate_id_raises():
+    store = _store(3)
+    with pytest.raises(KeyError):
+        store.add(member("u0"))
+    assert len(store) == 4
+
+
+def test_update_conflict_only_when_edited_column_changed():
+    store = _store(3)
+    version = store.row_version("u1")
+    base = store.get_row("u1").to_dict()
+    store.update("u1", {"연락처": "010-9999"})  # 다른 관리자가 다른 컬럼을 바꿈
+    assert store.update("u1", {"이름": "mine"}, expected=version, base=base)
+
+    version, base = store.row_version("u2"), store.get_row("u2").to_dict()
+    store.update("u2", {"이름": "theirs"})
+    with pytest.raises(ConflictError) as e:
+        store.update("u2", {"이름": "mine"}, expected=version, base=base)
+    assert e.value.ids == ["u2"]
+    assert store.get("u2", "이름") == "theirs"
+
+    version = store.row_version("u0")
+    store.update("u0", {"이름": "x"})
+    with pytest.raises(ConflictError):
+        store.delete("u0", expected=version)
+    assert "u0" in store
+
+
+def test_change_tracking_edits():
+    store = _store(3)
+    store.take_changes()
+    store.update("u1", {"이름": "new", "수익($)": float(store.get("u1", "수익($)")) + 7.0})
+    store.add_profits(pd.Series({"u1": 3.0}))
+    store.add(member("n1", "u1", "Left"))
+    changed, deleted, edits = store.take_changes()
+    assert {"u1", "n1"} <= changed and not deleted
+    assert edits["new"] == {"n1"}
+    assert edits["fields"]["u1"]["이름"] == "name-u1"  # 바꾸기 전 값
+    assert edits["fields"]["u1"]["직추천"] is None  # 파생 컬럼은 비교 기준 없음
+    assert edits["profit"]["u1"] == pytest.approx(10.0)
+
+    # 저장 전에 삭제된 새 회원은 저장소에서 지울 것도 없음
+    store.add(member("n2"))
+    store.delete("n2")
+    store.delete("u2")
+    changed, deleted, edits = store.take_changes()
+    assert deleted == {"u2"} and "n2" not in edits["new"]
+
+
+def test_requeue_keeps_oldest_base_and_adds_deltas():
+    store = _store(3)
+    store.take_changes()
+    store.update("u1", {"이름": "a"})
+    store.add_profits(pd.Series({"u1": 2.0}))
+    changed, deleted, edits = store.take_changes()
+    store.update("u1", {"이름": "b"})
+    store.add_profits(pd.Series({"u1": 5.0}))
+    store.requeue_changes(changed, deleted, edits)
+    _changed, _deleted, edits = store.take_changes()
+    assert edits["fields"]["u1"]["이름"] == "name-u1"
+    assert edits["profit"]["u1"] == pytest.approx(7.0)
+
+
+def test_reads_see_unmerged_tail_rows():
+    store = _store(5)
+    store.add(member("zz-new", "u1", "Left", 1.0))
+    assert "zz-new" in store.search("zz-new")
+    assert float(store.get_row("zz-new")["수익($)"]) == 1.0
+    assert np.isin("zz-new", store.df["ID"]).item()
+
+
+def test_cached_keeps_newest_version():
+    store = _store(3)
+    old_version = store.version
+    calls = []
+
+    def slow(df):
+        # 계산 도중 다른 세션이 store 를 바꾸고 새 version 으로 먼저 보관
+        if not calls:
+            calls.append("outer")
+            store.update("u1", {"이름": "changed"})
+            assert store.cached("names", lambda d: d["이름"].tolist()) == store.df["이름"].tolist()
+        return "stale"
+
+    assert store.cached("names", slow) == "stale"
+    assert store.version > old_version
+    assert store.cached("names", lambda d: "recomputed") == store.df["이름"].tolist()
+
+
+def test_held_snapshot_is_not_changed_by_later_writes():
+    # 읽는 쪽이 들고 있는 store.df 는 이후 변경(얕은 복사 + 컬럼 교체)에 영향받지 않음
+    store = _store(5)
+    snap = store.df
+    before = snap.copy()
+    store.update("u1", {"이름": "changed", "수익($)": 999.0})
+    store.add_profits(pd.Series({"u2": 5.0, "u3": -1.0}))
+    store.update("u4", {"추천인": "admin", "위치": "Right"})
+    store.verify_direct_referrals(repair=True)
+    pd.testing.assert_frame_equal(snap, before)
+    assert store.get("u1", "이름") == "changed"
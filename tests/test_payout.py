@@ -0,0 +1,69 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import member, members_frame
+from payout import DEFAULT_RATES, check_rates, compute_payout, load_rates, payout_run_id
+
+#        A
+#     B     C
+#   D
+RATES = check_rates({"direct": 0.10, "levels": [0.05], "binary": 0.20, "binary_cap": 0.0})
+
+
+def _members():
+    return members_frame([member("A"), member("B", "A", "Left"), member("C", "A", "Right"), member("D", "B", "Left")])
+
+
+def _paid(result: pd.DataFrame) -> dict:
+    return result.set_index("ID")[["직추천수당", "단계수당", "바이너리수당", "합계"]].T.to_dict("list")
+
+
+def test_hand_computed_tree():
+    volume = pd.Series({"B": 100.0, "C": 50.0, "D": 200.0})
+    paid = _paid(compute_payout(_members(), volume, RATES))
+    # A: 직추천 (100 + 50) × 10% = 15, 2대 D 200 × 5% = 10, 바이너리 min(B+D=300, C=50) × 20% = 10
+    assert paid["A"] == pytest.approx([15.0, 10.0, 10.0, 35.0])
+    # B: 직추천 D 200 × 10% = 20, 우측이 비어 바이너리 0
+    assert paid["B"] == pytest.approx([20.0, 0.0, 0.0, 20.0])
+    assert paid["C"] == paid["D"] == pytest.approx([0.0, 0.0, 0.0, 0.0])
+
+
+def test_binary_cap_and_duplicate_volume_rows():
+    rates = check_rates({**RATES, "binary_cap": 4.0})
+    volume = pd.Series([60.0, 40.0, 50.0, 200.0], index=["B", "B", "C", "D"])  # 같은 ID 는 합산
+    paid = _paid(compute_payout(_members(), volume, rates))
+    assert paid["A"] == pytest.approx([15.0, 10.0, 4.0, 29.0])
+
+
+def test_cycle_members_do_not_pay_upwards():
+    members = members_frame([member("A"), member("X", "Y", "Left"), member("Y", "X", "Right")])
+    paid = _paid(compute_payout(members, pd.Series({"X": 100.0, "Y": 100.0}), RATES))
+    assert sum(sum(v) for v in paid.values()) == 0.0
+
+
+def test_run_id_is_stable_and_input_sensitive():
+    volume = pd.Series({"B": 100.0})
+    run = payout_run_id(_members(), volume, RATES, "2026-01")
+    assert run == payout_run_id(_members(), volume, RATES, "2026-01")
+    assert run != payout_run_id(_members(), volume, RATES, "2026-02")
+    assert run != payout_run_id(_members(), pd.Series({"B": 101.0}), RATES, "2026-01")
+    assert len(run) == 12
+
+
+def test_load_rates_rereads_only_when_file_changes(tmp_path):
+    path = str(tmp_path / "rates.json")
+    assert load_rates(path) == check_rates(DEFAULT_RATES)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"direct": 0.2}, f)
+    first = load_rates(path)
+    assert first["direct"] == 0.2
+    first["levels"].append(0.9)  # 돌려준 값을 고쳐도 보관한 비율표는 그대로
+    assert load_rates(path)["levels"] == DEFAULT_RATES["levels"]
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"direct": 0.3}, f)
+    os.utime(path, ns=(1, 1))  # 같은 크기로 다시 저장 → 수정 시각으로 구분
+    assert load_rates(path)["direct"] == 0.3
@@ -0,0 +1,94 @@
+import random
+
+import pandas as pd
+import pytest
+
+from conftest import member, members_frame
+from referral_tree import STAT_COLS, ReferralTree
+
+
+def _stats(tree: ReferralTree) -> pd.DataFrame:
+    return tree.stats_frame().sort_values("ID").reset_index(drop=True)
+
+
+def _ancestors(rows: dict, uid: str) -> set:
+    out, cur = set(), rows[uid]["추천인"]
+    while cur in rows and cur not in out:
+        out.add(cur)
+        cur = rows[cur]["추천인"]
+    return out
+
+
+def test_build_small_tree():
+    #      A
+    #    B   C
+    #  D
+    tree = ReferralTree(
+        members_frame(
+            [
+                member("A", profit=1.0),
+                member("B", "A", "Left", 10.0),
+                member("C", "A", "Right", 20.0),
+                member("D", "B", "Left", 5.0),
+            ]
+        )
+    )
+    a = tree.stats("A")
+    assert (a["좌측인원"], a["우측인원"], a["소실적"], a["하위인원"], a["깊이"]) == (2, 1, 1, 3, 0)
+    assert (a["좌측실적"], a["우측실적"]) == (15.0, 20.0)
+    assert tree.stats("D")["깊이"] == 2
+    assert tree.weak_leg("B") == 0
+
+
+def test_cycle_members_are_excluded():
+    tree = ReferralTree(members_frame([member("A"), member("B", "C", "Left"), member("C", "B", "Right"), member("S", "S", "Left")]))
+    assert tree.stats("B")["깊이"] == -1
+    assert tree.stats("S")["깊이"] == -1
+    assert tree.stats("A")["하위인원"] == 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_ops_match_build(seed):
+    # 단건 변경(add/remove/move/set_profit)을 거친 트리 == 같은 회원 표로 새로 빌드한 트리
+    rnd = random.Random(seed)
+    rows = {}
+    for i in range(40):
+        uid = f"u{i}"
+        sponsor = rnd.choice(list(rows)) if rows and rnd.random() < 0.9 else "-"
+        rows[uid] = member(uid, sponsor, rnd.choice(["Left", "Right", "-"]), rnd.randint(0, 100))
+    tree = ReferralTree(members_frame(list(rows.values())))
+    removed = []
+
+    for step in range(300):
+        op = rnd.random()
+        ids = list(rows)
+        if op < 0.3 or len(ids) < 5:
+            uid = removed.pop() if removed and rnd.random() < 0.3 else f"n{seed}-{step}"
+            sponsor = rnd.choice(ids + ["-", "ghost"])
+            rows[uid] = member(uid, sponsor, rnd.choice(["Left", "Right"]), rnd.randint(0, 100))
+            if uid in _ancestors(rows, uid):  # 다시 추가된 ID 아래로 돌아온 하위 회원을 추천인으로 고른 경우 (순환)
+                rows[uid]["추천인"] = sponsor = "-"
+            tree.add(uid, sponsor, rows[uid]["위치"], rows[uid]["수익($)"])
+        elif op < 0.5:
+            uid = rnd.choice(ids)
+            del rows[uid]
+            tree.remove(uid)
+            removed.append(uid)
+        elif op < 0.75:
+            uid = rnd.choice(ids)
+            sponsor = rnd.choice(ids + ["-"])
+            if sponsor != "-" and (sponsor == uid or uid in _ancestors(rows, sponsor)):
+                continue  # 순환은 CycleError → 호출 측 전체 재빌드 (member_store 테스트에서 확인)
+            side = rnd.choice(["Left", "Right"])
+            rows[uid].update({"추천인": sponsor, "위치": side})
+            tree.move(uid, sponsor, side)
+        else:
+            uid = rnd.choice(ids)
+            rows[uid]["수익($)"] = float(rnd.randint(0, 100))
+            tree.set_profit(uid, rows[uid]["수익($)"])
+
+    # 최종 회원 표를 추가 순서대로 다시 빌드해 비교
+    fresh = ReferralTree(members_frame(list(rows.values())))
+    got, want = _stats(tree), _stats(fresh)
+    assert got["ID"].tolist() == want["ID"].tolist()
+    pd.testing.assert_frame_equal(got[STAT_COLS], want[STAT_COLS], check_dtype=False)
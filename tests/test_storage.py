@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+from conftest import member, members_frame
+from member_store import MemberStore
+from storage import CsvStorage, SqliteStorage, WriteConflict
+
+
+@pytest.fixture(params=["sqlite", "csv"])
+def open_two(request, in_tmp):
+    # 같은 저장소 파일을 여는 두 프로세스(앱 / API)를 흉내: 저장소 객체와 MemberStore 를 각각 따로
+    def make():
+        if request.param == "csv":
+            return CsvStorage(str(in_tmp / "db.csv"), str(in_tmp / "ledger.csv"), str(in_tmp / "rollup.csv"))
+        return SqliteStorage(str(in_tmp / "t.sqlite3"))
+
+    first = make()
+    first.save_members(members_frame([member("A", profit=10.0), member("B", "A", "Left", 10.0), member("C", "A", "Right", 10.0)]))
+    second = make()
+    return (first, MemberStore(first.load_members())), (second, MemberStore(second.load_members()))
+
+
+def _save(storage, store) -> list:
+    changed, deleted, df, rows, edits = store.take_dirty_rows(table=storage.kind == "csv")
+    return storage.save_members(df, changed=rows, deleted=list(deleted), edits=edits)
+
+
+def _disk(storage) -> pd.DataFrame:
+    return storage.load_members().set_index("ID")
+
+
+def test_disjoint_edits_and_profit_deltas_both_survive(open_two):
+    (s1, m1), (s2, m2) = open_two
+    m1.update("B", {"이름": "from-app"})
+    m1.add_profits(pd.Series({"C": 5.0}))
+    m2.update("B", {"연락처": "010-api"})
+    m2.add_profits(pd.Series({"B": 7.0, "C": 1.0}))
+    assert _save(s1, m1) == []
+    assert _save(s2, m2) == []  # 두 번째 쓰기가 첫 번째 커밋을 덮어쓰지 않음
+    disk = _disk(s1)
+    assert disk.loc["B", "이름"] == "from-app"
+    assert disk.loc["B", "연락처"] == "010-api"
+    assert disk.loc["B", "수익($)"] == pytest.approx(17.0)
+    assert disk.loc["C", "수익($)"] == pytest.approx(16.0)
+
+
+def test_same_column_edit_is_a_conflict(open_two):
+    (s1, m1), (s2, m2) = open_two
+    m1.update("B", {"이름": "first"})
+    m2.update("B", {"이름": "second"})
+    assert _save(s1, m1) == []
+    assert _save(s2, m2) == ["B"]
+    assert _disk(s2).loc["B", "이름"] == "first"
+
+
+def test_edit_of_deleted_member_and_duplicate_signup_conflict(open_two):
+    (s1, m1), (s2, m2) = open_two
+    m1.delete("C")
+    m1.add(member("N", "A", "Left"))
+    _save(s1, m1)
+    m2.update("C", {"이름": "late"})
+    m2.add(member("N", "B", "Right"))
+    assert sorted(_save(s2, m2)) == ["C", "N"]
+    disk = _disk(s2)
+    assert "C" not in disk.index
+    assert disk.loc["N", "추천인"] == "A"
+
+
+def test_batch_settlement_rolls_back_on_conflict(open_two):
+    (s1, m1), (s2, m2) = open_two
+    m1.delete("B")
+    _save(s1, m1)
+    record = {"ts": "2026-01-01 00:00:00", "admin_id": "A", "target_id": "B", "type": "bonus_add", "amount": 3.0, "note": ""}
+
+    def commit(df, changed, edits):
+        s2.save_batch(df, changed, [record], edits=edits)
+
+    with pytest.raises(WriteConflict):
+        m2.add_profits(pd.Series({"B": 3.0, "C": 3.0}), commit=commit)
+    assert float(m2.get("C", "수익($)")) == pytest.approx(10.0)  # 메모리 변경도 되돌림
+    assert _disk(s2).loc["C", "수익($)"] == pytest.approx(10.0)
+    ledger = s2.load_ledger()
+    assert ledger is None or len(ledger) == 0